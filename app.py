@@ -10,8 +10,15 @@ from bson import ObjectId
 
 # Import configurations and initializers
 from utils.config import Config, config
-from utils.database import init_db
+from utils.database import init_db, pool_stats
+from utils.rate_limit import rate_limiter
 from services.gemini_model import configure_gemini
+from services.knowledge_base import preload_knowledge_base
+from services.recommendation_engine import RecommendationEngine
+from services.user_cache import user_cache_stats
+from services.token_revocation import revocation_list
+from services.password_hashing import password_hashing_stats
+from services.data_export import EXPORT_FILE_PREFIX
 
 # Import Blueprints (route modules)
 from routes.auth_routes import auth_bp
@@ -94,14 +101,16 @@ def create_app(config_name=None):
     logger.info(f"Flask application starting in {config_name} mode")
     
     # --- 4. Create Required Directories ---
-    # Create upload and processed folders if they don't exist
+    # Create upload, processed and export folders if they don't exist
     upload_folder = app.config['UPLOAD_FOLDER']
     processed_folder = app.config['PROCESSED_FOLDER']
+    export_folder = app.config['EXPORT_FOLDER']
     
     try:
         os.makedirs(upload_folder, exist_ok=True)
         os.makedirs(processed_folder, exist_ok=True)
-        logger.info(f"Created directories: {upload_folder}, {processed_folder}")
+        os.makedirs(export_folder, exist_ok=True)
+        logger.info(f"Created directories: {upload_folder}, {processed_folder}, {export_folder}")
     except Exception as e:
         logger.error(f"Failed to create directories: {e}")
     
@@ -132,6 +141,15 @@ def create_app(config_name=None):
             logger.critical(f"CRITICAL ERROR: Gemini AI configuration failed: {e}")
             if config_name == 'production':
                 raise  # Fail fast in production if Gemini is not configured
+        
+        try:
+            # Load the shared medical knowledge base before workers fork (gunicorn --preload)
+            preload_knowledge_base()
+            logger.info("Medical knowledge base loaded successfully")
+        except Exception as e:
+            logger.error(f"Medical knowledge base loading failed: {e}")
+            if config_name == 'production':
+                raise  # Fail fast in production if reference data is missing
     
     # --- 6. Register Application Blueprints (Route Modules) ---
     app.register_blueprint(report_bp, url_prefix='/api/reports')
@@ -141,6 +159,9 @@ def create_app(config_name=None):
     
     logger.info("All blueprints registered successfully")
     
+    # Sliding-window limits per client and blueprint (RATE_LIMIT_PER_MINUTE / RATE_LIMIT_BLUEPRINTS)
+    rate_limiter.init_app(app)
+    
     # --- 7. Define Core Application Routes ---
     
     @app.route('/', methods=['GET'])
@@ -154,6 +175,7 @@ def create_app(config_name=None):
             'timestamp': datetime.utcnow().isoformat(),
             'endpoints': {
                 'health': '/api/health',
+                'metrics': '/api/metrics',
                 'auth': '/api/auth',
                 'reports': '/api/reports',
                 'analysis': '/api/analysis',
@@ -188,6 +210,20 @@ def create_app(config_name=None):
         status_code = 200 if db_status == 'connected' else 503
         return jsonify(health_data), status_code
         
+    @app.route('/api/metrics', methods=['GET'])
+    def metrics():
+        """Per-process cache and pool statistics for monitoring."""
+        return jsonify({
+            'pid': os.getpid(),
+            'timestamp': datetime.utcnow().isoformat(),
+            'recommendation_cache': RecommendationEngine.cache_stats(),
+            'user_cache': user_cache_stats(),
+            'token_revocation': revocation_list.stats(),
+            'password_hashing': password_hashing_stats(),
+            'rate_limit': rate_limiter.stats(),
+            'mongo_pool': pool_stats.stats()
+        }), 200
+        
     @app.route('/uploads/<path:filename>')
     def serve_upload(filename):
         """
@@ -206,6 +242,11 @@ def create_app(config_name=None):
         Serve processed files from the processed directory.
         This endpoint allows access to processed analysis results.
         """
+        # Data exports used to be written here; they are only ever served through the
+        # authenticated download endpoint
+        if os.path.basename(filename).startswith(EXPORT_FILE_PREFIX):
+            logger.warning(f"Refused to serve export file: {filename}")
+            return jsonify({'success': False, 'error': 'Processed file not found'}), 404
         try:
             return send_from_directory(app.config['PROCESSED_FOLDER'], filename)
         except FileNotFoundError:
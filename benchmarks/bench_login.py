@@ -0,0 +1,162 @@
+# /benchmarks/bench_login.py
+"""
+Benchmark the CPU-bound part of login: password verification plus token issue.
+
+Simulates concurrent clients logging in against stored hashes of each
+configured method/cost, either verifying inline on the client thread (the old
+behaviour) or through the bounded hashing executor, and reports logins/s,
+p50/p99 latency and requests rejected because the hashing queue was full.
+
+Usage:
+    python -m benchmarks.bench_login
+    python -m benchmarks.bench_login --clients 1 8 32 --logins 64
+    python -m benchmarks.bench_login --save benchmarks/login_baseline.json
+    python -m benchmarks.bench_login --compare benchmarks/login_baseline.json
+"""
+
+import sys
+import json
+import time
+import argparse
+import platform
+import threading
+from datetime import datetime, timedelta
+
+import jwt
+
+from utils.config import Config
+from services import password_hashing
+from services.password_hashing import PasswordHashingBusy, verify_password
+
+PASSWORD = 'correct-horse-42'
+METHODS = {
+    'bcrypt-10': ('bcrypt', 10),
+    'bcrypt-12': ('bcrypt', 12),
+    'pbkdf2-600k': ('pbkdf2:sha256:600000', None),
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def make_hash(method, rounds):
+    Config.PASSWORD_HASH_METHOD = method
+    if rounds is not None:
+        Config.PASSWORD_BCRYPT_ROUNDS = rounds
+    return password_hashing._hash(PASSWORD)
+
+
+def login_once(stored_hash, mode):
+    """The login route's work after the user lookup"""
+    if mode == 'inline':
+        ok = password_hashing._verify(stored_hash, PASSWORD)
+    else:
+        ok = verify_password(stored_hash, PASSWORD)
+    if not ok:
+        raise AssertionError('password did not verify')
+    payload = {'exp': datetime.utcnow() + timedelta(days=1), 'iat': datetime.utcnow(), 'sub': 'bench'}
+    return jwt.encode(payload, Config.JWT_SECRET_KEY, algorithm='HS256')
+
+
+def bench(stored_hash, mode, clients, logins):
+    """Run `logins` logins spread over `clients` threads"""
+    timings, rejected = [], []
+    lock = threading.Lock()
+    per_client = max(1, logins // clients)
+
+    def client():
+        for _ in range(per_client):
+            start = time.perf_counter()
+            try:
+                login_once(stored_hash, mode)
+            except PasswordHashingBusy:
+                with lock:
+                    rejected.append(1)
+                continue
+            with lock:
+                timings.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'logins': len(timings),
+        'rejected': len(rejected),
+        'logins_per_s': len(timings) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(timings, 50) * 1000 if timings else 0.0,
+        'p99_ms': percentile(timings, 99) * 1000 if timings else 0.0,
+    }
+
+
+def run_suite(methods, modes, client_counts, logins):
+    results = {}
+    for method_name in methods:
+        stored_hash = make_hash(*METHODS[method_name])
+        for mode in modes:
+            for clients in client_counts:
+                key = f"{method_name}/{mode}/{clients}"
+                results[key] = r = bench(stored_hash, mode, clients, logins)
+                print(f"{key:<28} {r['logins_per_s']:8.1f} logins/s  p50 {r['p50_ms']:9.1f} ms  "
+                      f"p99 {r['p99_ms']:9.1f} ms  rejected {r['rejected']}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print throughput changes against a saved baseline; return True if any drop exceeds threshold"""
+    regressed = False
+    print(f"\nComparison against baseline (regression threshold {threshold:.0%}):")
+    for key, current in results.items():
+        previous = baseline.get('results', {}).get(key)
+        if not previous or not previous['logins_per_s']:
+            continue
+        change = (current['logins_per_s'] - previous['logins_per_s']) / previous['logins_per_s']
+        flag = ''
+        if change < -threshold:
+            flag = '  <-- REGRESSION'
+            regressed = True
+        print(f"{key:<28} {previous['logins_per_s']:8.1f} -> {current['logins_per_s']:8.1f} logins/s ({change:+.1%}){flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark login password verification throughput.')
+    parser.add_argument('--methods', nargs='+', choices=list(METHODS), default=list(METHODS))
+    parser.add_argument('--modes', nargs='+', choices=['inline', 'executor'], default=['inline', 'executor'])
+    parser.add_argument('--clients', nargs='+', type=int, default=[1, 4, 16], help='Concurrent client threads')
+    parser.add_argument('--logins', type=int, default=32, help='Logins per run')
+    parser.add_argument('--save', metavar='PATH', help='Write results to a JSON baseline file')
+    parser.add_argument('--compare', metavar='PATH', help='Compare results against a JSON baseline file')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Relative throughput drop treated as regression')
+    args = parser.parse_args()
+
+    print(f"Hashing executor: {Config.PASSWORD_HASH_WORKERS} workers, "
+          f"{Config.PASSWORD_HASH_MAX_PENDING} pending, {Config.PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS}s queue timeout")
+    results = run_suite(args.methods, args.modes, args.clients, args.logins)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created_at': datetime.utcnow().isoformat(),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': results,
+            }, f, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+# /benchmarks/bench_medical_analyzer.py
+"""
+Benchmark MedicalAnalyzer over a synthetic report corpus.
+
+Generates lab, prescription, imaging and general report texts at several sizes,
+runs analyze_report() and every _extract_* method on them, and reports
+throughput, p50/p99 latency and peak memory.
+
+Usage:
+    python -m benchmarks.bench_medical_analyzer
+    python -m benchmarks.bench_medical_analyzer --save benchmarks/baseline.json
+    python -m benchmarks.bench_medical_analyzer --compare benchmarks/baseline.json
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import tracemalloc
+from datetime import datetime
+
+from services.medical_analyzer import MedicalAnalyzer
+
+SIZES = {'1KB': 1024, '50KB': 50 * 1024, '1MB': 1024 * 1024}
+
+# Each size gets roughly the same total work budget
+TARGET_SECONDS = 2.0
+MIN_RUNS, MAX_RUNS = 5, 200
+
+LAB_LINES = [
+    'Glucose (FBS): {v:.0f} mg/dL', 'Hemoglobin: {v:.1f} g/dL', 'Total Cholesterol: {v:.0f} mg/dL',
+    'Triglycerides: {v:.0f} mg/dL', 'Creatinine: {v:.2f} mg/dL', 'WBC: {v:.1f} x10^3/uL',
+    'Platelet count: {v:.0f} x10^3/uL', 'HbA1c: {v:.1f} %', 'LDL: {v:.0f} mg/dL', 'HDL: {v:.0f} mg/dL',
+]
+PRESCRIPTION_LINES = [
+    'Tab Metformin 500 mg twice daily after meals', 'Lisinopril 10 mg once daily',
+    'Cap Omeprazole 20 mg before breakfast', 'Amoxicillin 250 mg thrice daily for 5 days',
+    'Atorvastatin 20 mg daily at night', 'Warfarin 5 mg once daily', 'Aspirin 75 mg od',
+    'Metf0rmin 850 mg bd', 'Paracetamol 650 mg as needed',
+]
+IMAGING_LINES = [
+    'Chest X-ray PA view shows clear lung fields with no consolidation.',
+    'Impression: mild cardiomegaly with normal pulmonary vasculature.',
+    'Findings: no fracture or dislocation is demonstrated in the visualized bones.',
+    'The study reveals a small lesion in the right lower lobe measuring 8 mm.',
+    'Conclusion: unremarkable study, correlate clinically.',
+]
+GENERAL_LINES = [
+    'Patient seen by doctor for routine follow-up.', 'BP 128/84 mmHg, pulse 76, temp 98.4',
+    'SpO2 98 %, RR 16, weight 72 kg, height 170 cm, BMI 24.9',
+    'Patient reports occasional headache, no urgent concerns.', 'Test result reviewed, values elevated slightly.',
+]
+HEADERS = {
+    'lab': 'Blood test report\n',
+    'prescription': 'Rx prescription\n',
+    'imaging': 'Radiology X-ray report\n',
+    'general': 'Clinic visit summary\n',
+}
+
+
+def generate_report(kind, size, rng):
+    """Build a synthetic report of roughly `size` characters"""
+    lines = [HEADERS[kind]]
+    length = len(lines[0])
+    while length < size:
+        if kind == 'lab':
+            line = rng.choice(LAB_LINES).format(v=rng.uniform(0.5, 300))
+        elif kind == 'prescription':
+            line = rng.choice(PRESCRIPTION_LINES)
+        elif kind == 'imaging':
+            line = rng.choice(IMAGING_LINES)
+        else:
+            line = rng.choice(GENERAL_LINES + LAB_LINES[:3]).format(v=rng.uniform(0.5, 300))
+        lines.append(line)
+        length += len(line) + 1
+    return '\n'.join(lines)[:size]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def bench(func, text):
+    """Time `func(text)` repeatedly and measure its peak traced memory"""
+    # Calibrate the run count from a single warm-up call
+    start = time.perf_counter()
+    func(text)
+    single = max(time.perf_counter() - start, 1e-6)
+    runs = int(min(MAX_RUNS, max(MIN_RUNS, TARGET_SECONDS / single)))
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func(text)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = sum(timings)
+    return {
+        'runs': runs,
+        'p50_ms': percentile(timings, 50) * 1000,
+        'p99_ms': percentile(timings, 99) * 1000,
+        'mean_ms': statistics.fmean(timings) * 1000,
+        'throughput_mb_s': (len(text) * runs / total) / (1024 * 1024) if total else 0.0,
+        'peak_memory_kb': peak / 1024,
+    }
+
+
+def run_suite(sizes, seed=42):
+    analyzer = MedicalAnalyzer()
+    rng = random.Random(seed)
+    targets = {
+        'analyze_report': analyzer.analyze_report,
+        '_extract_lab_values': analyzer._extract_lab_values,
+        '_extract_vital_signs': analyzer._extract_vital_signs,
+        '_extract_medications': analyzer._extract_medications,
+        '_extract_imaging_findings': analyzer._extract_imaging_findings,
+    }
+
+    results = {}
+    for kind in HEADERS:
+        for size_name in sizes:
+            text = generate_report(kind, SIZES[size_name], rng)
+            for target_name, func in targets.items():
+                key = f"{target_name}/{kind}/{size_name}"
+                results[key] = bench(func, text)
+                r = results[key]
+                print(f"{key:<48} p50 {r['p50_ms']:9.3f} ms  p99 {r['p99_ms']:9.3f} ms  "
+                      f"{r['throughput_mb_s']:8.2f} MB/s  peak {r['peak_memory_kb']:9.1f} KB")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print p50 changes against a saved baseline; return True if any regression exceeds threshold"""
+    regressed = False
+    print(f"\nComparison against baseline (regression threshold {threshold:.0%}):")
+    for key, current in results.items():
+        previous = baseline.get('results', {}).get(key)
+        if not previous or not previous['p50_ms']:
+            continue
+        change = (current['p50_ms'] - previous['p50_ms']) / previous['p50_ms']
+        flag = ''
+        if change > threshold:
+            flag = '  <-- REGRESSION'
+            regressed = True
+        print(f"{key:<48} {previous['p50_ms']:9.3f} -> {current['p50_ms']:9.3f} ms ({change:+.1%}){flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark MedicalAnalyzer on synthetic reports.')
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=list(SIZES))
+    parser.add_argument('--save', metavar='PATH', help='Write results to a JSON baseline file')
+    parser.add_argument('--compare', metavar='PATH', help='Compare results against a JSON baseline file')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Relative p50 slowdown treated as regression')
+    args = parser.parse_args()
+
+    results = run_suite(args.sizes)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created_at': datetime.utcnow().isoformat(),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': results,
+            }, f, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,31 @@
 
 import os
 import logging
-from datetime import datetime
-from flask import Blueprint, jsonify, current_app
+from flask import Blueprint, jsonify, current_app, request
 from bson.objectid import ObjectId
-from routes.auth_routes import token_required   # ✅ import auth decorator
+from routes.auth_routes import claims_required   # ✅ import auth decorator
+from utils.pagination import keyset_filter, parse_limit, next_cursor
 
 # Import master analysis + OCR
-from services.gemini_model import get_master_analysis
 from services.ocr_model import extract_text_from_file
+from services.analysis_pipeline import start_analysis
+from services.analysis_store import analysis_status
+from services.medical_analyzer import MedicalAnalyzer
+from services.recommendation_engine import RecommendationEngine
 
 logger = logging.getLogger(__name__)
 analysis_bp = Blueprint('analysis_bp', __name__)
 
+# Analysis listing pages (keyset pagination on upload_date, _id)
+DEFAULT_ANALYSES_PER_PAGE = 20
+MAX_ANALYSES_PER_PAGE = 100
+
 
 # ================================
 # 📌 Create Master Analysis (Latest Report for Current User)
 # ================================
 @analysis_bp.route('/create', methods=['POST'])
-@token_required
+@claims_required
 def create_master_analysis(current_user):
     """
     Performs OCR, generates a single MASTER analysis object for 
@@ -42,32 +49,13 @@ def create_master_analysis(current_user):
     if extracted_text is None:
         return jsonify({'success': False, 'error': 'Failed to extract text from report.'}), 500
 
-    # ✅ Call Gemini for AI analysis
-    analysis_result = get_master_analysis(extracted_text)
+    # ✅ The rule-based result is saved as provisional first; Gemini then stores the
+    # final analysis and marks the report completed
+    app = current_app._get_current_object()
+    analysis_result, _ = start_analysis(app, report_meta['_id'], current_user["_id"], extracted_text)
     if 'error' in analysis_result:
         return jsonify({'success': False, 'error': analysis_result['error']}), 500
 
-    # ✅ Ensure required top-level keys exist
-    for key in ["dashboardData", "insightsData", "dietData"]:
-        if key not in analysis_result:
-            analysis_result[key] = {}
-
-    # ✅ Save / update analysis in DB
-    mongo.db.analyses.update_one(
-        {'report_id': report_meta['_id']},
-        {'$set': {
-            'analysis_data': analysis_result,
-            'created_at': datetime.utcnow()
-        }},
-        upsert=True
-    )
-
-    # Mark report as completed
-    mongo.db.reports.update_one(
-        {'_id': report_meta['_id']}, 
-        {'$set': {'status': 'completed'}}
-    )
-
     return jsonify({
         'success': True,
         'message': 'Analysis complete',
@@ -80,30 +68,173 @@ def create_master_analysis(current_user):
 # 📌 Get Saved Analysis (All Reports of Current User)
 # ================================
 @analysis_bp.route('/get', methods=['GET'])
-@token_required
+@claims_required
 def get_saved_analysis(current_user):
     """
-    Retrieves all saved analyses for the logged-in user.
+    Retrieves saved analyses for the logged-in user, newest report first.
+
+    Query params:
+        limit: analyses per page (default 20, max 100)
+        cursor: next_cursor of the previous page
+        view: 'summary' (default; report info, provisional flag/analysis_status and available
+              sections) or 'full' (adds the analysis sections)
     """
     mongo = current_app.mongo
     try:
-        reports = mongo.db.reports.find({"user_id": current_user["_id"]})
+        view = request.args.get('view', 'summary')
+        if view not in ('summary', 'full'):
+            return jsonify({'success': False, 'error': "view must be 'summary' or 'full'"}), 400
+        try:
+            limit = parse_limit(request.args, DEFAULT_ANALYSES_PER_PAGE, MAX_ANALYSES_PER_PAGE)
+            match = {'user_id': current_user['_id'], **keyset_filter(request.args.get('cursor'))}
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+
+        # Summary pages only need the section names, not their data
+        section_fields = {'section': 1, 'data': 1} if view == 'full' else {'section': 1}
+        header_fields = {
+            'provisional': 1,
+            'analysis_status': 1,
+            'created_at': 1,
+            # Analyses saved before the section split still carry the whole blob
+            'legacy_sections': {'$map': {
+                'input': {'$objectToArray': {'$ifNull': ['$analysis_data', {}]}},
+                'in': '$$this.k'
+            }}
+        }
+        if view == 'full':
+            header_fields['analysis_data'] = 1
+
+        # One round trip: the keyset match and sort walk the (user_id, upload_date, _id)
+        # index and the $lookups hit the unique report_id indexes, so every page costs
+        # the same regardless of how many reports the user has or how deep it is
+        pipeline = [
+            {'$match': match},
+            {'$sort': {'upload_date': -1, '_id': -1}},
+            {'$project': {'original_filename': 1, 'upload_date': 1}},
+            {'$lookup': {
+                'from': 'analyses',
+                'localField': '_id',
+                'foreignField': 'report_id',
+                'pipeline': [{'$project': header_fields}],
+                'as': 'analysis'
+            }},
+            {'$unwind': '$analysis'},
+            # One extra document tells whether another page exists
+            {'$limit': limit + 1},
+            # Per-section documents, through the unique (report_id, section) index
+            {'$lookup': {
+                'from': 'analysis_sections',
+                'localField': '_id',
+                'foreignField': 'report_id',
+                'pipeline': [{'$project': section_fields}],
+                'as': 'sections'
+            }},
+            {'$project': {
+                'original_filename': 1,
+                'upload_date': 1,
+                'created_at': '$analysis.created_at',
+                'provisional': '$analysis.provisional',
+                'analysis_status': '$analysis.analysis_status',
+                'section_names': '$sections.section',
+                'legacy_sections': '$analysis.legacy_sections',
+                'legacy_data': '$analysis.analysis_data',
+                'sections': 1
+            }}
+        ]
+        docs = list(mongo.db.reports.aggregate(pipeline))
+        cursor = next_cursor(docs, limit)
 
         all_analysis = []
-        for report in reports:
-            analysis_doc = mongo.db.analyses.find_one({'report_id': report["_id"]})
-            if analysis_doc:
-                all_analysis.append({
-                    "report_id": str(report["_id"]),
-                    "original_filename": report.get("original_filename"),
-                    "analysis": analysis_doc.get("analysis_data")
-                })
-
-        if not all_analysis:
+        for doc in docs[:limit]:
+            status = analysis_status(doc)
+            item = {
+                "report_id": str(doc["_id"]),
+                "original_filename": doc.get("original_filename"),
+                "upload_date": doc["upload_date"].isoformat() if doc.get("upload_date") else None,
+                "created_at": doc["created_at"].isoformat() if doc.get("created_at") else None,
+                "provisional": status == "pending",
+                "analysis_status": status,
+                "sections": doc.get("section_names") or doc.get("legacy_sections") or []
+            }
+            if view == 'full':
+                item["analysis"] = (
+                    {section['section']: section.get('data') for section in doc['sections']}
+                    if doc['sections'] else doc.get('legacy_data')
+                )
+            all_analysis.append(item)
+
+        if not all_analysis and not request.args.get('cursor'):
             return jsonify({'success': False, 'error': 'No analyses found for this user.'}), 404
 
-        return jsonify({'success': True, 'analyses': all_analysis}), 200
+        return jsonify({
+            'success': True,
+            'analyses': all_analysis,
+            'next_cursor': cursor,
+            'has_more': cursor is not None
+        }), 200
 
     except Exception as e:
         logger.error(f"Failed to fetch analyses for user {current_user['_id']}: {e}")
         return jsonify({'success': False, 'error': 'An internal error occurred.'}), 500
+
+
+# ================================
+# 📌 Rule-based Recommendations (only the requested sections)
+# ================================
+@analysis_bp.route('/recommendations/<report_id>', methods=['GET'])
+@claims_required
+def get_recommendations(current_user, report_id):
+    """
+    Returns rule-based recommendations for one report of the logged-in user.
+
+    Query params:
+        sections: comma-separated subset of RecommendationEngine.SECTIONS,
+                  e.g. ?sections=dietary or ?sections=medication_management
+                  (default: all sections)
+    """
+    mongo = current_app.mongo
+    try:
+        sections = None
+        if request.args.get('sections'):
+            sections = [s.strip() for s in request.args['sections'].split(',') if s.strip()]
+            unknown = [s for s in sections if s not in RecommendationEngine.SECTIONS]
+            if unknown:
+                return jsonify({
+                    'success': False,
+                    'error': f"Unknown sections: {', '.join(unknown)}",
+                    'available_sections': list(RecommendationEngine.SECTIONS)
+                }), 400
+
+        try:
+            report_obj_id = ObjectId(report_id)
+        except Exception:
+            return jsonify({'success': False, 'error': 'Invalid report_id'}), 400
+
+        report = mongo.db.reports.find_one(
+            {'_id': report_obj_id, 'user_id': current_user['_id']},
+            {'ocr_data.raw_text': 1}
+        )
+        if not report:
+            return jsonify({'success': False, 'error': 'Report not found'}), 404
+
+        # Reuse the rule-based analysis stored at upload time; re-analyze older reports
+        stored = mongo.db.analyses.find_one({'report_id': report_obj_id}, {'rule_based.analysis': 1})
+        analysis = (stored or {}).get('rule_based', {}).get('analysis')
+        if analysis is None:
+            raw_text = report.get('ocr_data', {}).get('raw_text')
+            if not raw_text:
+                return jsonify({'success': False, 'error': 'No extracted text stored for this report.'}), 404
+            analysis = MedicalAnalyzer().analyze_report(raw_text)
+
+        recommendations = RecommendationEngine().generate_recommendations(analysis, sections=sections)
+
+        return jsonify({
+            'success': True,
+            'report_id': report_id,
+            'recommendations': recommendations
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Failed to build recommendations for report {report_id}: {e}")
+        return jsonify({'success': False, 'error': 'An internal error occurred.'}), 500
@@ -1,9 +1,14 @@
 from flask import Blueprint, request, jsonify, current_app
 from bson.objectid import ObjectId
-from werkzeug.security import generate_password_hash, check_password_hash
 from utils.database import mongo  # Add this import at the top
+from services.user_cache import get_cached_user
+from services.token_revocation import revocation_list
+from services.password_hashing import (
+    PasswordHashingBusy, hash_password, verify_password, needs_rehash, schedule_rehash
+)
 import jwt
-from datetime import datetime, timedelta
+import uuid
+from datetime import datetime, timedelta, timezone
 import logging
 import re
 from functools import wraps
@@ -13,6 +18,12 @@ auth_bp = Blueprint('auth_bp', __name__)
 
 # --- Helper Functions ---
 
+def hashing_busy_response():
+    """503 returned when the password hashing queue stays full; clients should retry shortly."""
+    response = jsonify({'success': False, 'error': 'Server is busy, please try again shortly.'})
+    response.headers['Retry-After'] = str(max(1, round(current_app.config['PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS'])))
+    return response, 503
+
 def validate_email(email):
     """Validate email format."""
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
@@ -28,20 +39,30 @@ def validate_password(password):
         return False, "Password must contain at least one number"
     return True, "Password is valid"
 
-def create_token(user_id):
+def create_token(user_id, name=None, email=None):
+    """
+    Issue a JWT carrying the claims most routes need, so they can authorize a
+    request without reading the user document. 'jti' identifies the token for
+    revocation (logout).
+    """
+    now = datetime.utcnow()
     payload = {
-        'exp': datetime.utcnow() + timedelta(days=1),
-        'iat': datetime.utcnow(),
-        'sub': str(user_id)
+        'exp': now + timedelta(days=1),
+        'iat': now,
+        'sub': str(user_id),
+        'jti': uuid.uuid4().hex
     }
+    if name is not None:
+        payload['name'] = name
+    if email is not None:
+        payload['email'] = email
     token = jwt.encode(payload, current_app.config['JWT_SECRET_KEY'], algorithm='HS256')
     return token
 
-# --- YEH NAYA FUNCTION ADD KIYA GAYA HAI ---
-def verify_token_and_get_user():
+def decode_request_token():
     """
-    Yeh function header se token nikalta hai, use verify karta hai,
-    aur database se user ka data laata hai.
+    Header se Bearer token nikalta hai, signature/expiry verify karta hai aur
+    revoked tokens reject karta hai. Returns (claims, error, status_code).
     """
     token = None
     if 'Authorization' in request.headers and request.headers['Authorization'].startswith('Bearer '):
@@ -52,21 +73,60 @@ def verify_token_and_get_user():
 
     try:
         data = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
-        current_user = mongo.db.users.find_one({'_id': ObjectId(data['sub'])})
+        ObjectId(data['sub'])
+    except jwt.ExpiredSignatureError:
+        return None, {'error': 'Token has expired!'}, 401
+    except Exception as e:
+        logger.error(f"Token validation error: {e}")
+        return None, {'error': 'Token is invalid!'}, 401
+
+    # Tokens issued before 'jti' was added cannot be revoked; they expire within a day
+    if data.get('jti') and revocation_list.is_revoked(data['jti']):
+        return None, {'error': 'Token has been revoked!'}, 401
+    return data, None, None
+
+# --- YEH NAYA FUNCTION ADD KIYA GAYA HAI ---
+def verify_token_and_get_user():
+    """
+    Yeh function header se token nikalta hai, use verify karta hai,
+    aur database se user ka data laata hai.
+    """
+    data, error, status_code = decode_request_token()
+    if error:
+        return None, error, status_code
+
+    try:
+        current_user = get_cached_user(data['sub'])
         
         if not current_user:
             return None, {'error': 'User not found for this token.'}, 404
             
         return current_user, None, None
 
-    except jwt.ExpiredSignatureError:
-        return None, {'error': 'Token has expired!'}, 401
     except Exception as e:
         logger.error(f"Token validation error: {e}")
         return None, {'error': 'Token is invalid!'}, 401
 # ---------------------------------------------------------
 
-# --- Decorator for verifying JWT token ---
+def verify_token_claims():
+    """
+    Verify the token and build the current user from its claims alone (no DB read).
+
+    The returned dict has '_id', 'name', 'email', 'jti' and 'exp'; name/email are
+    None for tokens issued before they were embedded.
+    """
+    data, error, status_code = decode_request_token()
+    if error:
+        return None, error, status_code
+    return {
+        '_id': ObjectId(data['sub']),
+        'name': data.get('name'),
+        'email': data.get('email'),
+        'jti': data.get('jti'),
+        'exp': data.get('exp')
+    }, None, None
+
+# --- Decorator for verifying JWT token (loads the full user profile) ---
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -76,6 +136,16 @@ def token_required(f):
         return f(user, *args, **kwargs)
     return decorated
 
+# --- Decorator for routes that only need the caller's identity (token claims) ---
+def claims_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        user, error, status_code = verify_token_claims()
+        if error:
+            return jsonify(error), status_code
+        return f(user, *args, **kwargs)
+    return decorated
+
 # --- Main Authentication Routes ---
 
 @auth_bp.route('/register', methods=['POST'])
@@ -100,7 +170,7 @@ def register():
         if mongo.db.users.find_one({'email': email}):
             return jsonify({'success': False, 'error': 'User with this email already exists'}), 409
             
-        hashed_password = generate_password_hash(password)
+        hashed_password = hash_password(password)
         
         user_id = mongo.db.users.insert_one({
             'name': name,
@@ -109,10 +179,13 @@ def register():
             'created_at': datetime.utcnow()
         }).inserted_id
         
-        token = create_token(user_id) # Register ke baad token generate karein
+        token = create_token(user_id, name, email) # Register ke baad token generate karein
         logger.info(f"✅ User '{email}' registered successfully.")
         return jsonify({'success': True, 'message': 'User registered successfully', 'token': token}), 201
         
+    except PasswordHashingBusy as e:
+        logger.warning(f"⚠️ Registration rejected: {e}")
+        return hashing_busy_response()
     except Exception as e:
         logger.error(f"💥 Registration failed: {str(e)}")
         return jsonify({'success': False, 'error': 'An internal server error occurred during registration.'}), 500
@@ -134,29 +207,56 @@ def login():
 
         user = mongo.db.users.find_one({'email': email.strip().lower()})
 
-        if not user or 'password' not in user or not check_password_hash(user['password'], password):
+        if not user or 'password' not in user or not verify_password(user['password'], password):
             logger.warning(f"⚠️ Invalid login attempt for email: {email}")
             return jsonify({'success': False, 'message': 'Invalid credentials. Please check your email and password.'}), 401
+
+        # Stored with an older method or cost: upgrade it off the request path
+        if needs_rehash(user['password']):
+            schedule_rehash(user['_id'], user['password'], password)
         
-        token = create_token(user['_id'])
+        token = create_token(user['_id'], user.get('name'), user.get('email'))
         if not token:
             return jsonify({'success': False, 'message': 'Could not generate token.'}), 500
 
         logger.info(f"✅ User '{email}' logged in successfully.")
         return jsonify({'success': True, 'token': token}), 200
 
+    except PasswordHashingBusy as e:
+        logger.warning(f"⚠️ Login rejected: {e}")
+        return hashing_busy_response()
     except Exception as e:
         logger.error(f"💥 Login failed: {e}")
         return jsonify({'success': False, 'message': 'An internal server error occurred during login.'}), 500
 
 
 @auth_bp.route('/verify-token', methods=['POST'])
-@token_required
+@claims_required
 def verify_token_route(current_user):
     """Verifies a token and returns user data. The decorator handles validation."""
+    if current_user['name'] is None or current_user['email'] is None:
+        # Older tokens carry only 'sub'
+        current_user = get_cached_user(current_user['_id'])
+        if not current_user:
+            return jsonify({'error': 'User not found for this token.'}), 404
     user_data = {
         'id': str(current_user['_id']),
         'name': current_user['name'],
         'email': current_user['email']
     }
-    return jsonify(user_data), 200
\ No newline at end of file
+    return jsonify(user_data), 200
+
+
+@auth_bp.route('/logout', methods=['POST'])
+@claims_required
+def logout(current_user):
+    """Revokes the presented token; every worker rejects it after its next deny-list refresh."""
+    if not current_user['jti']:
+        return jsonify({'success': False, 'error': 'This token cannot be revoked; please log in again.'}), 400
+    try:
+        revocation_list.revoke(current_user['jti'], current_user['_id'], datetime.fromtimestamp(current_user['exp'], timezone.utc).replace(tzinfo=None))
+        logger.info(f"✅ Token revoked for user {current_user['_id']}.")
+        return jsonify({'success': True, 'message': 'Logged out successfully'}), 200
+    except Exception as e:
+        logger.error(f"💥 Logout failed: {e}")
+        return jsonify({'success': False, 'error': 'An internal server error occurred during logout.'}), 500
@@ -1,12 +1,18 @@
 from flask import Blueprint, request, jsonify, current_app
 from werkzeug.utils import secure_filename
 import os
+import re
 from datetime import datetime
 import logging
 from bson import ObjectId
 from bson import json_util
 import json
-from routes.auth_routes import token_required   
+from routes.auth_routes import claims_required   
+from utils.pagination import keyset_filter, parse_limit, next_cursor
+from services.analysis_pipeline import save_uploaded_report, run_gemini_analysis, submit_gemini_analysis
+from services.analysis_store import get_analysis_section, get_analysis_data, analysis_status, analysis_status_expr, ANALYSIS_STATUS_PROJECTION
+from services.user_stats import record_report_deleted, update_report, ANALYSIS_STATS_PROJECTION
+from services.report_classifier import REPORT_TYPES
 
 
 logger = logging.getLogger(__name__)
@@ -14,6 +20,18 @@ report_bp = Blueprint('report_bp', __name__)
 
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg'}
 
+# Report listing pages (keyset pagination on upload_date, _id)
+DEFAULT_REPORTS_PER_PAGE = 5
+MAX_REPORTS_PER_PAGE = 100
+REPORT_SUMMARY_PROJECTION = {
+    'original_filename': 1, 'saved_filename': 1, 'filepath': 1, 'upload_date': 1,
+    'content_type': 1, 'status': 1, 'report_type': 1
+}
+
+# Sparse fieldsets on /<report_id>/analysis: dotted paths inside the analysis sections
+ANALYSIS_FIELD_PATTERN = re.compile(r'^[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*$')
+MAX_ANALYSIS_FIELDS = 20
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -22,7 +40,7 @@ def allowed_file(filename):
 # 📌 Upload Report
 # ================================
 @report_bp.route('/upload', methods=['POST'])
-@token_required
+@claims_required
 def upload_report(current_user):
     """Handles medical report upload, runs OCR + Gemini analysis, and saves metadata & insights in DB."""
     if 'file' not in request.files:
@@ -53,13 +71,6 @@ def upload_report(current_user):
                 'content_type': file.mimetype,
                 'status': 'processing'   # ⬅️ abhi processing mark karte hain
             }
-            result = mongo.db.reports.insert_one(report_data)
-            report_id = result.inserted_id
-
-            mongo.db.users.update_one(
-                {"_id": current_user["_id"]},
-                {"$set": {"last_report_id": report_id}}
-            )
 
             # --------------------------
             # STEP 1: Run OCR
@@ -68,39 +79,40 @@ def upload_report(current_user):
             print('====================EXTRACTED TEXT============') 
             print(extracted_text)
 
+            # STEP 2: Save the report in its post-OCR state (status, type, OCR text and the
+            # provisional rule-based analysis) in one write sequence / transaction
+            report_id, rule_based = save_uploaded_report(mongo.db, report_data, extracted_text)
             if not extracted_text:
-                mongo.db.reports.update_one({'_id': report_id}, {'$set': {'status': 'ocr_failed'}})
                 return jsonify({'success': False, 'error': 'Failed to extract text from report.'}), 500
 
-            # STEP 2: Run Gemini Analysis
-            from services.gemini_model import get_master_analysis
-            analysis_result = get_master_analysis(extracted_text)
+            app = current_app._get_current_object()
+
+            # ?wait=false returns the provisional result now; Gemini runs in the background
+            # and replaces it when it arrives
+            if request.args.get('wait', 'true').lower() in ('false', '0', 'no'):
+                submit_gemini_analysis(app, report_id, current_user["_id"], extracted_text)
+                return jsonify({
+                    'success': True,
+                    'message': 'File uploaded; AI analysis is still running.',
+                    'report_id': str(report_id),
+                    'provisional': True,
+                    'rule_based': rule_based
+                }), 202
+
+            # STEP 3: Run Gemini on this request's thread (it saves the analysis and report
+            # status itself); the shared pool is only for uploads that do not wait
+            analysis_result = run_gemini_analysis(app, report_id, current_user["_id"], extracted_text)
             print('====================DATA PRINTING============')
             print(analysis_result)
 
             if not analysis_result or "error" in analysis_result:
-                mongo.db.reports.update_one({'_id': report_id}, {'$set': {'status': 'analysis_failed'}})
                 return jsonify({'success': False, 'error': 'Failed to generate analysis from Gemini.'}), 500
 
-            # STEP 3: Save analysis in DB
-            mongo.db.analyses.update_one(
-                {'report_id': report_id},
-                {'$set': {
-                    'user_id': current_user["_id"],   # ✅ Link analysis with user
-                    'report_id': report_id,           # ✅ Keep report reference
-                    'analysis_data': analysis_result,
-                    'created_at': datetime.utcnow()
-                }},
-                upsert=True
-            )
-
-            # Update report status
-            mongo.db.reports.update_one({'_id': report_id}, {'$set': {'status': 'completed'}})
-
             return jsonify({
                 'success': True,
                 'message': 'File uploaded & analysis completed successfully.',
                 'report_id': str(report_id),
+                'provisional': False,
                 'analysis': analysis_result
             }), 201
 
@@ -115,19 +127,38 @@ def upload_report(current_user):
 # 📌 List User Reports
 # ================================
 @report_bp.route('/list', methods=['GET'])
-@token_required
+@claims_required
 def list_reports(current_user):
-    """Return all reports for the logged-in user."""
+    """
+    Return the logged-in user's reports, newest first, one page at a time.
+
+    Query params:
+        limit: page size (default 5, max 100)
+        cursor: next_cursor of the previous page
+    """
     try:
         mongo = current_app.mongo
+        try:
+            limit = parse_limit(request.args, DEFAULT_REPORTS_PER_PAGE, MAX_REPORTS_PER_PAGE)
+            query = {"user_id": current_user["_id"], **keyset_filter(request.args.get('cursor'))}
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+
+        # Summary fields only (no OCR text); one extra document tells whether another page exists
         reports_cursor = mongo.db.reports.find(
-            {"user_id": current_user["_id"]}
-        ).sort('upload_date', -1).limit(5)
+            query, REPORT_SUMMARY_PROJECTION
+        ).sort([('upload_date', -1), ('_id', -1)]).limit(limit + 1)
 
         reports_list = list(reports_cursor)
-        reports_json = json.loads(json_util.dumps(reports_list))
+        cursor = next_cursor(reports_list, limit)
+        reports_json = json.loads(json_util.dumps(reports_list[:limit]))
 
-        return jsonify({'success': True, 'reports': reports_json}), 200
+        return jsonify({
+            'success': True,
+            'reports': reports_json,
+            'next_cursor': cursor,
+            'has_more': cursor is not None
+        }), 200
     except Exception as e:
         logger.error(f"Failed to fetch report list: {e}", exc_info=True)
         return jsonify({'success': False, 'error': 'Failed to retrieve reports.'}), 500
@@ -137,24 +168,27 @@ def list_reports(current_user):
 # ================================
 
 @report_bp.route('/delete/<report_id>', methods=['DELETE'])
-@token_required
+@claims_required
 def delete_report(current_user, report_id):
     """Delete a report by ID for the logged-in user."""
     try:
         mongo = current_app.mongo
 
         # Make sure the report belongs to the current user
-        result = mongo.db.reports.delete_one({
-            "_id": ObjectId(report_id),
-            "user_id": current_user["_id"]
-        })
+        deleted = mongo.db.reports.find_one_and_delete(
+            {"_id": ObjectId(report_id), "user_id": current_user["_id"]},
+            projection={'user_id': 1, 'status': 1, 'report_type': 1}
+        )
 
-        if result.deleted_count == 0:
+        if deleted is None:
             return jsonify({
                 'success': False,
                 'error': 'Report not found or not authorized.'
             }), 404
 
+        analysis = mongo.db.analyses.find_one({'report_id': deleted['_id']}, ANALYSIS_STATS_PROJECTION)
+        record_report_deleted(mongo.db, deleted, analysis)
+
         return jsonify({'success': True, 'message': 'Report deleted successfully.'}), 200
 
     except Exception as e:
@@ -162,26 +196,78 @@ def delete_report(current_user, report_id):
         return jsonify({'success': False, 'error': 'Failed to delete report.'}), 500
 
 
+# ================================
+# 📌 Confirm / Correct Report Type
+# ================================
+@report_bp.route('/<report_id>/type', methods=['PUT'])
+@claims_required
+def set_report_type(current_user, report_id):
+    """
+    Record the report type confirmed or corrected by the logged-in user.
+
+    Besides replacing the predicted report_type, this stores the reviewed label
+    (labels.report_type) the report classifier is trained on with
+    scripts/train_report_classifier.py --from-mongo.
+    """
+    data = request.get_json(silent=True) or {}
+    report_type = data.get('report_type')
+    if report_type not in REPORT_TYPES:
+        return jsonify({
+            'success': False,
+            'error': f"report_type must be one of: {', '.join(REPORT_TYPES)}"
+        }), 400
+
+    try:
+        mongo = current_app.mongo
+        before = update_report(
+            mongo.db,
+            {'_id': ObjectId(report_id), 'user_id': current_user['_id']},
+            {
+                'report_type': report_type,
+                'report_type_source': 'user',
+                'labels.report_type': report_type,
+                'labels.source': 'user',
+                'labels.labelled_at': datetime.utcnow()
+            }
+        )
+        if before is None:
+            return jsonify({'success': False, 'error': 'Report not found or not authorized.'}), 404
+
+        return jsonify({'success': True, 'report_type': report_type}), 200
+
+    except Exception as e:
+        logger.error(f"Failed to set report type for {report_id}: {e}", exc_info=True)
+        return jsonify({'success': False, 'error': 'Failed to update report type.'}), 500
+
+
 # ================================
 # 📌 Get All Insights (no report_id)
 # ================================
 @report_bp.route('/<report_id>/insights', methods=['GET'])
-@token_required
+@claims_required
 def get_insights_for_report(current_user, report_id):
     """Return insights for a specific report of logged-in user."""
     try:
         mongo = current_app.mongo
-        report = mongo.db.reports.find_one({"_id": ObjectId(report_id), "user_id": current_user["_id"]})
+        report = mongo.db.reports.find_one({"_id": ObjectId(report_id), "user_id": current_user["_id"]}, {"_id": 1})
 
         if not report:
             return jsonify({"success": False, "error": "Report not found"}), 404
 
-        analysis = mongo.db.analyses.find_one({"report_id": report["_id"]})
-        insights_data = {}
-        if analysis and "analysis_data" in analysis:
-            insights_data = analysis["analysis_data"].get("insightsData", {})
+        # Only the insights section document is read once Gemini has finished
+        insights_data = get_analysis_section(mongo.db, report["_id"], "insightsData")
+        status = "completed"
+        if insights_data is None:
+            analysis = mongo.db.analyses.find_one({"report_id": report["_id"]}, {**ANALYSIS_STATUS_PROJECTION, "_id": 0})
+            status = analysis_status(analysis)
+            insights_data = {}
 
-        return jsonify({"success": True, "insights_data": insights_data}), 200
+        return jsonify({
+            "success": True,
+            "provisional": status == "pending",
+            "analysis_status": status,
+            "insights_data": insights_data
+        }), 200
 
     except Exception as e:
         logger.error(f"Failed to fetch insights for report {report_id}: {e}")
@@ -192,29 +278,65 @@ def get_insights_for_report(current_user, report_id):
 # 📌 Get All Analyses (no report_id)
 # ================================
 @report_bp.route('/<report_id>/analysis', methods=['GET'])
-@token_required
+@claims_required
 def get_report_analysis(current_user, report_id):
-    """Return analysis for a specific report of logged-in user."""
+    """
+    Return analysis for a specific report of logged-in user.
+
+    Query params:
+        fields: optional comma-separated paths inside the analysis, e.g.
+                ?fields=dashboardData.keyMetrics,dietData.mealPlans; only these
+                are read from MongoDB and returned
+    """
     try:
         mongo = current_app.mongo
 
+        fields = None
+        if request.args.get('fields'):
+            fields = [f.strip() for f in request.args['fields'].split(',') if f.strip()]
+            invalid = [f for f in fields if not ANALYSIS_FIELD_PATTERN.match(f)]
+            if invalid or len(fields) > MAX_ANALYSIS_FIELDS:
+                return jsonify({
+                    'success': False,
+                    'error': f'Invalid fields parameter (at most {MAX_ANALYSIS_FIELDS} dotted field names)',
+                    'invalid_fields': invalid
+                }), 400
+            # MongoDB rejects overlapping paths; a parent field already covers its children
+            fields = [f for f in fields if not any(f.startswith(other + '.') for other in fields)]
+
         # Check if report belongs to current user
         report = mongo.db.reports.find_one({
             "_id": ObjectId(report_id),
             "user_id": current_user["_id"]
-        })
+        }, {"_id": 1})
         if not report:
             return jsonify({'success': False, 'error': 'Report not found'}), 404
 
-        # Get analysis for that report
-        analysis = mongo.db.analyses.find_one({"report_id": ObjectId(report_id)})
-        if not analysis or "analysis_data" not in analysis:
+        # One read of the analysis header: its status, plus the rule-based result only
+        # while Gemini is still running or after it failed (a completed analysis
+        # projects it away server-side)
+        analysis = mongo.db.analyses.find_one({"report_id": report["_id"]}, {
+            **ANALYSIS_STATUS_PROJECTION,
+            "rule_based": {"$cond": [
+                {"$in": [analysis_status_expr(), ["pending", "failed"]]}, "$rule_based", "$$REMOVE"
+            ]},
+            "_id": 0
+        })
+        status = analysis_status(analysis)
+        rule_based = analysis.get("rule_based") if analysis else None
+
+        # Section documents (only those named in fields when given)
+        analysis_data = get_analysis_data(mongo.db, report["_id"], fields)
+        if not analysis and analysis_data is None:
             return jsonify({'success': False, 'error': 'No analysis found for this report'}), 404
 
         return jsonify({
             "success": True,
             "report_id": str(report_id),
-            "analysis": analysis["analysis_data"]
+            "provisional": status == "pending",
+            "analysis_status": status,
+            "analysis": analysis_data,
+            "rule_based": rule_based
         }), 200
 
     except Exception as e:
@@ -226,7 +348,7 @@ def get_report_analysis(current_user, report_id):
 # 📌 Get All Diet Data (no report_id)
 # ================================
 @report_bp.route('/<report_id>/diet', methods=['GET'])
-@token_required
+@claims_required
 def get_diet_by_report(current_user, report_id):
     """Return diet data for a specific report of the logged-in user."""
     try:
@@ -239,21 +361,35 @@ def get_diet_by_report(current_user, report_id):
             return jsonify({"success": False, "error": "Invalid report_id"}), 400
 
         # 2️⃣ Check that this report belongs to the current user
-        report = mongo.db.reports.find_one({"_id": report_obj_id, "user_id": current_user["_id"]})
+        report = mongo.db.reports.find_one({"_id": report_obj_id, "user_id": current_user["_id"]}, {"_id": 1})
         if not report:
             return jsonify({"success": False, "error": "Report not found or unauthorized"}), 404
 
-        # 3️⃣ Fetch diet data for this specific report
+        # 3️⃣ Fetch diet data for this specific report (only the diet section document)
+        diet_data = get_analysis_section(mongo.db, report_obj_id, "dietData")
+        if diet_data is not None:
+            return jsonify({
+                "success": True,
+                "report_id": report_id,
+                "provisional": False,
+                "analysis_status": "completed",
+                "dietData": diet_data
+            }), 200
+
         analysis = mongo.db.analyses.find_one(
             {"report_id": report_obj_id},
-            {"analysis_data.dietData": 1, "_id": 0}
+            {**ANALYSIS_STATUS_PROJECTION, "rule_based.recommendations.dietary": 1, "_id": 0}
         )
-
-        if analysis and "analysis_data" in analysis and "dietData" in analysis["analysis_data"]:
+        status = analysis_status(analysis)
+        if status in ("pending", "failed"):
+            # Gemini has not finished (or failed); serve the rule-based dietary recommendations
             return jsonify({
                 "success": True,
                 "report_id": report_id,
-                "dietData": analysis["analysis_data"]["dietData"]
+                "provisional": status == "pending",
+                "analysis_status": status,
+                "dietData": None,
+                "rule_based_dietary": analysis.get("rule_based", {}).get("recommendations", {}).get("dietary", [])
             }), 200
 
         return jsonify({"success": False, "error": "No diet data found for this report"}), 404
@@ -263,7 +399,7 @@ def get_diet_by_report(current_user, report_id):
         return jsonify({'success': False, 'error': 'Failed to fetch diet data'}), 500
     
 @report_bp.route('/last', methods=['GET'])
-@token_required
+@claims_required
 def get_last_report(current_user):
     """Return the last uploaded report of the logged-in user."""
     try:
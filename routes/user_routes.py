@@ -1,10 +1,16 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context, send_from_directory
+from bson import ObjectId
 import os
 import jwt
 from datetime import datetime, timedelta
 from utils.database import mongo
 from utils.config import Config
 from werkzeug.utils import secure_filename
+from services.user_stats import get_user_stats
+from services.user_cache import get_cached_user, invalidate_user
+from services.data_export import EXPORT_FORMATS, iter_export, start_export_job, export_job_status, export_folder
+from services.token_revocation import revocation_list
+from routes.auth_routes import verify_token_claims
 import logging
 
 # Set up logging
@@ -43,6 +49,10 @@ def verify_token_and_get_user():
             logger.error(f"❌ Invalid JWT token: {str(e)}")
             return None, {'error': 'Invalid token'}, 401
         
+        if payload.get('jti') and revocation_list.is_revoked(payload['jti']):
+            logger.error("❌ JWT token has been revoked")
+            return None, {'error': 'Token has been revoked'}, 401
+        
         # 🔥 FIX: token banate waqt 'sub' use ho raha hai, wahi read karo
         user_id = payload.get('sub')
         logger.debug(f"👤 User ID from token: {user_id}")
@@ -51,9 +61,9 @@ def verify_token_and_get_user():
             logger.error("❌ No user_id (sub) in token payload")
             return None, {'error': 'Invalid token payload'}, 401
         
-        # Use DatabaseHelpers to get user
-        logger.debug(f"🔍 Looking up user in database: {user_id}")
-        user = mongo.get_user_by_id(user_id)
+        # Cached for a few seconds; profile/preference/picture updates invalidate it
+        logger.debug(f"🔍 Looking up user: {user_id}")
+        user = get_cached_user(user_id)
         
         if not user:
             logger.error(f"❌ User not found in database with ID: {user_id}")
@@ -154,9 +164,10 @@ def get_user_profile():
         reports_count = 0
         analyses_count = 0
         try:
-            user_lookup_id = user.get('_id') # Use _id for queries
-            reports_count = mongo.db.reports.count_documents({'user_id': user_lookup_id})
-            analyses_count = mongo.db.analyses.count_documents({'user_id': user_lookup_id})
+            # Counters are maintained at write time in user_stats (one _id lookup)
+            stats = get_user_stats(mongo.db, user.get('_id'))
+            reports_count = stats.get('total_reports', 0)
+            analyses_count = stats.get('total_analyses', 0)
         except Exception as e:
             logger.error(f"💥 Database query for stats failed: {e}")
 
@@ -176,8 +187,13 @@ def get_user_profile():
             
             # --- YEH LINE ADD KARNI HAI ---
             # Database se profile picture ka URL bhi bhejein
-            'profile_pic_url': user.get('profile_pic_url')
+            'profile_pic_url': user.get('profile_pic_url'),
             # ---------------------------------
+
+            'statistics': {
+                'total_reports': reports_count,
+                'total_analyses': analyses_count
+            }
         }
         
         logger.debug("✅ Profile data prepared successfully")
@@ -227,6 +243,7 @@ def update_user_profile():
                 {'_id': user['_id']},
                 {'$set': update_data}
             )
+            invalidate_user(user['_id'])
             success = result.modified_count > 0
             logger.debug(f"Database update result: {result.modified_count} documents modified")
         except Exception as e:
@@ -272,6 +289,7 @@ def update_profile_picture():
             {'_id': user['_id']},
             {'$set': {'profile_pic_url': profile_pic_url}}
         )
+        invalidate_user(user['_id'])
 
         return jsonify({
             'success': True,
@@ -286,89 +304,63 @@ def update_profile_picture():
 def get_dashboard_data():
     """Get dashboard overview data"""
     try:
-        # Verify user
-        user, error, status_code = verify_token_and_get_user()
+        # Only the user's _id is needed; it comes from the token claims
+        user, error, status_code = verify_token_claims()
         if error:
             return jsonify(error), status_code
         
-        # Use the user's actual _id from the database object
         user_id = user.get('_id')
         
-        # Get basic counts
-        total_reports = mongo.db.reports.count_documents({'user_id': user_id})
-        
-        # Check if analysis collection exists
-        try:
-            total_analyses = mongo.db.analyses.count_documents({'user_id': user_id})
-        except Exception:
-            total_analyses = 0
-        
-        # Get recent reports (last 30 days)
+        # Totals, distributions and insight counts are maintained at write time
+        stats = get_user_stats(mongo.db, user_id)
+        total_reports = stats.get('total_reports', 0)
+        total_analyses = stats.get('total_analyses', 0)
+        reports_by_type = [{'_id': key, 'count': count} for key, count in stats.get('reports_by_type', {}).items() if count]
+        status_distribution = [{'_id': key, 'count': count} for key, count in stats.get('status_counts', {}).items() if count]
+
+        # Get recent reports (last 30 days): a range count on the (user_id, upload_date) index
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
         recent_reports = mongo.db.reports.count_documents({
             'user_id': user_id,
             'upload_date': {'$gte': thirty_days_ago}
         })
-        
-        # Get reports by type
-        pipeline_type = [
-            {'$match': {'user_id': user_id}},
-            {'$group': {
-                '_id': '$report_type',
-                'count': {'$sum': 1}
-            }}
-        ]
-        reports_by_type = list(mongo.db.reports.aggregate(pipeline_type))
-        
-        # Get processing status distribution
-        pipeline_status = [
+
+        # Get recent uploads with has_analysis joined through the unique report_id index
+        # (concise localField + pipeline $lookup, MongoDB 5.0+)
+        recent_uploads = mongo.db.reports.aggregate([
             {'$match': {'user_id': user_id}},
-            {'$group': {
-                '_id': '$processing_status',
-                'count': {'$sum': 1}
+            {'$sort': {'upload_date': -1}},
+            {'$limit': 10},
+            {'$project': {
+                'report_id': 1, 'filename': 1, 'original_filename': 1,
+                'report_type': 1, 'status': 1, 'upload_date': 1
+            }},
+            {'$lookup': {
+                'from': 'analyses',
+                'localField': '_id',
+                'foreignField': 'report_id',
+                'pipeline': [{'$limit': 1}, {'$project': {'_id': 1}}],
+                'as': 'analysis'
             }}
-        ]
-        status_distribution = list(mongo.db.reports.aggregate(pipeline_status))
-        
-        # Get recent uploads
-        recent_uploads = list(mongo.db.reports.find(
-            {'user_id': user_id}
-        ).sort('upload_date', -1).limit(10))
-        
+        ])
+
         formatted_uploads = []
         for report in recent_uploads:
-            analyses = None
-            try:
-                analyses = mongo.db.analyses.find_one({'report_id': report.get('report_id')})
-            except Exception:
-                pass
-                
             formatted_uploads.append({
-                'report_id': report.get('report_id'),
+                'report_id': report.get('report_id') or str(report['_id']),
                 'name': report.get('filename', report.get('original_filename', 'Unknown')),
                 'type': report.get('report_type', 'general'),
                 'upload_date': report.get('upload_date').isoformat() if isinstance(report.get('upload_date'), datetime) else 'Unknown',
-                'status': report.get('processing_status', 'unknown'),
-                'has_analysis': bool(analyses)
+                'status': report.get('status', 'unknown'),
+                'has_analysis': bool(report['analysis'])
             })
-        
-        # Get health insights summary
+
         health_insights = {
-            'total_medications_tracked': 0,
-            'total_risk_factors': 0,
-            'recommendations_count': 0
+            'total_medications_tracked': stats.get('total_medications_tracked', 0),
+            'total_risk_factors': stats.get('total_risk_factors', 0),
+            'recommendations_count': stats.get('recommendations_count', 0)
         }
-        
-        try:
-            all_analyses = list(mongo.db.analyses.find({'user_id': user_id}))
-            for analysis in all_analyses:
-                health_insights['total_medications_tracked'] += len(analysis.get('medications', []))
-                health_insights['total_risk_factors'] += len(analysis.get('risk_factors', []))
-                if analysis.get('recommendations'):
-                    health_insights['recommendations_count'] += 1
-        except Exception:
-            pass
-        
+
         dashboard_data = {
             'overview': {
                 'total_reports': total_reports,
@@ -455,11 +447,11 @@ def update_user_preferences():
             return jsonify({'error': 'Invalid preferences format'}), 400
         
         # Update preferences directly in database
-        user_id = user.get('user_id')
-        result = mongo.users_collection.update_one(
-            {'user_id': user_id}, 
+        result = mongo.db.users.update_one(
+            {'_id': user['_id']}, 
             {'$set': {'preferences': preferences, 'updated_at': datetime.utcnow()}}
         )
+        invalidate_user(user['_id'])
         
         if result.modified_count == 0:
             return jsonify({'error': 'Failed to update preferences'}), 500
@@ -471,65 +463,100 @@ def update_user_preferences():
 
 @user_bp.route('/export-data', methods=['POST'])
 def export_user_data():
-    """Export user's data (GDPR compliance)"""
+    """
+    Export user's data (GDPR compliance)
+
+    Query params:
+        format: 'ndjson' (default) or 'zip'
+        async: 'true' to write the file in the background (large accounts);
+               returns 202 with a job id and download link
+    """
     try:
         # Verify user
         user, error, status_code = verify_token_and_get_user()
         if error:
             return jsonify(error), status_code
-        
-        user_id = user.get('user_id')
-        
-        # Get all user data
-        user_data = {
-            'profile': {
-                'user_id': user_id,
-                'name': user.get('name'),
-                'email': user.get('email'),
-                'created_at': user['created_at'].isoformat() if user.get('created_at') else None,
-                'preferences': user.get('preferences', {})
-            },
-            'reports': [],
-            'analyses': []
-        }
-        
-        # Get reports
-        reports = list(mongo.reports_collection.find({'user_id': user_id}))
-        for report in reports:
-            user_data['reports'].append({
-                'report_id': report.get('report_id'),
-                'name': report.get('filename', report.get('original_filename', '')),
-                'type': report.get('report_type', ''),
-                'upload_date': report['upload_date'].isoformat() if report.get('upload_date') else None,
-                'status': report.get('processing_status', ''),
-                'extracted_text': report.get('ocr_data', {}).get('raw_text', '')
-            })
-        
-        # Get analyses if collection exists
-        try:
-            analyses = list(mongo.db.analyses.find({'user_id': user_id}))
-            for analysis in analyses:
-                user_data['analyses'].append({
-                    'analysis_id': analysis.get('analysis_id'),
-                    'report_id': analysis.get('report_id'),
-                    'created_at': analysis['created_at'].isoformat() if analysis.get('created_at') else None,
-                    'insights': analysis.get('insights', {}),
-                    'recommendations': analysis.get('recommendations', {}),
-                    'medications': analysis.get('medications', []),
-                    'risk_factors': analysis.get('risk_factors', [])
-                })
-        except:
-            # If analysis collection doesn't exist, keep empty array
-            pass
-        
+
+        fmt = request.args.get('format', 'ndjson').lower()
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({'error': f"Unsupported format '{fmt}'", 'available_formats': list(EXPORT_FORMATS)}), 400
+
+        if request.args.get('async', 'false').lower() in ('true', '1', 'yes'):
+            job = start_export_job(current_app._get_current_object(), user['_id'], fmt)
+            return jsonify({
+                'message': 'Data export started',
+                'job_id': str(job['_id']),
+                'status': job['status'],
+                'status_url': f"/api/user/export-data/{job['_id']}",
+                'download_url': f"/api/user/export-data/{job['_id']}/download"
+            }), 202
+
+        # Stream records straight from MongoDB cursors instead of building the export in memory
+        mimetype, extension = EXPORT_FORMATS[fmt]
+        filename = f"mediguide_export_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{extension}"
+        return Response(
+            stream_with_context(iter_export(mongo.db, user, fmt)),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        )
+
+    except Exception as e:
+        return jsonify({'error': f'Data export failed: {str(e)}'}), 500
+
+@user_bp.route('/export-data/<job_id>', methods=['GET'])
+def get_export_job(job_id):
+    """Status of a background data export"""
+    try:
+        user, error, status_code = verify_token_claims()
+        if error:
+            return jsonify(error), status_code
+
+        job = mongo.db.export_jobs.find_one({'_id': ObjectId(job_id), 'user_id': user['_id']})
+        if not job:
+            return jsonify({'error': 'Export job not found'}), 404
+
+        status = export_job_status(job)
         return jsonify({
-            'message': 'Data export prepared',
-            'data': user_data,
-            'export_date': datetime.utcnow().isoformat()
+            'job_id': str(job['_id']),
+            'format': job['format'],
+            'status': status,
+            'created_at': job['created_at'].isoformat(),
+            'completed_at': job['completed_at'].isoformat() if job.get('completed_at') else None,
+            'expires_at': job['expires_at'].isoformat() if job.get('expires_at') else None,
+            'size_bytes': job.get('size_bytes'),
+            'error': job.get('error') or ('Export timed out' if status == 'failed' else None),
+            'download_url': f"/api/user/export-data/{job['_id']}/download" if status == 'completed' else None
         }), 200
-    
+
     except Exception as e:
-        return jsonify({'error': f'Data export failed: {str(e)}'}), 500
+        return jsonify({'error': f'Failed to fetch export job: {str(e)}'}), 500
+
+@user_bp.route('/export-data/<job_id>/download', methods=['GET'])
+def download_export(job_id):
+    """Download the file written by a completed background export"""
+    try:
+        user, error, status_code = verify_token_claims()
+        if error:
+            return jsonify(error), status_code
+
+        job = mongo.db.export_jobs.find_one({'_id': ObjectId(job_id), 'user_id': user['_id']})
+        if not job:
+            return jsonify({'error': 'Export job not found'}), 404
+        status = export_job_status(job)
+        if status == 'expired':
+            return jsonify({'error': 'Export has expired; please request a new one', 'status': status}), 410
+        if status != 'completed':
+            return jsonify({'error': 'Export is not ready yet', 'status': status}), 409
+
+        return send_from_directory(
+            export_folder(current_app),
+            job['filename'],
+            mimetype=EXPORT_FORMATS[job['format']][0],
+            as_attachment=True
+        )
+
+    except Exception as e:
+        return jsonify({'error': f'Export download failed: {str(e)}'}), 500
     
 @user_bp.route('/reportsanalysis', methods=['GET'])
 def get_user_reportsanalysis():
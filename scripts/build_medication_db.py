@@ -0,0 +1,36 @@
+# /scripts/build_medication_db.py
+"""
+Build the read-only medication store from a CSV or JSON formulary export.
+
+Usage:
+    python -m scripts.build_medication_db formulary.csv
+    python -m scripts.build_medication_db data/medical_knowledge.json -o data/medications.sqlite3
+
+CSV sources need a `name` column; `side_effects`, `interactions` and `aliases`
+are ';'-separated lists, any other column is stored as-is.
+
+The store also gets the symmetric-delete table used for fuzzy medication
+matching; stores built before it existed should be rebuilt.
+"""
+
+import argparse
+import logging
+
+from utils.config import Config
+from services.medication_store import build_medication_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the memory-mapped medication store.')
+    parser.add_argument('source', help='CSV or JSON formulary source file')
+    parser.add_argument('-o', '--output', default=Config.MEDICATION_DB_PATH,
+                        help='Target SQLite file (default: Config.MEDICATION_DB_PATH)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    count = build_medication_store(args.source, args.output)
+    print(f"Wrote {count} medications to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
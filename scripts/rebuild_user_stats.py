@@ -0,0 +1,54 @@
+# /scripts/rebuild_user_stats.py
+"""
+Recompute the materialized user_stats documents from reports and analyses.
+
+The counters are kept up to date with $inc on every write; run this to
+repair drift (e.g. after manual database edits or a failed write), or with
+--pending to complete the documents writes created with needs_rebuild.
+
+Usage:
+    python -m scripts.rebuild_user_stats
+    python -m scripts.rebuild_user_stats --user-id 64f1c0d2e4b0a1b2c3d4e5f6
+    python -m scripts.rebuild_user_stats --pending
+"""
+
+import argparse
+import logging
+
+from bson import ObjectId
+from pymongo import MongoClient
+
+from utils.config import Config
+from utils.database import mongo_client_options
+from services.user_stats import rebuild_user_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild per-user statistics documents.')
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--user-id', help='Only rebuild this user (default: every user with reports or stats)')
+    target.add_argument('--pending', action='store_true', help='Only rebuild stats documents marked needs_rebuild')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    client = MongoClient(Config.MONGO_URI, **mongo_client_options())
+    try:
+        db = client[Config.DATABASE_NAME]
+        if args.user_id:
+            user_ids = [ObjectId(args.user_id)]
+        elif args.pending:
+            user_ids = db.user_stats.distinct('_id', {'needs_rebuild': True})
+        else:
+            user_ids = set(db.users.distinct('_id')) | set(db.user_stats.distinct('_id'))
+
+        for user_id in user_ids:
+            stats = rebuild_user_stats(db, user_id)
+            print(f"{user_id}: {stats['total_reports']} reports, {stats['total_analyses']} analyses")
+        print(f"Rebuilt stats for {len(user_ids)} users")
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
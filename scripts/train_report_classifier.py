@@ -0,0 +1,97 @@
+# /scripts/train_report_classifier.py
+"""
+Train the TF-IDF report-type classifier and save it as a model artifact.
+
+Training data comes from stored reports with a reviewed label in
+`labels.report_type` (written when a user confirms or corrects the type through
+PUT /api/reports/<id>/type) and OCR text in `ocr_data.raw_text`, or from a
+JSONL file of {"text": ..., "label": ...} records. The upload pipeline fills
+`report_type` with the classifier's own prediction (report_type_source:
+'classifier'), so that field is never used as a label.
+
+Usage:
+    python -m scripts.train_report_classifier --from-mongo
+    python -m scripts.train_report_classifier --from-jsonl labelled_reports.jsonl -o data/report_classifier.joblib
+"""
+
+import json
+import argparse
+import logging
+from collections import Counter
+
+from pymongo import MongoClient
+
+from utils.config import Config
+from utils.database import mongo_client_options
+from services.report_classifier import ReportClassifier, REPORT_TYPES
+
+
+def load_from_mongo(limit):
+    """Yield (text, label) pairs from reports with a reviewed type label and stored OCR text"""
+    client = MongoClient(Config.MONGO_URI, **mongo_client_options())
+    try:
+        db = client[Config.DATABASE_NAME]
+        cursor = db.reports.find(
+            {
+                'labels.report_type': {'$in': list(REPORT_TYPES)},
+                # A label copied over from a prediction would teach the model its own output
+                'labels.source': {'$ne': 'classifier'},
+                'ocr_data.raw_text': {'$exists': True, '$ne': ''}
+            },
+            {'labels.report_type': 1, 'ocr_data.raw_text': 1, '_id': 0},
+            batch_size=500
+        )
+        if limit:
+            cursor = cursor.limit(limit)
+        for doc in cursor:
+            yield doc['ocr_data']['raw_text'], doc['labels']['report_type']
+    finally:
+        client.close()
+
+
+def load_from_jsonl(path):
+    """Yield (text, label) pairs from a JSONL file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield record['text'], record['label']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the report-type classifier.')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--from-mongo', action='store_true', help='Train on stored reports with a reviewed labels.report_type')
+    source.add_argument('--from-jsonl', metavar='PATH', help='Train on a JSONL file of {"text", "label"} records')
+    parser.add_argument('--limit', type=int, default=0, help='Maximum number of stored reports to use')
+    parser.add_argument('--test-size', type=float, default=0.2, help='Held-out fraction for evaluation')
+    parser.add_argument('-o', '--output', default=Config.REPORT_CLASSIFIER_PATH,
+                        help='Artifact path (default: Config.REPORT_CLASSIFIER_PATH)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    pairs = list(load_from_mongo(args.limit) if args.from_mongo else load_from_jsonl(args.from_jsonl))
+    if not pairs:
+        raise SystemExit('No labelled reports found.')
+    texts, labels = zip(*pairs)
+    print(f"Loaded {len(texts)} reports: {dict(Counter(labels))}")
+
+    if args.test_size > 0 and len(set(labels)) > 1 and len(texts) >= 10:
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import classification_report
+
+        train_texts, test_texts, train_labels, test_labels = train_test_split(
+            texts, labels, test_size=args.test_size, random_state=42, stratify=labels
+        )
+        evaluation = ReportClassifier.train(train_texts, train_labels)
+        print(classification_report(test_labels, evaluation.predict_batch(test_texts)))
+
+    # The shipped artifact is trained on all available data
+    classifier = ReportClassifier.train(texts, labels)
+    classifier.save(args.output)
+    print(f"Saved classifier to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+# /services/analysis_pipeline.py
+
+import logging
+from datetime import datetime
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Any, Optional, Tuple
+
+from bson import ObjectId
+
+from utils.config import Config
+from services.gemini_model import get_master_analysis
+from services.medical_analyzer import MedicalAnalyzer
+from services.recommendation_engine import RecommendationEngine
+from utils.database import run_in_transaction
+from services.user_stats import update_report, record_analysis_inserted, record_report_inserted, analysis_counters
+from services.analysis_store import ANALYSIS_SECTIONS, save_analysis_sections
+
+logger = logging.getLogger(__name__)
+
+# Background Gemini calls for requests that return before the analysis is done
+# (upload with ?wait=false). Requests that wait run Gemini on their own thread instead,
+# so they never queue behind other uploads. Threads start lazily, i.e. after a gunicorn fork.
+_gemini_executor = ThreadPoolExecutor(max_workers=Config.GEMINI_WORKERS, thread_name_prefix='gemini')
+
+
+def build_rule_based_analysis(text: str) -> Dict[str, Any]:
+    """Run the local analyzer and recommendation engine (milliseconds, no network)"""
+    analysis = MedicalAnalyzer().analyze_report(text)
+    recommendations = RecommendationEngine().generate_recommendations(analysis)
+    return {'analysis': analysis, 'recommendations': recommendations}
+
+
+def _try_rule_based_analysis(report_id, text: str) -> Optional[Dict[str, Any]]:
+    try:
+        return build_rule_based_analysis(text)
+    except Exception as e:
+        # Quick results are best-effort; the Gemini result is still on its way
+        logger.error(f"Rule-based analysis failed for report {report_id}: {e}")
+        return None
+
+
+def _provisional_header(report_id, user_id, rule_based: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'user_id': user_id,
+        'report_id': report_id,
+        'rule_based': rule_based,
+        'provisional': True,
+        'analysis_status': 'pending',
+        'created_at': datetime.utcnow()
+    }
+
+
+def save_uploaded_report(db, report: Dict[str, Any], text: Optional[str]) -> Tuple[ObjectId, Optional[Dict[str, Any]]]:
+    """
+    Persist a freshly uploaded report in its post-OCR state in one write sequence.
+
+    The report is inserted once with its final status, detected type and OCR
+    text, together with the provisional (rule-based) analysis header, the
+    user's last_report_id and the stats counters, inside a transaction when
+    the deployment supports it. A failed OCR (text is None) is inserted as
+    'ocr_failed' the same way, so no half-written 'processing' report is left
+    behind.
+
+    Returns:
+        Tuple of (report id, rule-based result or None)
+    """
+    report_id = report.setdefault('_id', ObjectId())
+    rule_based = None
+    if not text:
+        report['status'] = 'ocr_failed'
+    else:
+        rule_based = _try_rule_based_analysis(report_id, text)
+        report['ocr_data'] = {'raw_text': text}
+        if rule_based is not None:
+            report['status'] = 'provisional'
+            report['report_type'] = rule_based['analysis'].get('report_type', 'general')
+            # Predicted, not reviewed: the classifier is never retrained on this field
+            report['report_type_source'] = 'classifier'
+
+    def write(session):
+        db.reports.insert_one(report, session=session)
+        header = None
+        if rule_based is not None:
+            header = _provisional_header(report_id, report['user_id'], rule_based)
+            db.analyses.insert_one(header, session=session)
+        db.users.update_one({'_id': report['user_id']}, {'$set': {'last_report_id': report_id}}, session=session)
+        record_report_inserted(db, report, analysis=header, session=session)
+
+    run_in_transaction(write)
+    return report_id, rule_based
+
+
+def save_provisional_analysis(mongo, report_id, user_id, rule_based: Dict[str, Any]) -> None:
+    """Persist the rule-based result for an existing report before Gemini finishes"""
+    def write(session):
+        # $setOnInsert / the status filter keep a Gemini result that already landed from being
+        # marked provisional again
+        result = mongo.db.analyses.update_one(
+            {'report_id': report_id},
+            {
+                '$set': {'rule_based': rule_based},
+                '$setOnInsert': {
+                    'user_id': user_id,
+                    'report_id': report_id,
+                    'provisional': True,
+                    'analysis_status': 'pending',
+                    'created_at': datetime.utcnow()
+                }
+            },
+            upsert=True,
+            session=session
+        )
+        inserted = analysis_counters({}) if result.upserted_id is not None else {}
+        # A newly created analysis is counted in the same $inc as the status change
+        matched = update_report(
+            mongo.db,
+            {'_id': report_id, 'status': 'processing'},
+            {
+                'status': 'provisional',
+                'report_type': rule_based['analysis'].get('report_type', 'general'),
+                'report_type_source': 'classifier'
+            },
+            counters=inserted,
+            session=session
+        )
+        if matched is None and inserted:
+            record_analysis_inserted(mongo.db, user_id, {}, session=session)
+
+    run_in_transaction(write)
+
+
+def run_gemini_analysis(app, report_id, user_id, text: str) -> Dict[str, Any]:
+    """
+    Call Gemini and replace the provisional analysis with its result.
+
+    Runs on the calling thread; use submit_gemini_analysis when the caller
+    does not wait for the result.
+    """
+    analysis_result = get_master_analysis(text)
+
+    with app.app_context():
+        mongo = app.mongo
+        if not analysis_result or "error" in analysis_result:
+            analysis_result = analysis_result or {"error": "Empty response from Gemini."}
+            mark_analysis_failed(mongo, report_id, user_id, analysis_result['error'])
+            return analysis_result
+
+        for key in ANALYSIS_SECTIONS:
+            analysis_result.setdefault(key, {})
+
+        def write(session):
+            # Sections first, so (without a transaction) a reader that sees
+            # provisional=False finds them
+            save_analysis_sections(mongo.db, report_id, user_id, analysis_result, session=session)
+            result = mongo.db.analyses.update_one(
+                {'report_id': report_id},
+                {
+                    '$set': {
+                        'user_id': user_id,
+                        'report_id': report_id,
+                        'provisional': False,
+                        'analysis_status': 'completed',
+                        'created_at': datetime.utcnow()
+                    },
+                    # Re-analyzed legacy documents drop their pre-split blob (and a
+                    # previous run's failure)
+                    '$unset': {'analysis_data': '', 'analysis_error': ''}
+                },
+                upsert=True,
+                session=session
+            )
+            # The final status and any new analysis count land in one report update + $inc
+            update_report(
+                mongo.db,
+                {'_id': report_id},
+                {'status': 'completed'},
+                counters=analysis_counters({}) if result.upserted_id is not None else None,
+                session=session
+            )
+
+        run_in_transaction(write)
+        logger.info(f"Gemini analysis stored for report {report_id}")
+        return analysis_result
+
+
+def mark_analysis_failed(mongo, report_id, user_id, error) -> None:
+    """
+    Record that Gemini will not deliver an analysis for the report.
+
+    The rule-based result stays available but is final now: clients stop
+    waiting for the AI analysis. The header is created if the rule-based step
+    never wrote one, so the failure is always visible.
+    """
+    def write(session):
+        result = mongo.db.analyses.update_one(
+            {'report_id': report_id},
+            {
+                '$set': {
+                    'provisional': False,
+                    'analysis_status': 'failed',
+                    'analysis_error': str(error)
+                },
+                '$setOnInsert': {
+                    'user_id': user_id,
+                    'report_id': report_id,
+                    'created_at': datetime.utcnow()
+                }
+            },
+            upsert=True,
+            session=session
+        )
+        update_report(
+            mongo.db,
+            {'_id': report_id},
+            {'status': 'analysis_failed'},
+            counters=analysis_counters({}) if result.upserted_id is not None else None,
+            session=session
+        )
+
+    run_in_transaction(write)
+    logger.error(f"Gemini analysis failed for report {report_id}: {error}")
+
+
+def _record_background_failure(app, report_id, user_id, future: Future) -> None:
+    """Done-callback: a background run that raised must not leave the analysis pending"""
+    error = future.exception()
+    if error is None:
+        return
+    logger.error(f"Background Gemini analysis crashed for report {report_id}: {error}")
+    try:
+        with app.app_context():
+            mark_analysis_failed(app.mongo, report_id, user_id, error)
+    except Exception as e:
+        # Still reported as failed once GEMINI_ANALYSIS_TIMEOUT_MINUTES have passed
+        logger.error(f"Could not record the failed analysis of report {report_id}: {e}")
+
+
+def submit_gemini_analysis(app, report_id, user_id, text: str) -> Future:
+    """
+    Run Gemini for an already persisted report in the background.
+
+    Returns:
+        Future resolving to the Gemini analysis, or a dict with an 'error' key
+    """
+    future = _gemini_executor.submit(run_gemini_analysis, app, report_id, user_id, text)
+    future.add_done_callback(partial(_record_background_failure, app, report_id, user_id))
+    return future
+
+
+def start_analysis(app, report_id, user_id, text: str) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """
+    Persist the rule-based result right away, then run Gemini on this thread.
+
+    Used to (re-)analyze a report that already exists; uploads go through
+    save_uploaded_report + run/submit_gemini_analysis instead. The rule-based
+    step takes milliseconds, so running Gemini after it (instead of on the
+    shared pool while the caller waits) costs nothing and cannot queue.
+
+    Args:
+        app: The Flask application
+        report_id: ObjectId of the report being analyzed
+        user_id: ObjectId of the owning user
+        text: OCR text of the report
+
+    Returns:
+        Tuple of (the Gemini analysis or a dict with an 'error' key, the
+        provisional rule-based result or None if it failed)
+    """
+    rule_based = _try_rule_based_analysis(report_id, text)
+    if rule_based is not None:
+        try:
+            save_provisional_analysis(app.mongo, report_id, user_id, rule_based)
+        except Exception as e:
+            logger.error(f"Saving the rule-based analysis failed for report {report_id}: {e}")
+
+    return run_gemini_analysis(app, report_id, user_id, text), rule_based
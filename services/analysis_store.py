@@ -0,0 +1,147 @@
+# /services/analysis_store.py
+
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Top-level sections of a Gemini master analysis; each is stored as its own
+# analysis_sections document keyed by (report_id, section)
+ANALYSIS_SECTIONS = ("dashboardData", "insightsData", "dietData")
+
+# analyses.analysis_status: 'pending' while Gemini runs (provisional), then 'completed' or 'failed'
+ANALYSIS_STATUS_PROJECTION = {'provisional': 1, 'analysis_status': 1, 'created_at': 1}
+
+
+def _pending_cutoff() -> datetime:
+    return datetime.utcnow() - timedelta(minutes=Config.GEMINI_ANALYSIS_TIMEOUT_MINUTES)
+
+
+def analysis_status(header: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Effective status of an analysis header.
+
+    Headers written before the field existed derive it from 'provisional'. A
+    header still pending GEMINI_ANALYSIS_TIMEOUT_MINUTES after it was created is
+    reported as 'failed': the worker running Gemini died without recording it.
+    """
+    if not header:
+        return None
+    status = header.get('analysis_status') or ('pending' if header.get('provisional') else 'completed')
+    if status == 'pending' and header.get('created_at') and header['created_at'] < _pending_cutoff():
+        return 'failed'
+    return status
+
+
+def analysis_status_expr() -> Dict[str, Any]:
+    """The same derivation as analysis_status(), for server-side projections"""
+    stored = {'$ifNull': ['$analysis_status', {'$cond': ['$provisional', 'pending', 'completed']}]}
+    cutoff = _pending_cutoff()
+    return {'$cond': [
+        {'$and': [{'$eq': [stored, 'pending']}, {'$lt': [{'$ifNull': ['$created_at', cutoff]}, cutoff]}]},
+        'failed',
+        stored
+    ]}
+
+
+def save_analysis_sections(db, report_id, user_id, analysis_data: Dict[str, Any], session=None) -> None:
+    """Write every top-level section of an analysis as its own document (one bulk round trip)"""
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne(
+            {'report_id': report_id, 'section': section},
+            {
+                '$set': {'data': data, 'user_id': user_id, 'updated_at': now},
+                '$setOnInsert': {'created_at': now}
+            },
+            upsert=True
+        )
+        for section, data in analysis_data.items()
+    ]
+    if operations:
+        db.analysis_sections.bulk_write(operations, ordered=False, session=session)
+
+
+def save_analysis_section(db, report_id, user_id, section: str, data: Any) -> None:
+    """Write a single section, leaving the others untouched"""
+    save_analysis_sections(db, report_id, user_id, {section: data})
+
+
+def _section_projection(section: str, fields: Optional[Iterable[str]], prefix: str) -> Dict[str, int]:
+    """Projection for sub-paths of one section, or the whole section if none are given"""
+    fields = list(fields or [])
+    if not fields:
+        return {prefix: 1}
+    return {f"{prefix}.{field}": 1 for field in fields}
+
+
+def get_analysis_section(db, report_id, section: str, fields: Optional[Iterable[str]] = None) -> Optional[Any]:
+    """
+    Read one section of a report's analysis.
+
+    Args:
+        db: Database handle
+        report_id: ObjectId of the report
+        section: Section name, e.g. 'insightsData'
+        fields: Optional sub-paths within the section to project
+
+    Returns:
+        The section data, or None if the report has no such section
+    """
+    projection = _section_projection(section, fields, 'data')
+    projection['_id'] = 0
+    doc = db.analysis_sections.find_one({'report_id': report_id, 'section': section}, projection)
+    if doc is not None:
+        return doc.get('data')
+
+    # Analyses written before the split keep the whole blob in analyses.analysis_data
+    projection = _section_projection(section, fields, f"analysis_data.{section}")
+    projection['_id'] = 0
+    legacy = db.analyses.find_one({'report_id': report_id}, projection)
+    if legacy and section in legacy.get('analysis_data', {}):
+        return legacy['analysis_data'][section]
+    return None
+
+
+def get_analysis_data(db, report_id, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Assemble a report's analysis from its section documents.
+
+    Args:
+        db: Database handle
+        report_id: ObjectId of the report
+        fields: Optional dotted paths ('dietData' or 'dashboardData.keyMetrics');
+                only the sections they name are read
+
+    Returns:
+        Dict of section name -> data, or None if the report has no analysis
+    """
+    if fields:
+        by_section: Dict[str, List[str]] = {}
+        for field in fields:
+            section, _, sub_path = field.partition('.')
+            paths = by_section.setdefault(section, [])
+            # A whole-section request (None) wins over its sub-paths
+            if paths is not None and sub_path:
+                paths.append(sub_path)
+            else:
+                by_section[section] = None
+
+        data = {}
+        for section, paths in by_section.items():
+            value = get_analysis_section(db, report_id, section, paths)
+            if value is not None:
+                data[section] = value
+        return data or None
+
+    docs = list(db.analysis_sections.find({'report_id': report_id}, {'section': 1, 'data': 1, '_id': 0}))
+    if docs:
+        return {doc['section']: doc.get('data') for doc in docs}
+
+    legacy = db.analyses.find_one({'report_id': report_id}, {'analysis_data': 1, '_id': 0})
+    return legacy.get('analysis_data') if legacy else None
@@ -0,0 +1,288 @@
+# /services/data_export.py
+
+import os
+import json
+import time
+import uuid
+import logging
+import zipfile
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator
+
+from bson import ObjectId
+
+from utils.config import Config
+from services.analysis_store import analysis_status
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'zip': ('application/zip', 'zip'),
+}
+
+# Background export files are named export_<uuid>.<ext> inside EXPORT_FOLDER
+EXPORT_FILE_PREFIX = 'export_'
+
+# Export files are written off the request thread; threads start lazily (after a fork)
+_export_executor = ThreadPoolExecutor(max_workers=Config.EXPORT_WORKERS, thread_name_prefix='export')
+
+
+def _json_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dumps(record: Dict[str, Any]) -> str:
+    return json.dumps(record, default=_json_default, ensure_ascii=False)
+
+
+def _profile_record(user: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'type': 'profile',
+        'user_id': user.get('_id'),
+        'name': user.get('name'),
+        'email': user.get('email'),
+        'created_at': user.get('created_at'),
+        'preferences': user.get('preferences', {})
+    }
+
+
+def iter_export_records(db, user: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the user's data one record at a time from server-side cursors.
+
+    Records are tagged with 'type': profile, report, analysis or analysis_section.
+    Only one batch (Config.EXPORT_BATCH_SIZE documents) per collection is held
+    in memory at any time.
+    """
+    user_id = user['_id']
+    yield _profile_record(user)
+
+    reports = db.reports.find(
+        {'user_id': user_id},
+        {'original_filename': 1, 'report_type': 1, 'upload_date': 1, 'status': 1, 'ocr_data.raw_text': 1},
+        batch_size=Config.EXPORT_BATCH_SIZE
+    ).sort([('upload_date', -1), ('_id', -1)])
+    for report in reports:
+        yield {
+            'type': 'report',
+            'report_id': report['_id'],
+            'name': report.get('original_filename', ''),
+            'report_type': report.get('report_type', ''),
+            'upload_date': report.get('upload_date'),
+            'status': report.get('status', ''),
+            'extracted_text': report.get('ocr_data', {}).get('raw_text', '')
+        }
+
+    analyses = db.analyses.find(
+        {'user_id': user_id},
+        {'report_id': 1, 'created_at': 1, 'provisional': 1, 'analysis_status': 1, 'rule_based': 1, 'analysis_data': 1},
+        batch_size=Config.EXPORT_BATCH_SIZE
+    )
+    for analysis in analyses:
+        status = analysis_status(analysis)
+        record = {
+            'type': 'analysis',
+            'report_id': analysis.get('report_id'),
+            'created_at': analysis.get('created_at'),
+            'provisional': status == 'pending',
+            'analysis_status': status,
+            'rule_based': analysis.get('rule_based')
+        }
+        # Analyses saved before the section split carry their sections inline
+        if 'analysis_data' in analysis:
+            record['analysis_data'] = analysis['analysis_data']
+        yield record
+
+    sections = db.analysis_sections.find(
+        {'user_id': user_id},
+        {'report_id': 1, 'section': 1, 'data': 1, 'updated_at': 1},
+        batch_size=Config.EXPORT_BATCH_SIZE
+    )
+    for section in sections:
+        yield {
+            'type': 'analysis_section',
+            'report_id': section.get('report_id'),
+            'section': section.get('section'),
+            'updated_at': section.get('updated_at'),
+            'data': section.get('data')
+        }
+
+
+def iter_ndjson(db, user: Dict[str, Any]) -> Iterator[str]:
+    """Stream the export as newline-delimited JSON, one record per line"""
+    for record in iter_export_records(db, user):
+        yield _dumps(record) + '\n'
+
+
+class _ChunkBuffer:
+    """Write-only, non-seekable sink that hands out what was written since the last drain"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_zip(db, user: Dict[str, Any]) -> Iterator[bytes]:
+    """
+    Stream the export as a ZIP with one NDJSON member per record type.
+
+    zipfile writes to a non-seekable sink using data descriptors, so each
+    compressed chunk is yielded as soon as it is produced.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        member, member_type = None, None
+        for record in iter_export_records(db, user):
+            if record['type'] != member_type:
+                if member is not None:
+                    member.close()
+                member_type = record['type']
+                # Size is unknown up front; force_zip64 lifts the 4 GB member limit
+                member = archive.open(f"{member_type}.ndjson", 'w', force_zip64=True)
+            member.write((_dumps(record) + '\n').encode('utf-8'))
+            chunk = buffer.drain()
+            if chunk:
+                yield chunk
+        if member is not None:
+            member.close()
+    yield buffer.drain()
+
+
+def iter_export(db, user: Dict[str, Any], fmt: str):
+    return iter_zip(db, user) if fmt == 'zip' else iter_ndjson(db, user)
+
+
+def _write_export_file(app, job_id: ObjectId, user_id: ObjectId, fmt: str, path: str) -> None:
+    """Background job: stream the export into EXPORT_FOLDER and record the outcome"""
+    with app.app_context():
+        db = app.mongo.db
+        db.export_jobs.update_one({'_id': job_id}, {'$set': {'status': 'running'}})
+        tmp_path = f"{path}.tmp"
+        try:
+            user = db.users.find_one({'_id': user_id}, {'name': 1, 'email': 1, 'created_at': 1, 'preferences': 1})
+            mode = 'wb' if fmt == 'zip' else 'w'
+            with open(tmp_path, mode, **({} if fmt == 'zip' else {'encoding': 'utf-8'})) as f:
+                for chunk in iter_export(db, user, fmt):
+                    f.write(chunk)
+            os.replace(tmp_path, path)
+            db.export_jobs.update_one(
+                {'_id': job_id},
+                {'$set': {'status': 'completed', 'completed_at': datetime.utcnow(), 'size_bytes': os.path.getsize(path)}}
+            )
+            logger.info(f"Export {job_id} for user {user_id} written to {path}")
+        except Exception as e:
+            logger.error(f"Export {job_id} for user {user_id} failed: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            db.export_jobs.update_one({'_id': job_id}, {'$set': {'status': 'failed', 'error': str(e)}})
+
+
+def start_export_job(app, user_id: ObjectId, fmt: str) -> Dict[str, Any]:
+    """
+    Queue a background export of the user's data.
+
+    Returns:
+        The export_jobs document; the file lands in EXPORT_FOLDER, which no
+        route serves (downloads go through the authenticated endpoint), and is
+        deleted after EXPORT_RETENTION_HOURS
+    """
+    now = datetime.utcnow()
+    job = {
+        'user_id': user_id,
+        'format': fmt,
+        'status': 'pending',
+        'filename': f"{EXPORT_FILE_PREFIX}{uuid.uuid4().hex}.{EXPORT_FORMATS[fmt][1]}",
+        'created_at': now,
+        'expires_at': now + timedelta(hours=Config.EXPORT_RETENTION_HOURS)
+    }
+    job['_id'] = app.mongo.db.export_jobs.insert_one(job).inserted_id
+
+    path = os.path.join(export_folder(app), job['filename'])
+    _export_executor.submit(_write_export_file, app, job['_id'], user_id, fmt, path)
+    # Each new job also sweeps out the expired ones
+    _export_executor.submit(purge_expired_exports, app)
+    return job
+
+
+def export_folder(app) -> str:
+    return os.path.abspath(app.config['EXPORT_FOLDER'])
+
+
+def _remove_export_file(folder: str, filename: str) -> None:
+    for path in (os.path.join(folder, filename), os.path.join(folder, f"{filename}.tmp")):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def export_job_status(job: Dict[str, Any]) -> str:
+    """Effective status: 'expired' past expires_at, 'failed' if stuck pending/running past the timeout"""
+    now = datetime.utcnow()
+    if job.get('expires_at') and job['expires_at'] <= now:
+        return 'expired'
+    if job['status'] in ('pending', 'running') and \
+            job['created_at'] < now - timedelta(minutes=Config.EXPORT_JOB_TIMEOUT_MINUTES):
+        return 'failed'
+    return job['status']
+
+
+def purge_expired_exports(app) -> int:
+    """
+    Delete expired export jobs with their files, fail stale jobs and remove orphaned files.
+
+    Returns:
+        Number of expired jobs removed
+    """
+    with app.app_context():
+        db = app.mongo.db
+        folder = export_folder(app)
+        now = datetime.utcnow()
+        removed = 0
+        try:
+            for job in db.export_jobs.find({'expires_at': {'$lte': now}}, {'filename': 1}):
+                _remove_export_file(folder, job['filename'])
+                db.export_jobs.delete_one({'_id': job['_id']})
+                removed += 1
+
+            # A worker that died mid-export never updates its job
+            db.export_jobs.update_many(
+                {
+                    'status': {'$in': ['pending', 'running']},
+                    'created_at': {'$lt': now - timedelta(minutes=Config.EXPORT_JOB_TIMEOUT_MINUTES)}
+                },
+                {'$set': {'status': 'failed', 'error': 'Export timed out'}}
+            )
+
+            # Files whose job document is gone (TTL index, crashes) are removed by age, as are
+            # exports left in PROCESSED_FOLDER, where they were written before EXPORT_FOLDER
+            cutoff = time.time() - Config.EXPORT_RETENTION_HOURS * 3600
+            for directory in {folder, os.path.abspath(app.config['PROCESSED_FOLDER'])}:
+                if not os.path.isdir(directory):
+                    continue
+                for entry in os.scandir(directory):
+                    if entry.name.startswith(EXPORT_FILE_PREFIX) and entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+        except Exception as e:
+            logger.error(f"Purging expired exports failed: {e}")
+        if removed:
+            logger.info(f"Removed {removed} expired data exports")
+        return removed
+
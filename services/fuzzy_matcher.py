@@ -0,0 +1,161 @@
+# /services/fuzzy_matcher.py
+
+import logging
+from functools import lru_cache
+from typing import Dict, List, Optional, Iterable, Set
+
+from services.knowledge_base import get_knowledge_base
+from services.interaction_index import get_interaction_index
+from services.medication_store import get_medication_store
+
+logger = logging.getLogger(__name__)
+
+# Largest edit distance FuzzyIndex allows; the medication store's deletes table is built to it
+MAX_EDIT_DISTANCE = 2
+# Distinct normalized tokens whose match() result each index remembers
+MATCH_CACHE_SIZE = 8192
+
+
+def normalize_term(term: str) -> str:
+    return ' '.join(term.lower().split())
+
+
+def delete_variants(term: str, distance: int) -> Set[str]:
+    """All strings reachable from `term` by deleting up to `distance` characters"""
+    variants = {term}
+    frontier = {term}
+    for _ in range(distance):
+        next_frontier = set()
+        for word in frontier:
+            for i in range(len(word)):
+                next_frontier.add(word[:i] + word[i + 1:])
+        variants |= next_frontier
+        frontier = next_frontier
+    return variants
+
+
+class FuzzyIndex:
+    """
+    Symmetric-delete approximate matcher over a fixed vocabulary.
+
+    Every vocabulary term is indexed under all strings obtained by deleting up to
+    `max_distance` characters. A query generates its own deletes and only the
+    terms sharing one of them are verified with a bounded edit distance, so a
+    lookup costs a few dozen hash probes regardless of vocabulary size.
+
+    An optional `store` (the on-disk MedicationStore) contributes terms through
+    its own exact lookup and precomputed deletes table, so a large formulary is
+    matched without being copied into the in-heap index.
+
+    Reports repeat the same few names many times, so results are memoized per
+    normalized token in a bounded LRU cache.
+    """
+
+    def __init__(self, vocabulary: Iterable[str], max_distance: int = MAX_EDIT_DISTANCE, store=None):
+        self.max_distance = max_distance
+        self.store = store
+        self._terms: Set[str] = set()
+        self._deletes: Dict[str, List[str]] = {}
+
+        for term in vocabulary:
+            term = self.normalize(term)
+            if not term or term in self._terms:
+                continue
+            self._terms.add(term)
+            for variant in self._delete_variants(term, max_distance):
+                self._deletes.setdefault(variant, []).append(term)
+
+        self._match_normalized = lru_cache(maxsize=MATCH_CACHE_SIZE)(self._lookup)
+
+    normalize = staticmethod(normalize_term)
+    _delete_variants = staticmethod(delete_variants)
+
+    @staticmethod
+    def _edit_distance(a: str, b: str, limit: int) -> int:
+        """Optimal string alignment distance, returning limit + 1 once it is exceeded"""
+        if abs(len(a) - len(b)) > limit:
+            return limit + 1
+        previous2 = None
+        previous = list(range(len(b) + 1))
+        for i in range(1, len(a) + 1):
+            current = [i] + [0] * len(b)
+            row_min = current[0]
+            for j in range(1, len(b) + 1):
+                cost = 0 if a[i - 1] == b[j - 1] else 1
+                current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+                if (previous2 is not None and i > 1 and j > 1
+                        and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                    current[j] = min(current[j], previous2[j - 2] + 1)
+                row_min = min(row_min, current[j])
+            if row_min > limit:
+                return limit + 1
+            previous2, previous = previous, current
+        return previous[len(b)]
+
+    def allowed_distance(self, term: str) -> int:
+        """Short tokens get a tighter bound to avoid matching unrelated words"""
+        if len(term) <= 4:
+            return 0
+        if len(term) <= 7:
+            return min(1, self.max_distance)
+        return self.max_distance
+
+    def match(self, token: str) -> Optional[str]:
+        """
+        Map a (possibly OCR-damaged) token to the closest vocabulary term.
+
+        Returns:
+            The canonical term, or None if nothing is within the edit-distance bound
+        """
+        token = self.normalize(token)
+        if not token:
+            return None
+        return self._match_normalized(token)
+
+    def _lookup(self, token: str) -> Optional[str]:
+        """Uncached match() of an already normalized token"""
+        if token in self._terms or (self.store is not None and token in self.store):
+            return token
+
+        limit = self.allowed_distance(token)
+        if limit == 0:
+            return None
+
+        best, best_distance = None, limit + 1
+        variants = self._delete_variants(token, limit)
+        candidates = set()
+        for variant in variants:
+            candidates.update(self._deletes.get(variant, ()))
+        if self.store is not None:
+            candidates.update(self.store.delete_candidates(variants))
+
+        for candidate in candidates:
+            distance = self._edit_distance(token, candidate, limit)
+            if distance < best_distance or (distance == best_distance and best is not None and candidate < best):
+                best, best_distance = candidate, distance
+        return best if best_distance <= limit else None
+
+    def __contains__(self, term: str) -> bool:
+        term = self.normalize(term)
+        return term in self._terms or (self.store is not None and term in self.store)
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+
+@lru_cache(maxsize=None)
+def get_medication_matcher() -> FuzzyIndex:
+    """
+    Build the medication-name matcher once per process.
+
+    The in-heap vocabulary is the bundled knowledge base plus every drug/alias
+    known to the interaction index. The on-disk formulary (if built) is queried
+    through its deletes table instead of being loaded, so start-up stays instant.
+    """
+    vocabulary = set(get_knowledge_base().medication_database.keys())
+    vocabulary.update(get_interaction_index().vocabulary())
+
+    matcher = FuzzyIndex(vocabulary, store=get_medication_store())
+    logger.info(f"Built fuzzy medication matcher over {len(matcher)} in-memory names"
+                f"{' plus the medication store' if matcher.store is not None else ''}")
+    return matcher
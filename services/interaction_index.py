@@ -0,0 +1,129 @@
+# /services/interaction_index.py
+
+import re
+import json
+import logging
+from functools import lru_cache
+from typing import Dict, List, Any, Iterable, Optional, Tuple, FrozenSet, Set
+
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class InteractionIndex:
+    """
+    Hashed drug-interaction index.
+
+    Drug names are normalized to canonical ids (aliases and brand names resolve to
+    the generic, and each drug also carries the ids of its drug classes). Pairs
+    are stored in an adjacency map, so checking a medication list costs a few dict
+    lookups per medication regardless of how many pairs the database holds.
+    """
+
+    def __init__(self, aliases: Dict[str, str], classes: Dict[str, Iterable[str]],
+                 interactions: Iterable[Dict[str, Any]]):
+        self._aliases = {self.normalize(name): self.normalize(canonical) for name, canonical in aliases.items()}
+        self._classes = {
+            self.normalize(drug): frozenset(self.normalize(c) for c in drug_classes)
+            for drug, drug_classes in classes.items()
+        }
+        self._adjacency: Dict[str, Dict[str, Tuple[str, str, str, str]]] = {}
+
+        for entry in interactions:
+            drug1, drug2 = (self.normalize(d) for d in entry['drugs'])
+            record = (drug1, drug2, entry['warning'], entry.get('severity', 'moderate'))
+            self._adjacency.setdefault(drug1, {})[drug2] = record
+            self._adjacency.setdefault(drug2, {})[drug1] = record
+
+    @staticmethod
+    def normalize(name: str) -> str:
+        """Lowercase a drug name and collapse punctuation/whitespace"""
+        return re.sub(r'[^a-z0-9]+', ' ', name.lower()).strip()
+
+    def resolve(self, name: str) -> FrozenSet[str]:
+        """
+        Map a medication name to its canonical ids (drug plus its classes).
+
+        The full name is tried first, then each word, so "Warfarin Sodium" or
+        "Metformin HCl" still resolve to the generic.
+        """
+        normalized = self.normalize(name)
+        candidates = [normalized] + normalized.split()
+
+        for candidate in candidates:
+            canonical = self._aliases.get(candidate, candidate)
+            if canonical in self._adjacency or canonical in self._classes:
+                return frozenset({canonical}) | self._classes.get(canonical, frozenset())
+        return frozenset()
+
+    def check(self, medication_names: Iterable[str]) -> List[Dict[str, Any]]:
+        """
+        Find all known interactions within a set of medications.
+
+        Args:
+            medication_names: Medication names from a report or a user's history
+
+        Returns:
+            List of interaction risk factors, one per interacting pair
+        """
+        ids = set()
+        for name in medication_names:
+            ids.update(self.resolve(name))
+
+        seen = set()
+        interactions = []
+        for drug_id in ids:
+            neighbours = self._adjacency.get(drug_id)
+            if not neighbours:
+                continue
+            # Walk whichever side is smaller: the neighbour list or the medication set
+            if len(neighbours) <= len(ids):
+                partners = [other for other in neighbours if other in ids]
+            else:
+                partners = [other for other in ids if other in neighbours]
+
+            for other in partners:
+                drug1, drug2, warning, severity = neighbours[other]
+                if (drug1, drug2) in seen:
+                    continue
+                seen.add((drug1, drug2))
+                interactions.append({
+                    'type': 'drug_interaction',
+                    'drugs': [drug1, drug2],
+                    'warning': warning,
+                    'severity': severity
+                })
+
+        return interactions
+
+    def vocabulary(self) -> Set[str]:
+        """All drug names, aliases and class ids known to the index"""
+        return set(self._aliases) | set(self._aliases.values()) | set(self._classes) | set(self._adjacency)
+
+    def __len__(self) -> int:
+        return sum(len(neighbours) for neighbours in self._adjacency.values()) // 2
+
+
+@lru_cache(maxsize=None)
+def get_interaction_index(path: Optional[str] = None) -> InteractionIndex:
+    """
+    Build the interaction index once per process.
+
+    Args:
+        path: Optional override of Config.DRUG_INTERACTIONS_PATH
+
+    Returns:
+        The shared InteractionIndex instance
+    """
+    path = path or Config.DRUG_INTERACTIONS_PATH
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+
+    index = InteractionIndex(
+        aliases=raw.get('aliases', {}),
+        classes=raw.get('classes', {}),
+        interactions=raw.get('interactions', []),
+    )
+    logger.info(f"Loaded {len(index)} drug interaction pairs from {path}")
+    return index
@@ -0,0 +1,90 @@
+# /services/knowledge_base.py
+
+import gc
+import json
+import logging
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Mapping, Optional
+
+from utils.config import Config
+from services.interaction_index import get_interaction_index
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class KnowledgeBase:
+    """Read-only medical reference data shared by every analyzer/engine instance"""
+    medical_knowledge: Mapping[str, Any]
+    medication_database: Mapping[str, Any]
+    reference_ranges: Mapping[str, Any]
+    dietary_guidelines: Mapping[str, Any]
+    lifestyle_guidelines: Mapping[str, Any]
+    medication_guidelines: Mapping[str, Any]
+
+
+def freeze(obj: Any) -> Any:
+    """Recursively convert dicts to read-only mappings and lists to tuples"""
+    if isinstance(obj, dict):
+        return MappingProxyType({key: freeze(value) for key, value in obj.items()})
+    if isinstance(obj, (list, tuple)):
+        return tuple(freeze(item) for item in obj)
+    return obj
+
+
+def thaw(obj: Any) -> Any:
+    """Return a mutable, JSON-serializable copy of a frozen structure"""
+    if isinstance(obj, Mapping):
+        return {key: thaw(value) for key, value in obj.items()}
+    if isinstance(obj, tuple):
+        return [thaw(item) for item in obj]
+    return obj
+
+
+@lru_cache(maxsize=None)
+def get_knowledge_base(path: Optional[str] = None) -> KnowledgeBase:
+    """
+    Load the knowledge base data file once per process.
+
+    Args:
+        path: Optional override of Config.KNOWLEDGE_BASE_PATH
+
+    Returns:
+        The shared, immutable KnowledgeBase instance
+    """
+    path = path or Config.KNOWLEDGE_BASE_PATH
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+
+    knowledge_base = KnowledgeBase(
+        medical_knowledge=freeze(raw.get('medical_knowledge', {})),
+        medication_database=freeze(raw.get('medication_database', {})),
+        reference_ranges=freeze(raw.get('reference_ranges', {})),
+        dietary_guidelines=freeze(raw.get('dietary_guidelines', {})),
+        lifestyle_guidelines=freeze(raw.get('lifestyle_guidelines', {})),
+        medication_guidelines=freeze(raw.get('medication_guidelines', {})),
+    )
+    logger.info(f"Loaded medical knowledge base from {path}")
+    return knowledge_base
+
+
+def preload_knowledge_base() -> KnowledgeBase:
+    """
+    Load the knowledge base and the indexes built on it in the master process before workers fork.
+
+    With gunicorn --preload the loaded objects are moved to the permanent GC
+    generation so collections in the workers do not touch (and un-share) them.
+    """
+    knowledge_base = get_knowledge_base()
+    get_interaction_index()
+    # Imported lazily: the matcher's vocabulary is built from this module's data
+    from services.fuzzy_matcher import get_medication_matcher
+    from services.report_classifier import get_report_classifier
+    from services.recommendation_rules import get_rule_index
+    get_medication_matcher()
+    get_rule_index()
+    get_report_classifier()
+    gc.freeze()
+    return knowledge_base
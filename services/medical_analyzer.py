@@ -1,9 +1,14 @@
 import re
 import json
 import time
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterable, Tuple
 import logging
 from dataclasses import dataclass
+from services.knowledge_base import get_knowledge_base, thaw
+from services.interaction_index import get_interaction_index
+from services.medication_store import get_medication_store
+from services.fuzzy_matcher import get_medication_matcher
+from services.report_classifier import get_report_classifier
 
 @dataclass
 class LabValue:
@@ -25,10 +30,29 @@ class Medication:
 class MedicalAnalyzer:
     """Service for analyzing medical reports and extracting insights"""
     
+    # Streaming analysis: characters of the previous page kept as overlap, and the
+    # margin before a chunk's end within which matches are deferred to the next chunk
+    PAGE_OVERLAP_CHARS = 512
+    PAGE_MATCH_MARGIN = 64
+    
+    # Keyword routing used when no trained report classifier is available
+    REPORT_TYPE_KEYWORDS = (
+        ('blood_test', re.compile(r'\bblood\b', re.IGNORECASE)),
+        ('prescription', re.compile(r'\b(?:rx|prescription)\b', re.IGNORECASE)),
+        ('x_ray', re.compile(r'\bx-ray\b', re.IGNORECASE)),
+    )
+    
+    MEDICAL_TERMS = ('patient', 'doctor', 'test', 'result', 'normal', 'abnormal', 'medication')
+    CONCERNING_TERMS = ('abnormal', 'elevated', 'low', 'high', 'critical', 'urgent')
+    
     def __init__(self):
+        # Reference data is loaded once per process and shared read-only by all instances
         self.medical_knowledge = self._load_medical_knowledge()
         self.medication_database = self._load_medication_database()
         self.reference_ranges = self._load_reference_ranges()
+        self.interaction_index = get_interaction_index()
+        self.medication_matcher = get_medication_matcher()
+        self.report_classifier = get_report_classifier()
     
     def analyze_report(self, text: str, report_type: str = 'general') -> Dict[str, Any]:
         """
@@ -36,7 +60,8 @@ class MedicalAnalyzer:
         
         Args:
             text: Extracted text from medical report
-            report_type: Type of report (blood_test, prescription, x_ray, etc.)
+            report_type: Type of report (blood_test, prescription, x_ray, etc.);
+                'general' lets the report classifier decide
         
         Returns:
             Dictionary containing analysis results
@@ -59,11 +84,15 @@ class MedicalAnalyzer:
             cleaned_text = self._preprocess_text(text)
             
             # Extract different components based on report type
-            if report_type == 'blood_test' or 'blood' in text.lower():
+            if report_type == 'general':
+                report_type = self._classify_report(text)
+                analysis['report_type'] = report_type
+            
+            if report_type == 'blood_test':
                 analysis.update(self._analyze_blood_test(cleaned_text))
-            elif report_type == 'prescription' or 'rx' in text.lower():
+            elif report_type == 'prescription':
                 analysis.update(self._analyze_prescription(cleaned_text))
-            elif report_type == 'x_ray' or 'x-ray' in text.lower():
+            elif report_type == 'x_ray':
                 analysis.update(self._analyze_imaging(cleaned_text))
             else:
                 analysis.update(self._analyze_general_report(cleaned_text))
@@ -82,6 +111,136 @@ class MedicalAnalyzer:
                 'processing_time': time.time() - start_time
             }
     
+    def analyze_pages(self, pages: Iterable[str], report_type: str = 'general') -> Dict[str, Any]:
+        """
+        Analyze a medical report page by page with bounded memory
+        
+        Only a small overlap window of the previous page is kept, so matches that
+        span a page break are still found while peak memory stays roughly constant
+        regardless of document length.
+        
+        Args:
+            pages: Iterable of page texts (e.g. a generator over OCR results)
+            report_type: Type of report (blood_test, prescription, x_ray, etc.)
+        
+        Returns:
+            Dictionary containing analysis results, same shape as analyze_report
+        """
+        start_time = time.time()
+        
+        try:
+            lab_values, vital_signs, medications, findings = [], [], [], []
+            concerning_terms = {}
+            medical_terms = set()
+            numeric_count = 0
+            detected_type = None
+            page_count = 0
+            
+            use_classifier = self.report_classifier is not None
+            margin = self.PAGE_MATCH_MARGIN
+            overlap = ''
+            page_iter = iter(pages)
+            page = next(page_iter, None)
+            
+            while page is not None:
+                next_page = next(page_iter, None)
+                is_last = next_page is None
+                page_count += 1
+                
+                cleaned_page = self._preprocess_text(page)
+                chunk = f"{overlap} {cleaned_page}" if overlap else cleaned_page
+                chunk_lower = chunk.lower()
+                
+                # Matches ending inside [lo, hi) belong to this chunk; earlier ones were
+                # taken by the previous chunk, later ones are re-found by the next chunk
+                lo = len(overlap) - margin if overlap else 0
+                hi = len(chunk) + 1 if is_last else len(chunk) - margin
+                window = (lo, hi)
+                
+                if report_type == 'general' and detected_type is None:
+                    if use_classifier:
+                        try:
+                            # The first page is enough for the classifier to route the report
+                            detected_type = self.report_classifier.predict(chunk)
+                        except Exception as e:
+                            logging.error(f"Report classification failed, using keywords: {str(e)}")
+                            use_classifier = False
+                    if not use_classifier:
+                        detected_type = self._match_report_keywords(chunk)
+                
+                lab_values.extend(self._extract_lab_values(chunk, window))
+                vital_signs.extend(self._extract_vital_signs(chunk, window))
+                medications.extend(self._extract_medications(chunk, window))
+                findings.extend(self._extract_imaging_findings(chunk, window))
+                
+                for term in self.CONCERNING_TERMS:
+                    if term not in concerning_terms and term in chunk_lower:
+                        concerning_terms[term] = self._extract_context(chunk, term)
+                medical_terms.update(term for term in self.MEDICAL_TERMS if term in chunk_lower)
+                if numeric_count < 10:
+                    numeric_count += sum(1 for match in re.finditer(r'\d+\.?\d*', chunk)
+                                         if lo <= match.end() < hi)
+                
+                overlap = chunk[-self.PAGE_OVERLAP_CHARS:]
+                page = next_page
+            
+            analysis = {
+                'report_type': report_type,
+                'insights': {},
+                'test_results': [],
+                'medications': [],
+                'risk_factors': [],
+                'recommendations': [],
+                'confidence': 0,
+                'processing_time': 0,
+                'page_count': page_count
+            }
+            
+            if report_type == 'general':
+                report_type = detected_type or 'general'
+                analysis['report_type'] = report_type
+            
+            if report_type == 'blood_test':
+                analysis.update(self._build_blood_test_analysis(lab_values))
+            elif report_type == 'prescription':
+                analysis.update(self._build_prescription_analysis(medications))
+            elif report_type == 'x_ray':
+                analysis.update(self._build_imaging_analysis(findings))
+            else:
+                analysis.update(self._build_general_analysis(
+                    lab_values, vital_signs, medications, list(concerning_terms.items())
+                ))
+            
+            data_count = len(analysis.get('test_results', [])) + len(analysis.get('medications', []))
+            analysis['confidence'] = self._confidence_score(data_count, len(medical_terms), numeric_count)
+            analysis['processing_time'] = time.time() - start_time
+            
+            return analysis
+            
+        except Exception as e:
+            logging.error(f"Streaming medical analysis failed: {str(e)}")
+            return {
+                'error': str(e),
+                'confidence': 0,
+                'processing_time': time.time() - start_time
+            }
+    
+    def _classify_report(self, text: str) -> str:
+        """Predict the report type with the trained classifier, or by keywords without one"""
+        if self.report_classifier is not None:
+            try:
+                return self.report_classifier.predict(text)
+            except Exception as e:
+                logging.error(f"Report classification failed, using keywords: {str(e)}")
+        return self._match_report_keywords(text) or 'general'
+    
+    def _match_report_keywords(self, text: str) -> Optional[str]:
+        """Return the first report type whose keyword appears as a whole word"""
+        for report_type, pattern in self.REPORT_TYPE_KEYWORDS:
+            if pattern.search(text):
+                return report_type
+        return None
+    
     def _preprocess_text(self, text: str) -> str:
         """Clean and preprocess medical report text"""
         # Remove extra whitespace
@@ -94,14 +253,16 @@ class MedicalAnalyzer:
     
     def _analyze_blood_test(self, text: str) -> Dict[str, Any]:
         """Analyze blood test reports"""
+        return self._build_blood_test_analysis(self._extract_lab_values(text))
+    
+    def _build_blood_test_analysis(self, lab_values: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Build blood test analysis from extracted lab values"""
         analysis = {
             'insights': {'report_category': 'Blood Test Analysis'},
             'test_results': [],
             'risk_factors': []
         }
         
-        # Extract lab values
-        lab_values = self._extract_lab_values(text)
         analysis['test_results'] = lab_values
         
         # Analyze each lab value
@@ -120,14 +281,16 @@ class MedicalAnalyzer:
     
     def _analyze_prescription(self, text: str) -> Dict[str, Any]:
         """Analyze prescription reports"""
+        return self._build_prescription_analysis(self._extract_medications(text))
+    
+    def _build_prescription_analysis(self, medications: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Build prescription analysis from extracted medications"""
         analysis = {
             'insights': {'report_category': 'Prescription Analysis'},
             'medications': [],
             'risk_factors': []
         }
         
-        # Extract medications
-        medications = self._extract_medications(text)
         analysis['medications'] = medications
         
         # Analyze drug interactions
@@ -145,14 +308,16 @@ class MedicalAnalyzer:
     
     def _analyze_imaging(self, text: str) -> Dict[str, Any]:
         """Analyze imaging reports (X-ray, CT, MRI, etc.)"""
+        return self._build_imaging_analysis(self._extract_imaging_findings(text))
+    
+    def _build_imaging_analysis(self, findings: List[str]) -> Dict[str, Any]:
+        """Build imaging analysis from extracted findings"""
         analysis = {
             'insights': {'report_category': 'Imaging Analysis'},
             'findings': [],
             'risk_factors': []
         }
         
-        # Extract findings
-        findings = self._extract_imaging_findings(text)
         analysis['findings'] = findings
         
         # Assess severity
@@ -168,34 +333,41 @@ class MedicalAnalyzer:
     
     def _analyze_general_report(self, text: str) -> Dict[str, Any]:
         """Analyze general medical reports"""
-        analysis = {
-            'insights': {'report_category': 'General Medical Report'},
-            'test_results': [],
-            'medications': [],
-            'risk_factors': []
-        }
-        
         # Try to extract whatever we can
         lab_values = self._extract_lab_values(text)
         medications = self._extract_medications(text)
         vital_signs = self._extract_vital_signs(text)
         
-        analysis['test_results'] = lab_values + vital_signs
-        analysis['medications'] = medications
-        
         # Look for concerning terms
-        concerning_terms = ['abnormal', 'elevated', 'low', 'high', 'critical', 'urgent']
-        for term in concerning_terms:
-            if term in text.lower():
-                analysis['risk_factors'].append({
-                    'type': 'concerning_term',
-                    'term': term,
-                    'context': self._extract_context(text, term)
-                })
+        text_lower = text.lower()
+        concerning_terms = [
+            (term, self._extract_context(text, term))
+            for term in self.CONCERNING_TERMS if term in text_lower
+        ]
+        
+        return self._build_general_analysis(lab_values, vital_signs, medications, concerning_terms)
+    
+    def _build_general_analysis(self, lab_values: List[Dict[str, Any]], vital_signs: List[Dict[str, Any]],
+                                medications: List[Dict[str, Any]],
+                                concerning_terms: List[Tuple[str, str]]) -> Dict[str, Any]:
+        """Build general report analysis from extracted components"""
+        analysis = {
+            'insights': {'report_category': 'General Medical Report'},
+            'test_results': lab_values + vital_signs,
+            'medications': medications,
+            'risk_factors': []
+        }
+        
+        for term, context in concerning_terms:
+            analysis['risk_factors'].append({
+                'type': 'concerning_term',
+                'term': term,
+                'context': context
+            })
         
         return analysis
     
-    def _extract_lab_values(self, text: str) -> List[Dict[str, Any]]:
+    def _extract_lab_values(self, text: str, window: Optional[Tuple[int, int]] = None) -> List[Dict[str, Any]]:
         """Extract laboratory values from text"""
         lab_values = []
         
@@ -221,6 +393,8 @@ class MedicalAnalyzer:
         for test_name, pattern in patterns.items():
             matches = re.finditer(pattern, text, re.IGNORECASE)
             for match in matches:
+                if not self._in_window(match, window):
+                    continue
                 try:
                     value = float(match.group(1))
                     
@@ -243,7 +417,7 @@ class MedicalAnalyzer:
         
         return lab_values
     
-    def _extract_vital_signs(self, text: str) -> List[Dict[str, Any]]:
+    def _extract_vital_signs(self, text: str, window: Optional[Tuple[int, int]] = None) -> List[Dict[str, Any]]:
         """Extract vital signs from text"""
         vitals = []
         
@@ -261,6 +435,8 @@ class MedicalAnalyzer:
         for vital_name, pattern in vital_patterns.items():
             matches = re.finditer(pattern, text, re.IGNORECASE)
             for match in matches:
+                if not self._in_window(match, window):
+                    continue
                 try:
                     value_str = match.group(1)
                     
@@ -296,7 +472,7 @@ class MedicalAnalyzer:
         
         return vitals
     
-    def _extract_medications(self, text: str) -> List[Dict[str, Any]]:
+    def _extract_medications(self, text: str, window: Optional[Tuple[int, int]] = None) -> List[Dict[str, Any]]:
         """Extract medications from prescription text"""
         medications = []
         
@@ -306,12 +482,31 @@ class MedicalAnalyzer:
             r'(?:tab|tablet|cap|capsule)\s+(\w+)\s+(\d+(?:\.\d+)?)\s*(mg|g)',
             r'(\w+)\s+(\d+(?:\.\d+)?)\s*(mg|g|ml|mcg)\s*(?:once|twice|thrice|daily|bd|tid|qid)',
         ]
-        
-        for pattern in medication_patterns:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
+        # Any dosed word, accepted only if it fuzzy-matches a known medication
+        # (catches OCR-damaged names like "Metf0rmin 500 mg" the patterns above miss)
+        vocabulary_pattern = re.compile(r'([a-z][\w]{3,})\s*(\d+(?:\.\d+)?)\s*(mg|g|ml|mcg)', re.IGNORECASE)
+        # Spans of every pattern match, in the window or not: a name whose pattern match
+        # is deferred to the next chunk must not be taken here by the vocabulary scan
+        matched_spans = []
+        
+        for pattern in medication_patterns + [vocabulary_pattern]:
+            is_vocabulary_pattern = pattern is vocabulary_pattern
+            if is_vocabulary_pattern:
+                # Only text none of the patterns matched is scanned and fuzzy-matched again
+                matches = self._finditer_outside(vocabulary_pattern, text, matched_spans)
+            else:
+                matches = re.finditer(pattern, text, re.IGNORECASE)
             for match in matches:
+                if not is_vocabulary_pattern:
+                    matched_spans.append(match.span())
+                if not self._in_window(match, window):
+                    continue
                 try:
-                    med_name = match.group(1)
+                    canonical = self.medication_matcher.match(match.group(1))
+                    if is_vocabulary_pattern and canonical is None:
+                        continue
+                    
+                    med_name = canonical or match.group(1)
                     dosage = f"{match.group(2)} {match.group(3)}"
                     
                     # Try to extract frequency
@@ -328,7 +523,7 @@ class MedicalAnalyzer:
         
         return medications
     
-    def _extract_imaging_findings(self, text: str) -> List[str]:
+    def _extract_imaging_findings(self, text: str, window: Optional[Tuple[int, int]] = None) -> List[str]:
         """Extract findings from imaging reports"""
         findings = []
         
@@ -342,12 +537,31 @@ class MedicalAnalyzer:
         for pattern in finding_patterns:
             matches = re.finditer(pattern, text, re.IGNORECASE)
             for match in matches:
+                if not self._in_window(match, window):
+                    continue
                 finding = match.group(1).strip()
                 if len(finding) > 10:  # Ignore very short matches
                     findings.append(finding)
         
         return findings
     
+    @staticmethod
+    def _finditer_outside(pattern: re.Pattern, text: str, spans: List[Tuple[int, int]]) -> Iterable[re.Match]:
+        """Matches of `pattern` lying entirely in the gaps between the given spans"""
+        position = 0
+        for start, end in sorted(spans) + [(len(text), len(text))]:
+            if start > position:
+                yield from pattern.finditer(text, position, start)
+            position = max(position, end)
+    
+    @staticmethod
+    def _in_window(match: re.Match, window: Optional[Tuple[int, int]]) -> bool:
+        """Check whether a match ends inside the [lo, hi) window (no window accepts all)"""
+        if window is None:
+            return True
+        lo, hi = window
+        return lo <= match.end() < hi
+    
     def _get_reference_info(self, test_name: str) -> tuple:
         """Get reference range and unit for lab test"""
         reference_data = self.reference_ranges.get(test_name, {})
@@ -472,32 +686,18 @@ class MedicalAnalyzer:
     
     def _check_drug_interactions(self, medications: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Check for potential drug interactions"""
-        interactions = []
-        
-        # Simple interaction checking (in production, use a comprehensive drug database)
-        interaction_pairs = {
-            ('warfarin', 'aspirin'): 'Increased bleeding risk',
-            ('metformin', 'alcohol'): 'Risk of lactic acidosis',
-            ('ace inhibitor', 'potassium'): 'Risk of hyperkalemia'
-        }
-        
-        med_names = [med['name'].lower() for med in medications]
-        
-        for (drug1, drug2), warning in interaction_pairs.items():
-            if any(drug1 in name for name in med_names) and any(drug2 in name for name in med_names):
-                interactions.append({
-                    'type': 'drug_interaction',
-                    'drugs': [drug1, drug2],
-                    'warning': warning,
-                    'severity': 'moderate'
-                })
-        
-        return interactions
+        return self.interaction_index.check(self._canonical_medication_name(med['name']) for med in medications)
     
     def _get_medication_info(self, medication_name: str) -> Optional[Dict[str, Any]]:
         """Get information about a medication"""
         med_info = self.medication_database.get(medication_name.lower())
-        return med_info
+        if med_info is None:
+            med_info = self.medication_database.get(self._canonical_medication_name(medication_name))
+        return thaw(med_info) if med_info else None
+    
+    def _canonical_medication_name(self, medication_name: str) -> str:
+        """Map a possibly OCR-damaged medication name to its canonical (lowercase) form"""
+        return self.medication_matcher.match(medication_name) or medication_name.lower()
     
     def _extract_context(self, text: str, term: str) -> str:
         """Extract context around a concerning term"""
@@ -510,80 +710,40 @@ class MedicalAnalyzer:
     
     def _calculate_confidence(self, analysis: Dict[str, Any], text: str) -> float:
         """Calculate confidence score for the analysis"""
+        data_count = len(analysis.get('test_results', [])) + len(analysis.get('medications', []))
+        text_lower = text.lower()
+        term_count = sum(1 for term in self.MEDICAL_TERMS if term in text_lower)
+        numerical_matches = re.findall(r'\d+\.?\d*', text)
+        
+        return self._confidence_score(data_count, term_count, len(numerical_matches))
+    
+    def _confidence_score(self, data_count: int, term_count: int, numeric_count: int) -> float:
+        """Combine confidence factors into a 0-100 score"""
         confidence_factors = []
         
         # Factor 1: Amount of extracted data
-        data_count = len(analysis.get('test_results', [])) + len(analysis.get('medications', []))
         confidence_factors.append(min(data_count * 10, 50))  # Max 50 points
         
         # Factor 2: Text length and medical terms
-        medical_terms = ['patient', 'doctor', 'test', 'result', 'normal', 'abnormal', 'medication']
-        term_count = sum(1 for term in medical_terms if term in text.lower())
         confidence_factors.append(min(term_count * 5, 30))  # Max 30 points
         
         # Factor 3: Presence of numerical values
-        numerical_matches = re.findall(r'\d+\.?\d*', text)
-        confidence_factors.append(min(len(numerical_matches) * 2, 20))  # Max 20 points
+        confidence_factors.append(min(numeric_count * 2, 20))  # Max 20 points
         
         return min(sum(confidence_factors), 100)
     
     def _load_medical_knowledge(self) -> Dict[str, Any]:
         """Load medical knowledge base"""
-        # In production, this would load from a comprehensive medical database
-        return {
-            'symptoms': {},
-            'conditions': {},
-            'treatments': {}
-        }
+        return get_knowledge_base().medical_knowledge
     
     def _load_medication_database(self) -> Dict[str, Any]:
-        """Load medication database"""
-        # Simplified medication database
-        return {
-            'metformin': {
-                'category': 'antidiabetic',
-                'purpose': 'blood sugar control',
-                'side_effects': ['nausea', 'diarrhea', 'metallic taste'],
-                'interactions': ['alcohol', 'contrast dye']
-            },
-            'lisinopril': {
-                'category': 'ace inhibitor',
-                'purpose': 'blood pressure control',
-                'side_effects': ['dry cough', 'dizziness', 'hyperkalemia'],
-                'interactions': ['potassium supplements', 'nsaids']
-            },
-            'simvastatin': {
-                'category': 'statin',
-                'purpose': 'cholesterol lowering',
-                'side_effects': ['muscle pain', 'liver problems'],
-                'interactions': ['grapefruit juice', 'certain antibiotics']
-            }
-        }
+        """Load medication database (on-disk formulary if built, else the bundled subset)"""
+        store = get_medication_store()
+        return store if store is not None else get_knowledge_base().medication_database
     
     def _load_reference_ranges(self) -> Dict[str, Any]:
         """Load laboratory reference ranges"""
-        return {
-            'glucose': {
-                'unit': 'mg/dL',
-                'range': '70-100',
-                'normal_range': {'min': 70, 'max': 100, 'critical_high': 400, 'critical_low': 50}
-            },
-            'hemoglobin': {
-                'unit': 'g/dL',
-                'range': '12-15',
-                'normal_range': {'min': 12, 'max': 15, 'critical_low': 7, 'critical_high': 18}
-            },
-            'cholesterol': {
-                'unit': 'mg/dL',
-                'range': '<200',
-                'normal_range': {'min': 0, 'max': 200, 'critical_high': 300}
-            },
-            'creatinine': {
-                'unit': 'mg/dL',
-                'range': '0.6-1.2',
-                'normal_range': {'min': 0.6, 'max': 1.2, 'critical_high': 5.0}
-            }
-        }
+        return get_knowledge_base().reference_ranges
     
     def explain_results(self, analysis: Dict[str, Any], query: str = "") -> str:
         """Provide detailed explanation of analysis results"""
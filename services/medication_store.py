@@ -0,0 +1,223 @@
+# /services/medication_store.py
+
+import os
+import csv
+import json
+import sqlite3
+import logging
+import threading
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Iterable, Set, Tuple
+
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Columns of a CSV source that hold ';'-separated lists
+LIST_COLUMNS = ('side_effects', 'interactions', 'aliases')
+
+SCHEMA = """
+CREATE TABLE medications (
+    name TEXT PRIMARY KEY,
+    canonical TEXT NOT NULL,
+    data TEXT NOT NULL
+) WITHOUT ROWID
+"""
+
+# Symmetric-delete keys for fuzzy matching: every string obtained by deleting up
+# to MAX_EDIT_DISTANCE characters from a name, pointing back at that name
+DELETES_SCHEMA = """
+CREATE TABLE medication_deletes (
+    variant TEXT NOT NULL,
+    term TEXT NOT NULL,
+    PRIMARY KEY (variant, term)
+) WITHOUT ROWID
+"""
+
+# Stay well under SQLite's bound-parameter limit
+MAX_QUERY_PARAMS = 500
+
+
+class MedicationStore:
+    """
+    Read-only, memory-mapped medication formulary backed by an SQLite file.
+
+    The file is built offline (see scripts/build_medication_db.py) and opened
+    immutable with mmap enabled, so workers share the OS page cache instead of
+    each holding the formulary in its heap, and opening it is instant.
+    Lookups go through the primary key B-tree: exact match or key-range prefix.
+    """
+
+    MMAP_SIZE = 256 * 1024 * 1024
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._deletes_available = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread, per-process connection (connections must not cross a fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size={self.MMAP_SIZE}")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, name: str, default: Any = None) -> Optional[Dict[str, Any]]:
+        """Exact lookup by medication name or alias (case-insensitive)"""
+        row = self._connection().execute(
+            "SELECT data FROM medications WHERE name = ?", (name.strip().lower(),)
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def prefix(self, prefix: str, limit: int = 10) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Return up to `limit` (name, info) pairs whose name starts with `prefix`.
+
+        Implemented as a key range scan, so cost is independent of formulary size.
+        """
+        low = prefix.strip().lower()
+        if not low:
+            return []
+        rows = self._connection().execute(
+            "SELECT name, data FROM medications WHERE name >= ? AND name < ? ORDER BY name LIMIT ?",
+            (low, low + '\uffff', limit)
+        ).fetchall()
+        return [(name, json.loads(data)) for name, data in rows]
+
+    def delete_candidates(self, variants: Iterable[str]) -> Set[str]:
+        """
+        Names sharing at least one delete variant with the query (see FuzzyIndex).
+
+        Stores built before the deletes table existed return no candidates;
+        rebuild them with scripts/build_medication_db.py.
+        """
+        if not self._has_deletes():
+            return set()
+        variants = list(variants)
+        conn = self._connection()
+        terms = set()
+        for start in range(0, len(variants), MAX_QUERY_PARAMS):
+            chunk = variants[start:start + MAX_QUERY_PARAMS]
+            rows = conn.execute(
+                f"SELECT term FROM medication_deletes WHERE variant IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            terms.update(term for (term,) in rows)
+        return terms
+
+    def _has_deletes(self) -> bool:
+        if self._deletes_available is None:
+            self._deletes_available = self._connection().execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'medication_deletes'"
+            ).fetchone() is not None
+            if not self._deletes_available:
+                logger.warning(f"Medication store {self.path} has no deletes table; fuzzy matching skips it")
+        return self._deletes_available
+
+    def names(self) -> Iterable[str]:
+        """Iterate over all indexed names (canonical names and aliases)"""
+        for (name,) in self._connection().execute("SELECT name FROM medications ORDER BY name"):
+            yield name
+
+    def __len__(self) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(DISTINCT canonical) FROM medications"
+        ).fetchone()[0]
+
+
+def _read_source(source_path: str) -> Iterable[Dict[str, Any]]:
+    """Yield medication records from a CSV or JSON source file"""
+    if source_path.lower().endswith('.csv'):
+        with open(source_path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                record = {}
+                for key, value in row.items():
+                    value = (value or '').strip()
+                    if key in LIST_COLUMNS:
+                        record[key] = [item.strip() for item in value.split(';') if item.strip()]
+                    elif value:
+                        record[key] = value
+                yield record
+        return
+
+    with open(source_path, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+    # Accept the knowledge base layout, a {name: info} mapping, or a list of records
+    if isinstance(raw, dict) and 'medication_database' in raw:
+        raw = raw['medication_database']
+    if isinstance(raw, dict):
+        raw = [dict(info, name=name) for name, info in raw.items()]
+    for record in raw:
+        yield record
+
+
+def build_medication_store(source_path: str, db_path: str) -> int:
+    """
+    Build the SQLite medication store from a CSV/JSON source.
+
+    Besides the medications table this writes the fuzzy-matching deletes table,
+    which is the expensive part of the build and is why it happens offline.
+
+    The file is written next to the target and renamed into place, so running
+    workers never see a partially written store.
+
+    Returns:
+        Number of medications written
+    """
+    from services.fuzzy_matcher import MAX_EDIT_DISTANCE, normalize_term, delete_variants
+
+    tmp_path = f"{db_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    count = 0
+    try:
+        conn.execute(SCHEMA)
+        conn.execute(DELETES_SCHEMA)
+        for record in _read_source(source_path):
+            canonical = record.get('name', '').strip().lower()
+            if not canonical:
+                continue
+            aliases = record.pop('aliases', [])
+            data = json.dumps({k: v for k, v in record.items() if k != 'name'})
+            keys = {canonical} | {alias.strip().lower() for alias in aliases if alias.strip()}
+            conn.executemany(
+                "INSERT OR REPLACE INTO medications (name, canonical, data) VALUES (?, ?, ?)",
+                [(key, canonical, data) for key in keys]
+            )
+            for key in keys:
+                term = normalize_term(key)
+                conn.executemany(
+                    "INSERT OR IGNORE INTO medication_deletes (variant, term) VALUES (?, ?)",
+                    [(variant, term) for variant in delete_variants(term, MAX_EDIT_DISTANCE)]
+                )
+            count += 1
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+    os.replace(tmp_path, db_path)
+    logger.info(f"Built medication store with {count} medications at {db_path}")
+    return count
+
+
+@lru_cache(maxsize=None)
+def get_medication_store(path: Optional[str] = None) -> Optional[MedicationStore]:
+    """
+    Open the medication store once per process.
+
+    Returns:
+        The shared MedicationStore, or None if no store file has been built
+    """
+    path = path or Config.MEDICATION_DB_PATH
+    if not os.path.exists(path):
+        logger.info(f"No medication store at {path}; using the bundled knowledge base")
+        return None
+    return MedicationStore(path)
@@ -0,0 +1,140 @@
+# /services/password_hashing.py
+
+import re
+import time
+import logging
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Any
+
+import bcrypt
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from utils.config import Config
+from utils.database import mongo
+
+logger = logging.getLogger(__name__)
+
+BCRYPT_HASH_PATTERN = re.compile(r'^\$2[aby]\$(\d{2})\$')
+
+# Hashing is deliberately slow; it runs here instead of on request threads.
+# bcrypt and hashlib release the GIL, so other requests keep being served meanwhile.
+_hash_executor = ThreadPoolExecutor(max_workers=Config.PASSWORD_HASH_WORKERS, thread_name_prefix='password-hash')
+# Running plus queued hashing jobs; callers beyond this wait, then give up
+_pending_slots = threading.BoundedSemaphore(Config.PASSWORD_HASH_MAX_PENDING)
+
+_stats_lock = threading.Lock()
+_stats = {'completed': 0, 'rejected': 0, 'rehashed': 0}
+
+
+class PasswordHashingBusy(RuntimeError):
+    """Raised when hashing capacity stays exhausted for PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS"""
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _run_bounded(func: Callable[..., Any], *args) -> Any:
+    """Run `func(*args)` on the hashing executor, waiting at most the configured queue timeout"""
+    deadline = time.monotonic() + Config.PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS
+    if not _pending_slots.acquire(timeout=Config.PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS):
+        _count('rejected')
+        raise PasswordHashingBusy('Password hashing queue is full')
+
+    try:
+        future = _hash_executor.submit(func, *args)
+    except Exception:
+        _pending_slots.release()
+        raise
+    # The slot is held until the job finishes, even if this caller stops waiting
+    future.add_done_callback(lambda _: _pending_slots.release())
+
+    try:
+        result = future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FutureTimeoutError:
+        _count('rejected')
+        raise PasswordHashingBusy('Timed out waiting for password hashing')
+    _count('completed')
+    return result
+
+
+def _hash(password: str) -> str:
+    method = Config.PASSWORD_HASH_METHOD
+    if method == 'bcrypt':
+        salt = bcrypt.gensalt(rounds=Config.PASSWORD_BCRYPT_ROUNDS)
+        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('ascii')
+    return generate_password_hash(password, method=method)
+
+
+def _verify(stored_hash: str, password: str) -> bool:
+    if BCRYPT_HASH_PATTERN.match(stored_hash):
+        return bcrypt.checkpw(password.encode('utf-8'), stored_hash.encode('ascii'))
+    # Hashes created by werkzeug's generate_password_hash before bcrypt was the default
+    return check_password_hash(stored_hash, password)
+
+
+def hash_password(password: str) -> str:
+    """Hash with the configured method and cost (blocks the caller, not a request thread's CPU)"""
+    return _run_bounded(_hash, password)
+
+
+def verify_password(stored_hash: str, password: str) -> bool:
+    """Check a password against a bcrypt or werkzeug hash"""
+    return _run_bounded(_verify, stored_hash, password)
+
+
+def needs_rehash(stored_hash: str) -> bool:
+    """True if `stored_hash` was made with a different method or cost than configured"""
+    match = BCRYPT_HASH_PATTERN.match(stored_hash)
+    if Config.PASSWORD_HASH_METHOD == 'bcrypt':
+        return not match or int(match.group(1)) != Config.PASSWORD_BCRYPT_ROUNDS
+    if match:
+        return True
+    # werkzeug format: "<method>$<salt>$<hash>"
+    return stored_hash.split('$', 1)[0] != _werkzeug_method_prefix(Config.PASSWORD_HASH_METHOD)
+
+
+@lru_cache(maxsize=None)
+def _werkzeug_method_prefix(method: str) -> str:
+    """Full method string werkzeug stores for `method` (a bare 'scrypt' gets its default parameters)"""
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+
+def _rehash(user_id, old_hash: str, password: str) -> None:
+    new_hash = _hash(password)
+    # Only replace the hash we verified; a concurrent password change wins
+    result = mongo.db.users.update_one({'_id': user_id, 'password': old_hash}, {'$set': {'password': new_hash}})
+    if result.modified_count:
+        _count('rehashed')
+        logger.info(f"Upgraded password hash for user {user_id} to {Config.PASSWORD_HASH_METHOD}")
+
+
+def schedule_rehash(user_id, old_hash: str, password: str) -> None:
+    """
+    Upgrade a stored hash in the background after a successful login.
+
+    Skipped when the hashing queue is full; the next login will try again.
+    """
+    if not _pending_slots.acquire(blocking=False):
+        return
+    try:
+        future = _hash_executor.submit(_rehash, user_id, old_hash, password)
+    except Exception:
+        _pending_slots.release()
+        raise
+    future.add_done_callback(lambda _: _pending_slots.release())
+    future.add_done_callback(_log_rehash_error)
+
+
+def _log_rehash_error(future) -> None:
+    if future.exception() is not None:
+        logger.error(f"Password rehash failed: {future.exception()}")
+
+
+def password_hashing_stats() -> dict:
+    """Counters for the /api/metrics endpoint"""
+    with _stats_lock:
+        return dict(_stats)
@@ -1,6 +1,12 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 import logging
 from dataclasses import dataclass
+from utils.config import Config
+from utils.cache import LRUCache
+from services.knowledge_base import get_knowledge_base, freeze, thaw
+from services.recommendation_rules import get_rule_index
+from services.interaction_index import get_interaction_index
+from services.fuzzy_matcher import get_medication_matcher
 
 @dataclass
 class DietaryRecommendation:
@@ -16,522 +22,265 @@ class LifestyleRecommendation:
     frequency: str
     benefits: List[str]
 
+# Process-wide memo of recommendations keyed by clinical signature
+_recommendation_cache = LRUCache(maxsize=Config.RECOMMENDATION_CACHE_SIZE)
+
 class RecommendationEngine:
     """Service for generating personalized health recommendations based on medical analysis"""
     
+    SECTIONS = ('dietary', 'lifestyle', 'medication_management', 'follow_up', 'emergency_signs', 'general_wellness')
+    
+    # Status inferred from free-text results such as "blood sugar high"
+    STATUS_WORDS = (('critical', 'critical'), ('abnormal', 'abnormal'), ('elevated', 'high'),
+                    ('high', 'high'), ('low', 'low'), ('normal', 'normal'))
+    
     def __init__(self):
+        # Guideline tables are loaded once per process and shared read-only by all instances
         self.dietary_guidelines = self._load_dietary_guidelines()
         self.lifestyle_guidelines = self._load_lifestyle_guidelines()
         self.medication_guidelines = self._load_medication_guidelines()
+        self.rules = get_rule_index()
+        self.interaction_index = get_interaction_index()
+        self.medication_matcher = get_medication_matcher()
     
-    def generate_recommendations(self, data):
+    def generate_recommendations(self, data, sections=None):
+        """
+        Generate recommendations, optionally only for some sections
+        
+        Args:
+            data: Analysis with 'test_results' and 'medications'
+            sections: Iterable of section names to compute (default: all SECTIONS)
+        
+        Returns:
+            Dictionary with one list of recommendations per requested section
+        """
+        requested = self.SECTIONS if sections is None else tuple(sections)
         try:
-            test_results = data.get('test_results', [])
-            medications = data.get('medications', [])
-            risk_factors = data.get('risk_factors', [])
-
-            # Example: parse test_results if they're strings
-            parsed_results = []
-            for result in test_results:
-                if isinstance(result, str):
-                    parsed_results.append(result.lower())  # or custom parsing
-
-            # Create dummy recommendations
-            return {
-                "dietary": ["Reduce sugar intake"] if "sugar" in ' '.join(parsed_results) else [],
-                "lifestyle": ["Exercise daily"] if "blood pressure" in ' '.join(parsed_results) else [],
-                "medication_management": ["Review insulin dosage"] if "insulin" in [m.lower() for m in medications] else [],
-                "follow_up": ["Schedule a check-up in 3 months"],
-                "emergency_signs": [],
-                "general_wellness": ["Stay hydrated", "Sleep 7-8 hours"]
-            }
+            unknown = [section for section in requested if section not in self.SECTIONS]
+            if unknown:
+                raise ValueError(f"Unknown recommendation sections: {', '.join(unknown)}")
+            
+            analysis = self._normalize_input(data)
+            signature = self._clinical_signature(analysis)
+            return dict(self.iter_sections(analysis, signature, requested))
         except Exception as e:
-            return {
-                "error": str(e),
-                "dietary": [],
-                "lifestyle": [],
-                "medication_management": [],
-                "follow_up": [],
-                "emergency_signs": [],
-                "general_wellness": []
-            }
+            logging.error(f"Recommendation generation failed: {str(e)}")
+            return dict({"error": str(e)}, **{section: [] for section in requested})
+    
+    def iter_sections(self, analysis, signature, sections):
+        """
+        Lazily yield (section, recommendations) pairs
+        
+        Each section is computed only when the consumer reaches it. Reports with the
+        same clinical profile share one prebuilt (frozen) result per section; only
+        the value-dependent fields are rendered per request.
+        """
+        for section in sections:
+            key = (signature, section)
+            entry = _recommendation_cache.get(key)
+            if entry is None:
+                entry = freeze(self._build_section(signature, section))
+                _recommendation_cache.set(key, entry)
+            yield section, self._render_section(section, thaw(entry), analysis)
+    
+    @staticmethod
+    def cache_stats() -> Dict[str, Any]:
+        """Hit-rate statistics of the process-wide recommendation cache"""
+        return _recommendation_cache.stats()
+    
+    def _normalize_input(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Coerce test results and medications given as plain strings into dicts"""
+        test_results = []
+        for result in data.get('test_results', []):
+            if isinstance(result, str):
+                text = result.lower()
+                status = next((s for word, s in self.STATUS_WORDS if word in text), 'unknown')
+                result = {'name': result, 'status': status, 'value': '', 'unit': ''}
+            test_results.append(result)
+        
+        medications = [
+            {'name': med} if isinstance(med, str) else med
+            for med in data.get('medications', [])
+        ]
+        return dict(data, test_results=test_results, medications=medications)
+    
+    def _clinical_signature(self, analysis: Dict[str, Any]) -> Tuple[Tuple[Tuple[str, str], ...], Tuple[str, ...]]:
+        """Canonical key: sorted (analyte, status) pairs plus sorted normalized medication names"""
+        pairs = tuple(sorted(
+            (self.rules.canonical_analyte(test.get('name', '')) or '', test.get('status', 'unknown'))
+            for test in analysis['test_results']
+        ))
+        medications = tuple(sorted({
+            self.medication_matcher.match(med.get('name', '')) or med.get('name', '').lower()
+            for med in analysis['medications']
+        }))
+        return pairs, medications
+    
+    def _build_section(self, signature, section: str) -> Dict[str, Any]:
+        """Run one section's generator on the canonical profile described by a signature"""
+        pairs, medication_names = signature
+        # Value-dependent text is kept as '{value} {unit}' templates and rendered per request
+        canonical = {
+            'test_results': [
+                {'name': analyte, 'status': status, 'value': '{value}', 'unit': '{unit}'}
+                for analyte, status in pairs
+            ],
+            'medications': [{'name': name} for name in medication_names],
+        }
+        
+        generators = {
+            'dietary': lambda: self._generate_dietary_recommendations(canonical),
+            'lifestyle': lambda: self._generate_lifestyle_recommendations(canonical),
+            'medication_management': lambda: self._generate_medication_recommendations(canonical['medications']),
+            'follow_up': lambda: self._generate_followup_recommendations(canonical),
+            'emergency_signs': lambda: self._generate_emergency_signs(canonical),
+            'general_wellness': lambda: self._generate_wellness_recommendations(canonical),
+        }
+        entry = {'recommendations': generators[section]()}
+        if section == 'dietary':
+            # (analyte, status) of each result-specific dietary block, in signature order
+            entry['dietary_keys'] = [
+                pair for pair in pairs
+                if self.rules.analyte_rules('dietary', self.rules.canonical_analyte(pair[0]), pair[1])
+            ]
+        return entry
+    
+    def _render_section(self, section: str, entry: Dict[str, Any], analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Fill a cached section's value-dependent fields from the actual test results"""
+        recommendations = entry['recommendations']
+        test_results = analysis['test_results']
+        
+        if section == 'dietary' and entry['dietary_keys']:
+            # Re-order result-specific dietary blocks to follow the report and fill in values
+            pending = {}
+            for key, block in zip(entry['dietary_keys'], recommendations):
+                pending.setdefault(tuple(key), []).append(block)
+            dietary = []
+            for test in test_results:
+                key = (self.rules.canonical_analyte(test.get('name', '')) or '', test.get('status', 'unknown'))
+                if pending.get(key):
+                    block = pending[key].pop(0)
+                    block['reasoning'] = block['reasoning'].format(
+                        value=test.get('value', 0), unit=test.get('unit', '')
+                    )
+                    dietary.append(block)
+            return dietary
+        
+        if section == 'follow_up':
+            for status_rule in self.rules.sections['follow_up']['status_rules']:
+                field = status_rule.get('collect')
+                if not field:
+                    continue
+                for block in recommendations:
+                    if field in block:
+                        block[field] = [
+                            f"{test['name']}: {test.get('value', '')} {test.get('unit', '')}"
+                            for test in test_results if test.get('status') == status_rule['status']
+                        ]
+        
+        return recommendations
+    
+    def _result_rules(self, section: str, test_results: List[Dict[str, Any]]) -> List[int]:
+        """Distinct rule ids of a section triggered by the test results, in rule-table order"""
+        fired = set()
+        for test in test_results:
+            analyte = self.rules.canonical_analyte(test['name'])
+            fired.update(self.rules.analyte_rules(section, analyte, test['status']))
+        return sorted(fired)
+    
+    def _medication_ids(self, medications: List[Dict[str, Any]]) -> set:
+        """Canonical medication ids and drug classes for a medication list"""
+        ids = set()
+        for med in medications:
+            canonical = self.medication_matcher.match(med['name']) or med['name'].lower()
+            ids.add(canonical)
+            ids.update(self.interaction_index.resolve(canonical))
+        return ids
     
     def _generate_dietary_recommendations(self, analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Generate dietary recommendations based on test results and conditions"""
         recommendations = []
         
-        # Analyze test results for dietary implications
-        test_results = analysis.get('test_results', [])
-        
-        for test in test_results:
-            test_name = test['name'].lower()
-            status = test['status']
-            value = test.get('value', 0)
-            
-            # Glucose/Diabetes related recommendations
-            if 'glucose' in test_name and status in ['high', 'critical']:
-                recommendations.append({
-                    'category': 'Blood Sugar Management',
-                    'foods_to_include': [
-                        'Leafy green vegetables (spinach, kale)',
-                        'Whole grains (brown rice, quinoa, oats)',
-                        'Lean proteins (chicken, fish, tofu)',
-                        'Nuts and seeds (almonds, chia seeds)',
-                        'Berries (blueberries, strawberries)',
-                        'Cinnamon and turmeric'
-                    ],
-                    'foods_to_avoid': [
-                        'Refined sugars and sweets',
-                        'White bread and pasta',
-                        'Sugary drinks and sodas',
-                        'Processed foods',
-                        'Fried foods',
-                        'High-glycemic fruits (watermelon, pineapple)'
-                    ],
-                    'reasoning': f'Your glucose level ({value} {test["unit"]}) is elevated. These dietary changes can help manage blood sugar levels.',
-                    'meal_timing': 'Eat smaller, frequent meals every 3-4 hours',
-                    'portion_control': 'Use the plate method: 1/2 vegetables, 1/4 lean protein, 1/4 whole grains'
-                })
-            
-            # Cholesterol related recommendations
-            elif 'cholesterol' in test_name and status in ['high', 'critical']:
-                recommendations.append({
-                    'category': 'Heart-Healthy Diet',
-                    'foods_to_include': [
-                        'Fatty fish (salmon, mackerel, sardines)',
-                        'Oats and barley',
-                        'Beans and lentils',
-                        'Avocados',
-                        'Olive oil',
-                        'Nuts (walnuts, almonds)',
-                        'Apples and citrus fruits'
-                    ],
-                    'foods_to_avoid': [
-                        'Saturated fats (red meat, butter)',
-                        'Trans fats (processed foods)',
-                        'Full-fat dairy products',
-                        'Fried foods',
-                        'Processed meats',
-                        'Baked goods with hydrogenated oils'
-                    ],
-                    'reasoning': f'Your cholesterol level ({value} {test["unit"]}) is elevated. These foods can help lower cholesterol naturally.',
-                    'cooking_tips': 'Use olive oil instead of butter, grill or bake instead of frying'
-                })
-            
-            # Hemoglobin/Anemia related recommendations
-            elif 'hemoglobin' in test_name and status in ['low', 'critical']:
-                recommendations.append({
-                    'category': 'Iron-Rich Diet',
-                    'foods_to_include': [
-                        'Red meat (in moderation)',
-                        'Dark leafy greens (spinach, Swiss chard)',
-                        'Beans and lentils',
-                        'Iron-fortified cereals',
-                        'Tofu and tempeh',
-                        'Pumpkin seeds',
-                        'Dark chocolate',
-                        'Vitamin C rich foods (oranges, bell peppers)'
-                    ],
-                    'foods_to_avoid': [
-                        'Tea and coffee with meals (reduces iron absorption)',
-                        'Calcium supplements with iron-rich meals',
-                        'Whole grains with iron-rich meals (if taken together)'
-                    ],
-                    'reasoning': f'Your hemoglobin level ({value} {test["unit"]}) is low. These iron-rich foods can help improve your levels.',
-                    'absorption_tips': 'Combine iron-rich foods with vitamin C sources for better absorption'
-                })
-            
-            # Blood pressure related recommendations
-            elif 'blood pressure' in test_name or 'bp' in test_name:
-                if status in ['high', 'abnormal']:
-                    recommendations.append({
-                        'category': 'DASH Diet for Blood Pressure',
-                        'foods_to_include': [
-                            'Fruits and vegetables (8-10 servings daily)',
-                            'Whole grains',
-                            'Low-fat dairy products',
-                            'Lean meats and fish',
-                            'Nuts and seeds',
-                            'Potassium-rich foods (bananas, oranges, potatoes)'
-                        ],
-                        'foods_to_avoid': [
-                            'High sodium foods (processed foods, canned soups)',
-                            'Pickled and cured foods',
-                            'Restaurant and fast foods',
-                            'Excessive alcohol',
-                            'Foods high in saturated fats'
-                        ],
-                        'reasoning': 'Your blood pressure is elevated. The DASH diet has been proven to lower blood pressure.',
-                        'sodium_limit': 'Limit sodium to less than 2,300mg per day (ideally 1,500mg)',
-                        'potassium_goal': 'Aim for 3,500-4,700mg of potassium daily'
-                    })
+        # One block per abnormal test result, looked up by (analyte, status)
+        for test in analysis.get('test_results', []):
+            analyte = self.rules.canonical_analyte(test['name'])
+            rule_ids = self.rules.analyte_rules('dietary', analyte, test['status'])
+            if not rule_ids:
+                continue
+            recommendation = thaw(self.rules.block('dietary', rule_ids[0]))
+            recommendation['reasoning'] = recommendation['reasoning'].format(
+                value=test.get('value', 0), unit=test.get('unit', '')
+            )
+            recommendations.append(recommendation)
         
         # Add general healthy eating recommendations if no specific issues found
         if not recommendations:
-            recommendations.append({
-                'category': 'General Healthy Eating',
-                'foods_to_include': [
-                    'Variety of colorful fruits and vegetables',
-                    'Whole grains',
-                    'Lean proteins',
-                    'Healthy fats (olive oil, nuts, avocados)',
-                    'Adequate water intake (8-10 glasses daily)'
-                ],
-                'foods_to_avoid': [
-                    'Excessive processed foods',
-                    'Too much added sugar',
-                    'Excessive saturated fats',
-                    'Too much sodium'
-                ],
-                'reasoning': 'Your test results appear normal. Maintain a balanced diet for optimal health.',
-                'general_tips': 'Follow the MyPlate guidelines for balanced nutrition'
-            })
+            recommendations.extend(thaw(self.rules.sections['dietary']['default']))
         
         return recommendations
     
     def _generate_lifestyle_recommendations(self, analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Generate lifestyle recommendations based on analysis"""
-        recommendations = []
-        
-        # Exercise recommendations based on conditions
-        test_results = analysis.get('test_results', [])
-        risk_factors = analysis.get('risk_factors', [])
-        
-        # General exercise recommendations
-        exercise_rec = {
-            'category': 'Physical Activity',
-            'recommendations': [
-                'Aim for at least 150 minutes of moderate-intensity aerobic activity per week',
-                'Include muscle-strengthening activities 2+ days per week',
-                'Start slowly if you\'re not currently active',
-                'Include flexibility and balance exercises'
-            ],
-            'specific_activities': [],
-            'precautions': []
-        }
+        lifestyle = self.rules.sections['lifestyle']
         
-        # Customize based on specific conditions
-        has_high_glucose = any('glucose' in test['name'].lower() and test['status'] in ['high', 'critical'] 
-                             for test in test_results)
-        has_high_cholesterol = any('cholesterol' in test['name'].lower() and test['status'] in ['high', 'critical'] 
-                                 for test in test_results)
-        has_high_bp = any('pressure' in test['name'].lower() and test['status'] in ['high', 'abnormal'] 
-                         for test in test_results)
+        # General exercise recommendations, customized by each triggered condition
+        exercise_rec = thaw(lifestyle['exercise'])
+        for rule_id in self._result_rules('lifestyle', analysis.get('test_results', [])):
+            block = self.rules.block('lifestyle', rule_id)
+            exercise_rec['specific_activities'].extend(block['specific_activities'])
+            exercise_rec['precautions'].extend(block['precautions'])
         
-        if has_high_glucose:
-            exercise_rec['specific_activities'].extend([
-                'Brisk walking after meals',
-                'Swimming',
-                'Cycling',
-                'Resistance training with light weights'
-            ])
-            exercise_rec['precautions'].extend([
-                'Monitor blood sugar before and after exercise',
-                'Carry glucose tablets if on diabetes medication',
-                'Stay hydrated during exercise'
-            ])
-        
-        if has_high_cholesterol:
-            exercise_rec['specific_activities'].extend([
-                'Aerobic exercises (running, cycling, swimming)',
-                'Interval training',
-                'Dancing',
-                'Team sports'
-            ])
-        
-        if has_high_bp:
-            exercise_rec['specific_activities'].extend([
-                'Moderate aerobic exercise',
-                'Yoga and tai chi',
-                'Light weight training',
-                'Water aerobics'
-            ])
-            exercise_rec['precautions'].extend([
-                'Avoid heavy lifting or straining',
-                'Monitor blood pressure regularly',
-                'Start exercise gradually'
-            ])
-        
-        recommendations.append(exercise_rec)
-        
-        # Sleep recommendations
-        recommendations.append({
-            'category': 'Sleep Hygiene',
-            'recommendations': [
-                'Aim for 7-9 hours of sleep per night',
-                'Maintain consistent sleep schedule',
-                'Create a relaxing bedtime routine',
-                'Keep bedroom cool, dark, and quiet',
-                'Avoid screens 1 hour before bedtime',
-                'Limit caffeine after 2 PM'
-            ],
-            'benefits': [
-                'Better blood sugar control',
-                'Improved cardiovascular health',
-                'Enhanced immune function',
-                'Better mental health'
-            ]
-        })
-        
-        # Stress management recommendations
-        recommendations.append({
-            'category': 'Stress Management',
-            'recommendations': [
-                'Practice deep breathing exercises daily',
-                'Try meditation or mindfulness (10-15 minutes daily)',
-                'Engage in hobbies you enjoy',
-                'Maintain social connections',
-                'Consider counseling if needed',
-                'Practice time management'
-            ],
-            'techniques': [
-                '4-7-8 breathing technique',
-                'Progressive muscle relaxation',
-                'Guided meditation apps',
-                'Journaling',
-                'Nature walks'
-            ]
-        })
-        
-        # Smoking cessation (if applicable)
-        recommendations.append({
-            'category': 'Smoking Cessation',
-            'recommendations': [
-                'Consult healthcare provider about cessation programs',
-                'Consider nicotine replacement therapy',
-                'Identify and avoid triggers',
-                'Find healthy alternatives to smoking',
-                'Join support groups',
-                'Set a quit date and stick to it'
-            ],
-            'benefits': [
-                'Reduced cardiovascular risk',
-                'Better lung function',
-                'Improved circulation',
-                'Lower cancer risk'
-            ],
-            'note': 'If you don\'t smoke, continue avoiding tobacco and secondhand smoke'
-        })
-        
-        return recommendations
+        # Sleep, stress management and smoking cessation apply to everyone
+        return [exercise_rec] + thaw(lifestyle['static'])
     
     def _generate_medication_recommendations(self, medications: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Generate medication management recommendations"""
-        recommendations = []
-        
-        # General medication management
-        recommendations.append({
-            'category': 'Medication Adherence',
-            'recommendations': [
-                'Take medications exactly as prescribed',
-                'Use pill organizers or medication apps for reminders',
-                'Don\'t skip doses or stop medications without consulting your doctor',
-                'Keep an updated list of all medications',
-                'Inform all healthcare providers about your medications',
-                'Store medications properly (temperature, light, moisture)'
-            ],
-            'tips': [
-                'Set phone alarms for medication times',
-                'Link taking medications to daily routines',
-                'Keep emergency medication information accessible'
-            ]
-        })
-        
-        # Specific medication interactions and precautions
-        med_names = [med['name'].lower() for med in medications]
-        
-        # Check for common medication categories and provide specific advice
-        if any('metformin' in name for name in med_names):
-            recommendations.append({
-                'category': 'Diabetes Medication Management',
-                'recommendations': [
-                    'Take metformin with meals to reduce stomach upset',
-                    'Monitor blood sugar levels as directed',
-                    'Report persistent nausea, vomiting, or stomach pain',
-                    'Avoid excessive alcohol consumption',
-                    'Stay hydrated, especially during illness'
-                ],
-                'side_effects_to_watch': [
-                    'Metallic taste in mouth',
-                    'Nausea or vomiting',
-                    'Diarrhea',
-                    'Stomach pain'
-                ]
-            })
+        section = self.rules.sections['medication']
+        recommendations = thaw(section['base'])
         
-        if any('statin' in name or any(word in name for word in ['atorvastatin', 'simvastatin', 'rosuvastatin']) for name in med_names):
-            recommendations.append({
-                'category': 'Cholesterol Medication Management',
-                'recommendations': [
-                    'Take as directed, usually in the evening',
-                    'Report muscle pain or weakness immediately',
-                    'Avoid grapefruit juice (can increase drug levels)',
-                    'Regular liver function tests as recommended',
-                    'Continue healthy diet and exercise'
-                ],
-                'side_effects_to_watch': [
-                    'Muscle pain or weakness',
-                    'Dark-colored urine',
-                    'Unusual fatigue',
-                    'Abdominal pain'
-                ]
-            })
-        
-        if any('ace inhibitor' in name or any(word in name for word in ['lisinopril', 'enalapril', 'captopril']) for name in med_names):
-            recommendations.append({
-                'category': 'Blood Pressure Medication Management',
-                'recommendations': [
-                    'Take at the same time each day',
-                    'Monitor blood pressure regularly',
-                    'Rise slowly from sitting or lying positions',
-                    'Avoid potassium supplements unless prescribed',
-                    'Report persistent dry cough'
-                ],
-                'side_effects_to_watch': [
-                    'Persistent dry cough',
-                    'Dizziness or lightheadedness',
-                    'Swelling of face, lips, or tongue',
-                    'Rapid or irregular heartbeat'
-                ]
-            })
+        # Specific advice per medication id or drug class (e.g. 'statin', 'ace inhibitor')
+        for rule_id in sorted(set(self.rules.medication_rules('medication', self._medication_ids(medications)))):
+            recommendations.append(thaw(self.rules.block('medication', rule_id)))
         
         return recommendations
     
     def _generate_followup_recommendations(self, analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Generate follow-up care recommendations"""
-        recommendations = []
-        
+        section = self.rules.sections['follow_up']
         test_results = analysis.get('test_results', [])
-        risk_factors = analysis.get('risk_factors', [])
-        
-        # General follow-up
-        recommendations.append({
-            'category': 'Regular Health Monitoring',
-            'recommendations': [
-                'Schedule regular check-ups with your primary care physician',
-                'Keep track of your health metrics',
-                'Maintain updated health records',
-                'Follow preventive care guidelines for your age group'
-            ],
-            'frequency': 'Annual physical exam, or as recommended by your doctor'
-        })
-        
-        # Specific follow-ups based on test results
-        critical_results = [test for test in test_results if test['status'] == 'critical']
-        high_results = [test for test in test_results if test['status'] == 'high']
-        
-        if critical_results:
-            recommendations.append({
-                'category': 'Urgent Follow-up',
-                'recommendations': [
-                    'Contact your healthcare provider immediately',
-                    'Do not delay seeking medical attention',
-                    'Bring your test results to the appointment',
-                    'Follow all medical advice strictly'
-                ],
-                'urgency': 'Within 24-48 hours',
-                'critical_values': [f"{test['name']}: {test['value']} {test['unit']}" for test in critical_results]
-            })
-        
-        if high_results:
-            recommendations.append({
-                'category': 'Routine Follow-up',
-                'recommendations': [
-                    'Schedule appointment with your doctor within 1-2 weeks',
-                    'Discuss treatment options if needed',
-                    'Plan for repeat testing as recommended',
-                    'Consider specialist referral if needed'
-                ],
-                'timeline': '1-2 weeks for non-critical elevated values'
-            })
-        
-        # Specific monitoring based on conditions
-        has_diabetes_risk = any('glucose' in test['name'].lower() and test['status'] in ['high', 'critical'] 
-                               for test in test_results)
-        if has_diabetes_risk:
-            recommendations.append({
-                'category': 'Diabetes Monitoring',
-                'recommendations': [
-                    'HbA1c testing every 3-6 months',
-                    'Annual eye examinations',
-                    'Annual foot examinations',
-                    'Regular kidney function tests',
-                    'Blood pressure monitoring'
-                ],
-                'specialists': ['Endocrinologist', 'Ophthalmologist', 'Podiatrist']
-            })
+        recommendations = thaw(section['base'])
+        
+        # Urgent / routine follow-up by result status
+        for status_rule in section['status_rules']:
+            matching = [test for test in test_results if test['status'] == status_rule['status']]
+            if not matching:
+                continue
+            recommendation = thaw(status_rule['block'])
+            if status_rule.get('collect'):
+                recommendation[status_rule['collect']] = [
+                    f"{test['name']}: {test['value']} {test['unit']}" for test in matching
+                ]
+            recommendations.append(recommendation)
         
-        has_heart_risk = any('cholesterol' in test['name'].lower() or 'pressure' in test['name'].lower() 
-                            for test in test_results if test['status'] in ['high', 'abnormal'])
-        if has_heart_risk:
-            recommendations.append({
-                'category': 'Cardiovascular Monitoring',
-                'recommendations': [
-                    'Lipid panel every 6-12 months',
-                    'Blood pressure checks regularly',
-                    'Consider cardiac risk assessment',
-                    'EKG as recommended by doctor'
-                ],
-                'specialists': ['Cardiologist']
-            })
+        # Condition-specific monitoring
+        for rule_id in self._result_rules('follow_up', test_results):
+            recommendations.append(thaw(self.rules.block('follow_up', rule_id)))
         
         return recommendations
     
     def _generate_emergency_signs(self, analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Generate emergency warning signs to watch for"""
-        emergency_signs = []
-        
-        test_results = analysis.get('test_results', [])
-        medications = analysis.get('medications', [])
+        section = self.rules.sections['emergency_signs']
+        emergency_signs = thaw(section['base'])
         
-        # General emergency signs
-        emergency_signs.append({
-            'category': 'General Emergency Signs',
-            'signs': [
-                'Chest pain or pressure',
-                'Difficulty breathing or shortness of breath',
-                'Severe headache',
-                'Loss of consciousness or fainting',
-                'Severe abdominal pain',
-                'High fever (>101.3°F/38.5°C)',
-                'Severe allergic reactions'
-            ],
-            'action': 'Call 911 or go to emergency room immediately'
-        })
+        for rule_id in self._result_rules('emergency_signs', analysis.get('test_results', [])):
+            emergency_signs.append(thaw(self.rules.block('emergency_signs', rule_id)))
         
-        # Diabetes-related emergency signs
-        has_diabetes_indicators = any('glucose' in test['name'].lower() for test in test_results)
-        if has_diabetes_indicators:
-            emergency_signs.append({
-                'category': 'Blood Sugar Emergencies',
-                'signs': [
-                    'Blood sugar below 70 mg/dL with symptoms',
-                    'Blood sugar above 400 mg/dL',
-                    'Persistent vomiting',
-                    'Signs of dehydration',
-                    'Fruity breath odor',
-                    'Confusion or altered mental state',
-                    'Rapid breathing'
-                ],
-                'action': 'Check blood sugar immediately and seek emergency care if severe'
-            })
-        
-        # Medication-related emergency signs
+        medications = analysis.get('medications', [])
         if medications:
-            med_names = [med['name'].lower() for med in medications]
-            
-            if any('warfarin' in name or 'blood thinner' in name for name in med_names):
-                emergency_signs.append({
-                    'category': 'Blood Thinner Emergency Signs',
-                    'signs': [
-                        'Unusual bleeding that won\'t stop',
-                        'Blood in urine or stool',
-                        'Severe headache',
-                        'Dizziness or weakness',
-                        'Unusual bruising'
-                    ],
-                    'action': 'Seek immediate medical attention'
-                })
+            rule_ids = self.rules.medication_rules('emergency_signs', self._medication_ids(medications))
+            for rule_id in sorted(set(rule_ids)):
+                emergency_signs.append(thaw(self.rules.block('emergency_signs', rule_id, key='medication_rules')))
         
         return emergency_signs
     
@@ -582,54 +331,12 @@ class RecommendationEngine:
     
     def _load_dietary_guidelines(self) -> Dict[str, Any]:
         """Load dietary guidelines database"""
-        # In production, this would load from a comprehensive nutrition database
-        return {
-            'diabetes': {
-                'carbohydrate_counting': True,
-                'glycemic_index_focus': True,
-                'meal_timing': 'regular'
-            },
-            'hypertension': {
-                'dash_diet': True,
-                'sodium_restriction': True,
-                'potassium_increase': True
-            },
-            'hyperlipidemia': {
-                'saturated_fat_limit': True,
-                'omega3_increase': True,
-                'fiber_increase': True
-            }
-        }
+        return get_knowledge_base().dietary_guidelines
     
     def _load_lifestyle_guidelines(self) -> Dict[str, Any]:
         """Load lifestyle guidelines database"""
-        return {
-            'exercise': {
-                'aerobic_minutes_per_week': 150,
-                'strength_training_days': 2,
-                'flexibility_daily': True
-            },
-            'sleep': {
-                'hours_per_night': {'min': 7, 'max': 9},
-                'consistent_schedule': True
-            },
-            'stress_management': {
-                'daily_relaxation': True,
-                'social_support': True
-            }
-        }
+        return get_knowledge_base().lifestyle_guidelines
     
     def _load_medication_guidelines(self) -> Dict[str, Any]:
         """Load medication management guidelines"""
-        return {
-            'adherence': {
-                'timing_consistency': True,
-                'dose_accuracy': True,
-                'monitoring_required': True
-            },
-            'interactions': {
-                'food_interactions': True,
-                'drug_interactions': True,
-                'supplement_interactions': True
-            }
-        }
\ No newline at end of file
+        return get_knowledge_base().medication_guidelines
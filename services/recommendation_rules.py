@@ -0,0 +1,115 @@
+# /services/recommendation_rules.py
+
+import re
+import json
+import logging
+from functools import lru_cache
+from typing import Dict, List, Any, Mapping, Optional, Tuple
+
+from utils.config import Config
+from services.knowledge_base import freeze
+
+logger = logging.getLogger(__name__)
+
+# Sections whose rules are keyed by (canonical analyte, status)
+ANALYTE_SECTIONS = ('dietary', 'lifestyle', 'follow_up', 'emergency_signs')
+# Sections whose rules are keyed by canonical medication id or class
+MEDICATION_SECTIONS = {'medication': 'rules', 'emergency_signs': 'medication_rules'}
+
+ANY_STATUS = '*'
+
+
+class RuleIndex:
+    """
+    Compiled recommendation rule table.
+
+    Rules are loaded from data/recommendation_rules.json and frozen into
+    read-only blocks. Each section is compiled into a dict keyed by
+    (canonical analyte, status) or by medication id, so generating
+    recommendations is one dict lookup per test result or medication.
+
+    Test names resolve through the 'analytes' alias table in every section.
+    Abbreviated names ('Systolic BP', 'FBS') therefore trigger the same
+    follow-up blocks (Cardiovascular / Diabetes Monitoring) as the spelled-out
+    ones; the hand-written follow-up code this replaced only matched the
+    substrings 'pressure' and 'glucose'.
+    """
+
+    def __init__(self, raw: Dict[str, Any]):
+        self.sections: Mapping[str, Any] = freeze(raw)
+
+        aliases = {}
+        for analyte, names in raw.get('analytes', {}).items():
+            for name in [analyte] + names:
+                aliases[name.lower()] = analyte
+        self._analyte_aliases = aliases
+        # Longest alias first so "systolic bp" wins over "bp"
+        self._analyte_pattern = re.compile(
+            r'\b(' + '|'.join(re.escape(a) for a in sorted(aliases, key=len, reverse=True)) + r')\b'
+        ) if aliases else None
+        self._analyte_memo: Dict[str, Optional[str]] = {}
+
+        self._analyte_index: Dict[str, Dict[Tuple[str, str], Tuple[int, ...]]] = {}
+        for section in ANALYTE_SECTIONS:
+            index: Dict[Tuple[str, str], List[int]] = {}
+            for rule_id, rule in enumerate(raw.get(section, {}).get('rules', [])):
+                for analyte, statuses in rule['when']:
+                    for status in statuses:
+                        index.setdefault((analyte, status), []).append(rule_id)
+            self._analyte_index[section] = {key: tuple(ids) for key, ids in index.items()}
+
+        self._medication_index: Dict[str, Dict[str, Tuple[int, ...]]] = {}
+        for section, key in MEDICATION_SECTIONS.items():
+            index = {}
+            for rule_id, rule in enumerate(raw.get(section, {}).get(key, [])):
+                for medication in rule['medications']:
+                    index.setdefault(medication.lower(), []).append(rule_id)
+            self._medication_index[section] = {med: tuple(ids) for med, ids in index.items()}
+
+    def canonical_analyte(self, test_name: str) -> Optional[str]:
+        """Map a test name such as 'Systolic BP' or 'Fasting Blood Sugar' to its analyte id"""
+        name = test_name.lower().strip()
+        if name in self._analyte_memo:
+            return self._analyte_memo[name]
+
+        analyte = self._analyte_aliases.get(name)
+        if analyte is None and self._analyte_pattern is not None:
+            match = self._analyte_pattern.search(name)
+            analyte = self._analyte_aliases[match.group(1)] if match else None
+
+        # Test names come from a small vocabulary, but never let the memo grow unbounded
+        if len(self._analyte_memo) < 4096:
+            self._analyte_memo[name] = analyte
+        return analyte
+
+    def analyte_rules(self, section: str, analyte: Optional[str], status: str) -> Tuple[int, ...]:
+        """Rule ids of `section` triggered by an (analyte, status) pair"""
+        if analyte is None:
+            return ()
+        index = self._analyte_index[section]
+        return index.get((analyte, status), ()) + index.get((analyte, ANY_STATUS), ())
+
+    def medication_rules(self, section: str, medication_ids) -> Tuple[int, ...]:
+        """Rule ids of `section` triggered by any of the given medication ids/classes"""
+        index = self._medication_index[section]
+        return tuple(rule_id for med in medication_ids for rule_id in index.get(med, ()))
+
+    def block(self, section: str, rule_id: int, key: str = 'rules') -> Mapping[str, Any]:
+        """The frozen recommendation block of a rule"""
+        return self.sections[section][key][rule_id]['block']
+
+
+@lru_cache(maxsize=None)
+def get_rule_index(path: Optional[str] = None) -> RuleIndex:
+    """
+    Load and compile the recommendation rules once per process.
+
+    Args:
+        path: Optional override of Config.RECOMMENDATION_RULES_PATH
+    """
+    path = path or Config.RECOMMENDATION_RULES_PATH
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+    index = RuleIndex(raw)
+    logger.info(f"Compiled recommendation rules from {path}")
+    return index
@@ -0,0 +1,89 @@
+# /services/report_classifier.py
+
+import os
+import logging
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+REPORT_TYPES = ('blood_test', 'prescription', 'x_ray', 'general')
+
+
+class ReportClassifier:
+    """
+    TF-IDF + linear model predicting the report type from OCR text.
+
+    Wraps a fitted scikit-learn Pipeline; the artifact is produced by
+    scripts/train_report_classifier.py and loaded once per worker.
+    """
+
+    # Only the head of very long documents is needed to tell report types apart
+    MAX_CHARS = 20000
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    def predict(self, text: str) -> str:
+        """Predict the report type of a single document"""
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts: Sequence[str]) -> List[str]:
+        """Predict report types for many documents in one vectorized call (backfills)"""
+        if not texts:
+            return []
+        return [str(label) for label in self.pipeline.predict([t[:self.MAX_CHARS] for t in texts])]
+
+    def save(self, path: str) -> None:
+        import joblib
+
+        tmp_path = f"{path}.tmp"
+        joblib.dump(self.pipeline, tmp_path)
+        os.replace(tmp_path, path)
+        logger.info(f"Saved report classifier to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> 'ReportClassifier':
+        import joblib
+
+        return cls(joblib.load(path))
+
+    @classmethod
+    def train(cls, texts: Sequence[str], labels: Sequence[str]) -> 'ReportClassifier':
+        """Fit a new classifier on labelled report texts"""
+        from sklearn.pipeline import Pipeline
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+
+        pipeline = Pipeline([
+            # Character n-grams are robust to OCR noise and tokenization quirks
+            ('tfidf', TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 4), lowercase=True,
+                                      sublinear_tf=True, min_df=2, max_features=50000)),
+            ('model', LogisticRegression(max_iter=1000, class_weight='balanced')),
+        ])
+        pipeline.fit([t[:cls.MAX_CHARS] for t in texts], list(labels))
+        return cls(pipeline)
+
+
+@lru_cache(maxsize=None)
+def get_report_classifier(path: Optional[str] = None) -> Optional[ReportClassifier]:
+    """
+    Load the report classifier artifact once per process.
+
+    Returns:
+        The shared ReportClassifier, or None if no artifact has been trained
+        (callers then fall back to keyword routing)
+    """
+    path = path or Config.REPORT_CLASSIFIER_PATH
+    if not os.path.exists(path):
+        logger.info(f"No report classifier at {path}; using keyword routing")
+        return None
+    try:
+        classifier = ReportClassifier.load(path)
+        logger.info(f"Loaded report classifier from {path}")
+        return classifier
+    except Exception as e:
+        logger.error(f"Failed to load report classifier from {path}: {e}")
+        return None
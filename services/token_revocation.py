@@ -0,0 +1,83 @@
+# /services/token_revocation.py
+
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any
+
+from utils.config import Config
+from utils.database import mongo
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationList:
+    """
+    Per-process deny-list of revoked token ids (JWT 'jti' claims).
+
+    The source of truth is the revoked_tokens collection; each worker keeps the
+    ids in memory and reloads the unexpired ones at most every `refresh_seconds`,
+    so checking a token costs a set lookup. A token revoked in another worker
+    is rejected here within one refresh interval. Entries are dropped once the
+    token would have expired anyway (MongoDB removes them via a TTL index).
+    """
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._expiry: Dict[str, datetime] = {}
+        self._next_refresh = 0.0
+        self.refreshes = 0
+
+    def _refresh(self) -> None:
+        """Reload every unexpired revocation, then swap in the merged set"""
+        now = datetime.utcnow()
+        # Not only revocations newer than the last refresh: revoked_at comes from each
+        # worker's clock and writes land out of order, so a high-water mark skips some.
+        # Tokens only live for JWT_ACCESS_TOKEN_EXPIRES, which keeps the set small.
+        # The query runs without the lock; requests keep checking the current set meanwhile
+        docs = list(mongo.db.revoked_tokens.find(
+            {'expires_at': {'$gt': now}},
+            {'jti': 1, 'expires_at': 1, '_id': 0}
+        ))
+        with self._lock:
+            # Revocations are never undone, so entries revoked here during the query are kept
+            expiry = {jti: expires for jti, expires in self._expiry.items() if expires > now}
+            for doc in docs:
+                expiry[doc['jti']] = doc['expires_at']
+            self._expiry = expiry
+            self.refreshes += 1
+
+    def is_revoked(self, jti: str) -> bool:
+        if time.monotonic() >= self._next_refresh:
+            # Exactly one thread claims each refresh; the others don't wait for it
+            with self._lock:
+                claimed = time.monotonic() >= self._next_refresh
+                if claimed:
+                    self._next_refresh = time.monotonic() + self.refresh_seconds
+            if claimed:
+                try:
+                    self._refresh()
+                except Exception as e:
+                    # Keep serving the last known list; retry on the next interval
+                    logger.error(f"Failed to refresh token revocation list: {e}")
+        return jti in self._expiry
+
+    def revoke(self, jti: str, user_id, expires_at: datetime) -> None:
+        """Persist a revocation and apply it to this process immediately"""
+        revoked_at = datetime.utcnow()
+        mongo.db.revoked_tokens.update_one(
+            {'jti': jti},
+            {'$setOnInsert': {'jti': jti, 'user_id': user_id, 'revoked_at': revoked_at, 'expires_at': expires_at}},
+            upsert=True
+        )
+        with self._lock:
+            self._expiry[jti] = expires_at
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'revoked_tokens': len(self._expiry), 'refreshes': self.refreshes}
+
+
+revocation_list = RevocationList(Config.TOKEN_REVOCATION_REFRESH_SECONDS)
@@ -0,0 +1,51 @@
+# /services/user_cache.py
+
+import copy
+import logging
+from typing import Dict, Any, Optional
+
+from bson import ObjectId
+
+from utils.cache import TTLCache
+from utils.config import Config
+from utils.database import mongo
+
+logger = logging.getLogger(__name__)
+
+# Authenticated requests look up their user on every call; a short TTL bounds how
+# long another worker can serve a profile that was just changed elsewhere
+_user_cache = TTLCache(maxsize=Config.USER_CACHE_SIZE, ttl=Config.USER_CACHE_TTL_SECONDS)
+
+# Password hashes never enter the cache; login reads users directly
+USER_CACHE_PROJECTION = {'password': 0}
+
+
+def get_cached_user(user_id) -> Optional[Dict[str, Any]]:
+    """
+    Return the user document for `user_id`, reading through the per-process cache.
+
+    Args:
+        user_id: ObjectId or its string form (the JWT 'sub' claim)
+
+    Returns:
+        A private copy of the user document (callers may modify it), or None if
+        the user does not exist. Missing users are not cached.
+    """
+    user_id = ObjectId(user_id)
+    user = _user_cache.get(user_id)
+    if user is None:
+        user = mongo.db.users.find_one({'_id': user_id}, USER_CACHE_PROJECTION)
+        if user is None:
+            return None
+        _user_cache.set(user_id, user)
+    return copy.deepcopy(user)
+
+
+def invalidate_user(user_id) -> None:
+    """Drop a user from this process's cache after the document was updated"""
+    _user_cache.pop(ObjectId(user_id))
+
+
+def user_cache_stats() -> Dict[str, Any]:
+    """Counters for the /api/metrics endpoint"""
+    return _user_cache.stats()
@@ -0,0 +1,180 @@
+# /services/user_stats.py
+
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# Reports without a detected type are shown as 'general' on the dashboard
+DEFAULT_REPORT_TYPE = 'general'
+UNKNOWN_STATUS = 'unknown'
+
+# Only the fields the counters depend on are read back from report writes
+REPORT_STATS_PROJECTION = {'user_id': 1, 'status': 1, 'report_type': 1}
+ANALYSIS_STATS_PROJECTION = {'medications': 1, 'risk_factors': 1, 'recommendations': 1}
+
+
+def _report_type(report: Dict[str, Any]) -> str:
+    return report.get('report_type') or DEFAULT_REPORT_TYPE
+
+
+def _report_status(report: Dict[str, Any]) -> str:
+    return report.get('status') or UNKNOWN_STATUS
+
+
+def analysis_counters(analysis: Optional[Dict[str, Any]], sign: int = 1) -> Dict[str, int]:
+    """The counters one analysis document contributes to its owner's stats (None: no analysis)"""
+    if analysis is None:
+        return {}
+    medications = analysis.get('medications')
+    risk_factors = analysis.get('risk_factors')
+    return {
+        'total_analyses': sign,
+        'total_medications_tracked': sign * (len(medications) if isinstance(medications, list) else 0),
+        'total_risk_factors': sign * (len(risk_factors) if isinstance(risk_factors, list) else 0),
+        'recommendations_count': sign * (1 if analysis.get('recommendations') else 0),
+    }
+
+
+def _increment(db, user_id, counters: Dict[str, int], session=None) -> None:
+    """
+    Apply counter deltas to the user's stats document in one atomic $inc.
+
+    Runs inside the upload/analysis transactions, so it never aggregates: a
+    user without a stats document (new, or predating the counters) gets one
+    holding just these deltas, marked needs_rebuild. get_user_stats or
+    scripts/rebuild_user_stats.py replace it with the full recount later.
+    """
+    counters = {key: value for key, value in counters.items() if value}
+    if not counters or user_id is None:
+        return
+    db.user_stats.update_one(
+        {'_id': user_id},
+        {
+            '$inc': counters,
+            '$set': {'updated_at': datetime.utcnow()},
+            '$setOnInsert': {'needs_rebuild': True}
+        },
+        upsert=True,
+        session=session
+    )
+
+
+def record_report_inserted(db, report: Dict[str, Any], analysis: Optional[Dict[str, Any]] = None,
+                           session=None) -> None:
+    """Count a newly inserted report (and the analysis inserted with it, if any)"""
+    counters = {
+        'total_reports': 1,
+        f"reports_by_type.{_report_type(report)}": 1,
+        f"status_counts.{_report_status(report)}": 1,
+    }
+    counters.update(analysis_counters(analysis))
+    _increment(db, report.get('user_id'), counters, session=session)
+
+
+def record_report_deleted(db, report: Dict[str, Any], analysis: Optional[Dict[str, Any]] = None) -> None:
+    """Remove a deleted report (and the analysis linked to it) from the counters"""
+    counters = {
+        'total_reports': -1,
+        f"reports_by_type.{_report_type(report)}": -1,
+        f"status_counts.{_report_status(report)}": -1,
+    }
+    counters.update(analysis_counters(analysis, sign=-1))
+    _increment(db, report.get('user_id'), counters)
+
+
+def record_analysis_inserted(db, user_id, analysis: Dict[str, Any], session=None) -> None:
+    """Count an analysis document that was just created for one of the user's reports"""
+    _increment(db, user_id, analysis_counters(analysis), session=session)
+
+
+def update_report(db, query: Dict[str, Any], fields: Dict[str, Any],
+                  counters: Optional[Dict[str, int]] = None, session=None) -> Optional[Dict[str, Any]]:
+    """
+    $set fields on a report and move its status/type counters accordingly.
+
+    Args:
+        db: Database handle
+        query: Filter selecting the report (may include a status precondition)
+        fields: Fields to $set
+        counters: Extra counter deltas applied in the same $inc (only if the report matched)
+        session: Optional session when called inside a transaction
+
+    Returns:
+        The report as it was before the update (counter fields only), or None
+        if nothing matched
+    """
+    before = db.reports.find_one_and_update(
+        query,
+        {'$set': fields},
+        projection=REPORT_STATS_PROJECTION,
+        return_document=ReturnDocument.BEFORE,
+        session=session
+    )
+    if before is None:
+        return None
+
+    counters = dict(counters or {})
+    if 'status' in fields and fields['status'] != _report_status(before):
+        counters[f"status_counts.{_report_status(before)}"] = -1
+        counters[f"status_counts.{fields['status']}"] = 1
+    if 'report_type' in fields and (fields['report_type'] or DEFAULT_REPORT_TYPE) != _report_type(before):
+        counters[f"reports_by_type.{_report_type(before)}"] = -1
+        counters[f"reports_by_type.{fields['report_type'] or DEFAULT_REPORT_TYPE}"] = 1
+    _increment(db, before.get('user_id'), counters, session=session)
+    return before
+
+
+def rebuild_user_stats(db, user_id, session=None) -> Dict[str, Any]:
+    """
+    Recompute one user's stats document from the reports and analyses collections.
+
+    Used to repair drift and to backfill users that predate the counters; the
+    replacement document clears the needs_rebuild marker.
+    """
+    pipeline = [
+        {'$match': {'user_id': user_id}},
+        {'$project': REPORT_STATS_PROJECTION},
+        {'$lookup': {
+            'from': 'analyses',
+            'localField': '_id',
+            'foreignField': 'report_id',
+            'pipeline': [{'$limit': 1}, {'$project': ANALYSIS_STATS_PROJECTION}],
+            'as': 'analysis'
+        }}
+    ]
+
+    stats: Dict[str, Any] = {
+        'total_reports': 0,
+        'total_analyses': 0,
+        'total_medications_tracked': 0,
+        'total_risk_factors': 0,
+        'recommendations_count': 0,
+        'reports_by_type': {},
+        'status_counts': {},
+    }
+    for report in db.reports.aggregate(pipeline, session=session):
+        stats['total_reports'] += 1
+        report_type, status = _report_type(report), _report_status(report)
+        stats['reports_by_type'][report_type] = stats['reports_by_type'].get(report_type, 0) + 1
+        stats['status_counts'][status] = stats['status_counts'].get(status, 0) + 1
+        if report['analysis']:
+            for key, value in analysis_counters(report['analysis'][0]).items():
+                stats[key] += value
+
+    stats['updated_at'] = datetime.utcnow()
+    db.user_stats.replace_one({'_id': user_id}, stats, upsert=True, session=session)
+    stats['_id'] = user_id
+    return stats
+
+
+def get_user_stats(db, user_id) -> Dict[str, Any]:
+    """Read the user's stats document, building it on first access or when marked for rebuild"""
+    stats = db.user_stats.find_one({'_id': user_id})
+    if stats is None or stats.get('needs_rebuild'):
+        logger.info(f"Stats for user {user_id} missing or incomplete; rebuilding")
+        stats = rebuild_user_stats(db, user_id)
+    return stats
@@ -0,0 +1,31 @@
+# /tests/test_analysis_store.py
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.config import Config
+from services.analysis_store import analysis_status
+
+
+def _ago(minutes):
+    return datetime.utcnow() - timedelta(minutes=minutes)
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, None),
+    ({'provisional': True, 'analysis_status': 'pending', 'created_at': _ago(1)}, 'pending'),
+    ({'provisional': False, 'analysis_status': 'completed', 'created_at': _ago(600)}, 'completed'),
+    ({'provisional': False, 'analysis_status': 'failed', 'created_at': _ago(1)}, 'failed'),
+    # Written before analysis_status existed
+    ({'provisional': True}, 'pending'),
+    ({'provisional': False}, 'completed'),
+])
+def test_status_of_stored_headers(header, expected):
+    assert analysis_status(header) == expected
+
+
+def test_pending_past_the_timeout_is_reported_failed():
+    stale = _ago(Config.GEMINI_ANALYSIS_TIMEOUT_MINUTES + 1)
+    assert analysis_status({'provisional': True, 'analysis_status': 'pending', 'created_at': stale}) == 'failed'
+    assert analysis_status({'provisional': True, 'created_at': stale}) == 'failed'
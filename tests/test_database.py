@@ -0,0 +1,64 @@
+# /tests/test_database.py
+
+import logging
+from collections import defaultdict
+
+import pytest
+from bson import SON
+
+from utils import database
+from utils.database import ensure_indexes
+
+REQUIRED = [
+    ('sessions', [('expires_at', 1)], {'name': 'expires_at_ttl', 'expireAfterSeconds': 3600}),
+    ('users', [('email', 1)], {'name': 'email_unique', 'unique': True}),
+    ('reports', [('status', 1)], {'name': 'status_partial', 'partialFilterExpression': {'status': 'processing'}}),
+]
+
+
+class FakeCollection:
+    def __init__(self):
+        self.indexes = {'_id_': {'key': [('_id', 1)], 'v': 2}}
+        self.created = []
+
+    def index_information(self):
+        return self.indexes
+
+    def create_index(self, keys, **options):
+        self.created.append(options['name'])
+        self.indexes[options['name']] = {'key': keys, **{k: v for k, v in options.items() if k != 'name'}}
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(database, 'REQUIRED_INDEXES', REQUIRED)
+    return defaultdict(FakeCollection)
+
+
+def test_creates_missing_indexes_once(db):
+    assert ensure_indexes(db) == 3
+    assert ensure_indexes(db) == 0
+
+
+def test_equivalent_index_under_another_name_is_accepted(db):
+    db['users'].indexes['email_1'] = {'key': [('email', 1)], 'unique': True, 'v': 2}
+    db['reports'].indexes['status_1'] = {'key': [('status', 1)], 'partialFilterExpression': SON([('status', 'processing')])}
+    assert ensure_indexes(db) == 1
+    assert db['users'].created == [] and db['reports'].created == []
+
+
+@pytest.mark.parametrize('collection, info', [
+    ('sessions', {'key': [('expires_at', 1)], 'expireAfterSeconds': 60}),
+    ('sessions', {'key': [('expires_at', 1)]}),
+    ('users', {'key': [('email', 1)]}),
+    ('users', {'key': [('email', 1)], 'unique': True, 'sparse': True}),
+    ('reports', {'key': [('status', 1)]}),
+    ('reports', {'key': [('status', 1)], 'partialFilterExpression': {'status': 'failed'}}),
+])
+def test_index_built_with_other_options_is_reported_not_rebuilt(db, caplog, collection, info):
+    db[collection].indexes['existing'] = dict(info)
+    with caplog.at_level(logging.WARNING, logger='utils.database'):
+        ensure_indexes(db)
+    assert db[collection].created == []
+    assert db[collection].indexes['existing'] == info
+    assert any('built differently' in message for message in caplog.messages)
@@ -0,0 +1,78 @@
+# /tests/test_fuzzy_matcher.py
+
+import json
+
+import pytest
+
+from services.fuzzy_matcher import FuzzyIndex, delete_variants
+from services.medication_store import MedicationStore, build_medication_store
+
+
+@pytest.fixture
+def index():
+    return FuzzyIndex(['Metformin', 'Lisinopril', 'Atorvastatin', 'Aspirin', 'Warfarin', 'Insulin Glargine'])
+
+
+def test_exact_and_normalized_matches(index):
+    assert index.match('metformin') == 'metformin'
+    assert index.match('  INSULIN   glargine ') == 'insulin glargine'
+    assert 'Aspirin' in index
+
+
+@pytest.mark.parametrize('token, expected', [
+    ('asprin', 'aspirin'),            # 6 chars: one edit allowed
+    ('warfrin', 'warfarin'),
+    ('metf0rmin', 'metformin'),       # 9 chars: two edits allowed
+    ('atorvastatn', 'atorvastatin'),
+    ('lisinorpil', 'lisinopril'),     # transpositions count as one edit
+])
+def test_matches_within_the_length_dependent_bound(index, token, expected):
+    assert index.match(token) == expected
+
+
+@pytest.mark.parametrize('token', [
+    'aspx',          # <= 4 chars: exact matches only
+    'asprn',         # 5 chars but two edits from 'aspirin'
+    'mxtfxrmxn',     # 9 chars, three edits
+    '',
+])
+def test_rejects_tokens_beyond_the_bound(index, token):
+    assert index.match(token) is None
+
+
+def test_ties_break_alphabetically():
+    index = FuzzyIndex(['metformin', 'metformen'])
+    assert index.match('metformon') == 'metformen'
+    assert FuzzyIndex(['metformen', 'metformin']).match('metformon') == 'metformen'
+
+
+def test_closer_candidate_wins_over_alphabetical_order():
+    index = FuzzyIndex(['atorvastatin', 'atorvastatix'])
+    assert index.match('atorvastatinn') == 'atorvastatin'
+
+
+def test_edit_distance_stops_at_the_limit():
+    assert FuzzyIndex._edit_distance('aspirin', 'aspirin', 2) == 0
+    assert FuzzyIndex._edit_distance('aspirin', 'apsirin', 2) == 1
+    assert FuzzyIndex._edit_distance('aspirin', 'warfarin', 1) == 2
+    assert FuzzyIndex._edit_distance('a', 'abcdef', 2) == 3
+
+
+def test_delete_variants_cover_the_distance():
+    assert delete_variants('abc', 1) == {'abc', 'bc', 'ac', 'ab'}
+    assert '' in delete_variants('ab', 2)
+
+
+def test_store_candidates_come_from_the_deletes_table(tmp_path):
+    source = tmp_path / 'formulary.json'
+    source.write_text(json.dumps({'rosuvastatin': {'aliases': ['crestor']}, 'amlodipine': {}}))
+    db_path = str(tmp_path / 'medications.sqlite3')
+    build_medication_store(str(source), db_path)
+
+    index = FuzzyIndex(['aspirin'], store=MedicationStore(db_path))
+    assert len(index) == 1  # formulary names stay on disk
+    assert index.match('rosuvastatn') == 'rosuvastatin'
+    assert index.match('crestorr') == 'crestor'
+    assert index.match('amlodipine') == 'amlodipine'
+    assert index.match('asprin') == 'aspirin'
+    assert index.match('zzzzzzzz') is None
@@ -0,0 +1,119 @@
+# /tests/test_medical_analyzer.py
+
+import json
+
+import pytest
+
+from services.medical_analyzer import MedicalAnalyzer
+
+PRESCRIPTION_LINES = [
+    'Tab Metformin 500 mg twice daily after meals', 'Lisinopril 10 mg once daily',
+    'Cap Omeprazole 20 mg before breakfast', 'Atorvastatin 20 mg daily at night',
+    'Warfarin 5 mg once daily', 'Metf0rmin 850 mg bd', 'Paracetamol 650 mg as needed',
+]
+LAB_LINES = [
+    'Glucose (FBS): 182 mg/dL', 'Hemoglobin: 10.4 g/dL', 'Total Cholesterol: 245 mg/dL',
+    'Creatinine: 1.1 mg/dL', 'HbA1c: 7.9 %', 'LDL: 160 mg/dL', 'HDL: 38 mg/dL',
+]
+IMAGING_LINES = [
+    'Chest X-ray PA view shows clear lung fields with no consolidation.',
+    'Impression: mild cardiomegaly with normal pulmonary vasculature.',
+    'The study reveals a small lesion in the right lower lobe measuring 8 mm.',
+]
+FILLER = 'Patient advised to continue current regimen and review in two weeks. '
+
+
+@pytest.fixture(scope='module')
+def analyzer():
+    return MedicalAnalyzer()
+
+
+def _pages(lines, lines_per_page=5, repeat=40):
+    """Split a long report into pages, cycling through `lines` with varying stride"""
+    report = [lines[(i * 3) % len(lines)] for i in range(len(lines) * repeat)]
+    return ['\n'.join(report[i:i + lines_per_page]) for i in range(0, len(report), lines_per_page)]
+
+
+def _comparable(analysis):
+    """Drop timing fields and make list order irrelevant"""
+    return {
+        key: sorted(json.dumps(item, sort_keys=True) for item in value) if isinstance(value, list) else value
+        for key, value in analysis.items() if key not in ('processing_time', 'page_count')
+    }
+
+
+@pytest.mark.parametrize('lines, report_type', [
+    (PRESCRIPTION_LINES, 'prescription'),
+    (LAB_LINES, 'blood_test'),
+    (IMAGING_LINES, 'x_ray'),
+])
+@pytest.mark.parametrize('lines_per_page', [1, 4, 9, 40])
+def test_pages_match_whole_report(analyzer, lines, report_type, lines_per_page):
+    pages = _pages(lines, lines_per_page)
+    streamed = analyzer.analyze_pages(iter(pages), report_type)
+    whole = analyzer.analyze_report('\n'.join(pages), report_type)
+    assert streamed['page_count'] == len(pages)
+    assert _comparable(streamed) == _comparable(whole)
+
+
+def test_general_report_pages_find_the_same_values(analyzer):
+    pages = _pages(LAB_LINES + PRESCRIPTION_LINES + ['BP 150/95 mmHg, pulse 76'], 4)
+    streamed = analyzer.analyze_pages(pages, 'other')
+    whole = analyzer.analyze_report('\n'.join(pages), 'other')
+    for key in ('test_results', 'medications'):
+        assert _comparable(streamed)[key] == _comparable(whole)[key]
+    # Contexts may be cut at a page end; the terms found are the same
+    assert sorted(r['term'] for r in streamed['risk_factors']) == sorted(r['term'] for r in whole['risk_factors'])
+
+
+def _assert_same_extractions(analyzer, pages):
+    streamed = _comparable(analyzer.analyze_pages(pages, 'other'))
+    whole = _comparable(analyzer.analyze_report('\n'.join(pages), 'other'))
+    assert streamed['medications'] == whole['medications']
+    assert streamed['test_results'] == whole['test_results']
+
+
+@pytest.mark.parametrize('first, second', [
+    ('Tab Metformin', '500 mg twice daily'),           # name | dose
+    ('Atorvastatin 20', 'mg daily at night'),           # dose | unit
+    ('Atorvastatin 20 mg', 'daily at night'),           # dose | frequency
+    ('Warfarin 5 mg once', 'daily'),                    # inside the frequency
+    ('Hemoglobin:', '10.4 g/dL'),
+    ('BP 150/', '95 mmHg'),
+])
+def test_matches_straddling_a_page_break(analyzer, first, second):
+    _assert_same_extractions(analyzer, [FILLER * 8 + first, second + ' ' + FILLER * 8])
+
+
+# Trailing text moves the line across the margin before the page end where
+# matches are deferred to the next chunk
+@pytest.mark.parametrize('padding', range(0, MedicalAnalyzer.PAGE_MATCH_MARGIN + 24, 2))
+@pytest.mark.parametrize('line', [
+    'Warfarin 5 mg once daily', 'Atorvastatin 20 mg daily at night', 'Metf0rmin 850 mg bd', 'Hemoglobin: 10.4 g/dL',
+])
+def test_matches_near_the_deferral_margin_are_counted_once(analyzer, padding, line):
+    _assert_same_extractions(analyzer, [FILLER * 8 + line + ' ' + 'x' * padding, FILLER * 8])
+
+
+def test_dose_split_across_pages_keeps_its_frequency(analyzer):
+    pages = [FILLER * 8 + 'Tab Metformin', '500 mg twice daily ' + FILLER * 8]
+    medications = analyzer.analyze_pages(pages, 'prescription')['medications']
+    assert {(m['name'], m['dosage'], m['frequency']) for m in medications} == {('Metformin', '500 mg', 'twice daily')}
+
+
+def test_empty_input(analyzer):
+    analysis = analyzer.analyze_pages([], 'prescription')
+    assert analysis['page_count'] == 0
+    assert analysis['medications'] == []
+
+
+class _BrokenClassifier:
+    def predict(self, text):
+        raise ValueError('X has 12 features, but TfidfVectorizer is expecting 50000 features')
+
+
+def test_a_failing_classifier_falls_back_to_keywords(analyzer, monkeypatch):
+    monkeypatch.setattr(analyzer, 'report_classifier', _BrokenClassifier())
+    pages = ['Rx prescription\nTab Metformin 500 mg twice daily', 'Warfarin 5 mg once daily']
+    assert analyzer.analyze_pages(pages)['report_type'] == 'prescription'
+    assert analyzer.analyze_report('\n'.join(pages))['report_type'] == 'prescription'
@@ -0,0 +1,71 @@
+# /tests/test_pagination.py
+
+import base64
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from utils.pagination import (
+    InvalidCursor, decode_cursor, encode_cursor, keyset_filter, next_cursor, parse_limit
+)
+
+
+def test_cursor_round_trip_keeps_microseconds():
+    upload_date, doc_id = datetime(2024, 3, 1, 12, 30, 45, 123456), ObjectId()
+    cursor = encode_cursor(upload_date, doc_id)
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (upload_date, doc_id)
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor!',
+    _b64(b'not json'),
+    _b64(b'[]'),
+    _b64(b'{"d": "2024-03-01T12:00:00"}'),
+    _b64(b'{"d": "yesterday", "i": "65f000000000000000000000"}'),
+    _b64(b'{"d": "2024-03-01T12:00:00", "i": "xyz"}'),
+    'ü',
+])
+def test_garbage_cursors_raise_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+    with pytest.raises(ValueError):
+        keyset_filter(cursor)
+
+
+def test_keyset_filter_selects_strictly_after_the_cursor():
+    assert keyset_filter(None) == {}
+    assert keyset_filter('') == {}
+
+    upload_date, doc_id = datetime(2024, 3, 1), ObjectId()
+    assert keyset_filter(encode_cursor(upload_date, doc_id)) == {'$or': [
+        {'upload_date': {'$lt': upload_date}},
+        {'upload_date': upload_date, '_id': {'$lt': doc_id}},
+    ]}
+
+
+@pytest.mark.parametrize('args, expected', [
+    ({}, 20),
+    ({'limit': '5'}, 5),
+    ({'limit': '0'}, 1),
+    ({'limit': '-3'}, 1),
+    ({'limit': '1000'}, 100),
+])
+def test_parse_limit_clamps(args, expected):
+    assert parse_limit(args, 20, 100) == expected
+
+
+def test_parse_limit_rejects_non_integers():
+    with pytest.raises(ValueError):
+        parse_limit({'limit': 'ten'}, 20, 100)
+
+
+def test_next_cursor_points_at_last_returned_document():
+    docs = [{'upload_date': datetime(2024, 3, day), '_id': ObjectId()} for day in (5, 4, 3)]
+    assert next_cursor(docs[:2], 2) is None
+    assert decode_cursor(next_cursor(docs, 2)) == (docs[1]['upload_date'], docs[1]['_id'])
@@ -0,0 +1,95 @@
+# /tests/test_rate_limit.py
+
+import pytest
+from flask import Flask, Blueprint
+
+from utils.config import Config
+from utils.rate_limit import (
+    WINDOW_SECONDS, MemoryBackend, RateLimiter, retry_after_seconds, sliding_window_estimate
+)
+
+
+def test_estimate_weights_previous_window_by_remaining_overlap():
+    assert sliding_window_estimate(10, 2, 0) == 12
+    assert sliding_window_estimate(10, 2, WINDOW_SECONDS / 2) == 7
+    assert sliding_window_estimate(10, 2, WINDOW_SECONDS) == 2
+
+
+def test_memory_backend_rolls_windows_over():
+    backend = MemoryBackend()
+    assert [backend.hit('k', 5) for _ in range(3)] == [(0, 1), (0, 2), (0, 3)]
+    # The next window carries the old count as 'previous'
+    assert backend.hit('k', 6) == (3, 1)
+    # A skipped window drops everything
+    assert backend.hit('k', 8) == (0, 1)
+    # Keys are independent
+    assert backend.hit('other', 8) == (0, 1)
+
+
+def test_memory_backend_purges_stale_keys():
+    backend = MemoryBackend()
+    backend.hit('old', 1)
+    backend.hit('new', 10)
+    assert 'old' not in backend._windows
+
+
+def _allowed_at(previous, current, elapsed, limit, wait):
+    """Whether one more request fits `wait` seconds later, with no traffic in between"""
+    at = elapsed + wait
+    if at < WINDOW_SECONDS:
+        estimate = sliding_window_estimate(previous, current + 1, at)
+    else:
+        estimate = sliding_window_estimate(current, 1, at - WINDOW_SECONDS)
+    # Retry-After lands exactly on the boundary; the limiter rounds the same way
+    return round(estimate, 9) <= limit
+
+
+RETRY_LIMIT = 3
+# Only (previous, current, elapsed) counts the limiter actually rejects get a Retry-After
+REJECTED_COUNTS = [
+    (previous, current, elapsed)
+    for previous in (0, 1, 5, 20)
+    for current in (1, 3, 4, 10)
+    for elapsed in (0.0, 10.0, 59.5)
+    if round(sliding_window_estimate(previous, current, elapsed), 9) > RETRY_LIMIT
+]
+
+
+@pytest.mark.parametrize('previous, current, elapsed', REJECTED_COUNTS)
+def test_retry_after_is_the_first_second_a_request_fits(previous, current, elapsed):
+    wait = retry_after_seconds(previous, current, elapsed, RETRY_LIMIT)
+    assert wait >= 1
+    assert _allowed_at(previous, current, elapsed, RETRY_LIMIT, wait)
+    if wait > 1:
+        assert not _allowed_at(previous, current, elapsed, RETRY_LIMIT, wait - 1)
+
+
+def test_retry_after_with_empty_previous_window_waits_into_next_window():
+    # 4 requests against a limit of 3, 10 s into the window: the next window has
+    # to slide half of this one out (30 s) after the remaining 50 s
+    assert retry_after_seconds(0, 4, 10.0, 3) == 80
+
+
+def test_middleware_rejects_with_retry_after(monkeypatch):
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['RATE_LIMIT_BLUEPRINTS'] = {'limited': 2}
+    app.config['RATE_LIMIT_BACKEND'] = 'memory'
+    blueprint = Blueprint('limited', __name__)
+    blueprint.add_url_rule('/ping', 'ping', lambda: 'pong')
+    app.register_blueprint(blueprint)
+    app.add_url_rule('/health', 'health', lambda: 'ok')
+    limiter = RateLimiter()
+    limiter.init_app(app)
+    # Pin the clock to the start of a window
+    monkeypatch.setattr('utils.rate_limit.time.time', lambda: 1000 * WINDOW_SECONDS)
+
+    client = app.test_client()
+    assert [client.get('/ping').status_code for _ in range(2)] == [200, 200]
+    rejected = client.get('/ping')
+    assert rejected.status_code == 429
+    assert rejected.headers['Retry-After'] == str(retry_after_seconds(0, 3, 0.0, 2))
+    assert rejected.headers['X-RateLimit-Remaining'] == '0'
+    # App-level routes are not limited
+    assert client.get('/health').status_code == 200
+    assert limiter.stats()['rejected_by_blueprint'] == {'limited': 1}
@@ -0,0 +1,60 @@
+# /tests/test_token_revocation.py
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from services import token_revocation
+from services.token_revocation import RevocationList
+
+
+class FakeRevokedTokens:
+    def __init__(self):
+        self.docs = []
+
+    def find(self, query, projection=None):
+        return [dict(doc) for doc in self.docs if all(doc[field] > condition['$gt'] for field, condition in query.items())]
+
+    def update_one(self, query, update, upsert=False):
+        if not any(doc['jti'] == query['jti'] for doc in self.docs):
+            self.docs.append(dict(update['$setOnInsert']))
+
+
+@pytest.fixture
+def revoked_tokens(monkeypatch):
+    collection = FakeRevokedTokens()
+    monkeypatch.setattr(token_revocation, 'mongo', SimpleNamespace(db=SimpleNamespace(revoked_tokens=collection)))
+    return collection
+
+
+def _revocation(jti, revoked_at, expires_in=timedelta(hours=1)):
+    return {'jti': jti, 'user_id': 'u1', 'revoked_at': revoked_at, 'expires_at': datetime.utcnow() + expires_in}
+
+
+def test_revocations_committed_out_of_order_are_loaded(revoked_tokens):
+    now = datetime.utcnow()
+    revocations = RevocationList(refresh_seconds=0)
+    revoked_tokens.docs.append(_revocation('late', now))
+    assert revocations.is_revoked('late')
+
+    # Written after the last refresh, but stamped earlier by a worker with a slower clock
+    revoked_tokens.docs.append(_revocation('skewed', now - timedelta(seconds=5)))
+    assert revocations.is_revoked('skewed')
+    assert revocations.stats()['revoked_tokens'] == 2
+
+
+def test_expired_revocations_are_dropped(revoked_tokens):
+    revocations = RevocationList(refresh_seconds=0)
+    revocations.revoke('old', 'u1', datetime.utcnow() - timedelta(seconds=1))
+    revocations.revoke('current', 'u1', datetime.utcnow() + timedelta(hours=1))
+    assert not revocations.is_revoked('old')
+    assert revocations.is_revoked('current')
+
+
+def test_local_revocation_applies_before_the_next_refresh(revoked_tokens):
+    revocations = RevocationList(refresh_seconds=3600)
+    assert not revocations.is_revoked('jti-1')
+    revocations.revoke('jti-1', 'u1', datetime.utcnow() + timedelta(hours=1))
+    assert revocations.is_revoked('jti-1')
+    assert revoked_tokens.docs[0]['jti'] == 'jti-1'
@@ -7,6 +7,9 @@ from dotenv import load_dotenv
 # Load environment variables from a .env file
 load_dotenv()
 
+# Project root, used to resolve bundled data files
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 class Config:
     """
     Flask configuration class.
@@ -25,15 +28,55 @@ class Config:
     # Database name for your application
     DATABASE_NAME = os.getenv('DATABASE_NAME', 'mediguide_ai')
     
+    # Connection pool of the single per-process MongoClient
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', 50))
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', 0))
+    # How long a request waits for a free pooled connection before failing
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 10000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000))
+    # Wire compression in order of preference; compressors whose library is not installed are skipped
+    MONGO_COMPRESSORS = os.getenv('MONGO_COMPRESSORS', 'zstd,snappy,zlib')
+    # primary, primaryPreferred, secondary, secondaryPreferred or nearest
+    MONGO_READ_PREFERENCE = os.getenv('MONGO_READ_PREFERENCE', 'primary')
+    # Group multi-document writes (uploads, analysis saves) into transactions when the
+    # deployment supports them (replica set / sharded cluster); standalone servers skip them
+    MONGO_USE_TRANSACTIONS = os.getenv('MONGO_USE_TRANSACTIONS', 'True').lower() in ('true', '1', 't')
+    
     # --- JWT Authentication Configuration ---
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'a-fallback-jwt-secret-key')
     JWT_ACCESS_TOKEN_EXPIRES = int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 3600))  # 1 hour default
+    # How often each worker pulls newly revoked token ids (logout) from MongoDB
+    TOKEN_REVOCATION_REFRESH_SECONDS = float(os.getenv('TOKEN_REVOCATION_REFRESH_SECONDS', 30))
+    # Password hashing: 'bcrypt' or any werkzeug method (e.g. 'pbkdf2:sha256:600000', 'scrypt').
+    # Stored hashes made with other parameters are upgraded on the next successful login.
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'bcrypt')
+    PASSWORD_BCRYPT_ROUNDS = int(os.getenv('PASSWORD_BCRYPT_ROUNDS', 12))
+    # Hashing runs on its own threads so a burst of logins cannot occupy every request thread
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 16))
+    PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS = float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS', 5))
+    # Per-process cache of user documents looked up by authenticated requests
+    USER_CACHE_TTL_SECONDS = float(os.getenv('USER_CACHE_TTL_SECONDS', 30))
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 1024))
     
     # --- File Upload Configuration ---
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB default
     UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
     PROCESSED_FOLDER = os.getenv('PROCESSED_FOLDER', 'processed')
     
+    # --- Data Export Configuration ---
+    # Background export files; no route serves this folder, downloads go through the
+    # authenticated /api/user/export-data/<job_id>/download endpoint
+    EXPORT_FOLDER = os.getenv('EXPORT_FOLDER', 'exports')
+    # Documents fetched per MongoDB round trip while streaming an export
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 200))
+    # Background threads per worker writing export files to EXPORT_FOLDER
+    EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', 2))
+    # Background export files (full medical history) are deleted this long after they are created
+    EXPORT_RETENTION_HOURS = float(os.getenv('EXPORT_RETENTION_HOURS', 24))
+    # A pending/running export older than this is reported as failed (its worker died)
+    EXPORT_JOB_TIMEOUT_MINUTES = float(os.getenv('EXPORT_JOB_TIMEOUT_MINUTES', 30))
+    
     # Allowed file extensions for uploads
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'txt', 'doc', 'docx'}
     
@@ -41,10 +84,29 @@ class Config:
     # Google Gemini AI API key
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
     
+    # Background threads per worker for Gemini calls of uploads that do not wait (?wait=false)
+    GEMINI_WORKERS = int(os.getenv('GEMINI_WORKERS', 4))
+    # A provisional analysis still pending after this long is reported as failed (its worker died)
+    GEMINI_ANALYSIS_TIMEOUT_MINUTES = float(os.getenv('GEMINI_ANALYSIS_TIMEOUT_MINUTES', 15))
+    
     # OCR Service Configuration
     OCR_API_KEY = os.getenv('OCR_API_KEY')
     OCR_API_URL = os.getenv('OCR_API_URL', 'https://api.ocr.space/parse/image')
     
+    # --- Medical Knowledge Base Configuration ---
+    # Read-only reference data (medications, lab ranges, guidelines) loaded once per process
+    KNOWLEDGE_BASE_PATH = os.getenv('KNOWLEDGE_BASE_PATH', os.path.join(BASE_DIR, 'data', 'medical_knowledge.json'))
+    # Drug interaction pairs, aliases and drug classes for the interaction index
+    DRUG_INTERACTIONS_PATH = os.getenv('DRUG_INTERACTIONS_PATH', os.path.join(BASE_DIR, 'data', 'drug_interactions.json'))
+    # Recommendation rule table compiled into a (analyte, status) dispatch index
+    RECOMMENDATION_RULES_PATH = os.getenv('RECOMMENDATION_RULES_PATH', os.path.join(BASE_DIR, 'data', 'recommendation_rules.json'))
+    # Number of distinct clinical profiles whose recommendations are memoized per process
+    RECOMMENDATION_CACHE_SIZE = int(os.getenv('RECOMMENDATION_CACHE_SIZE', 1024))
+    # Memory-mapped SQLite formulary built offline by scripts/build_medication_db.py
+    MEDICATION_DB_PATH = os.getenv('MEDICATION_DB_PATH', os.path.join(BASE_DIR, 'data', 'medications.sqlite3'))
+    # TF-IDF report-type classifier trained by scripts/train_report_classifier.py
+    REPORT_CLASSIFIER_PATH = os.getenv('REPORT_CLASSIFIER_PATH', os.path.join(BASE_DIR, 'data', 'report_classifier.joblib'))
+    
     # --- Email Configuration (for notifications) ---
     MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
     MAIL_PORT = int(os.getenv('MAIL_PORT', 587))
@@ -62,6 +124,15 @@ class Config:
     
     # --- Rate Limiting Configuration ---
     RATE_LIMIT_PER_MINUTE = int(os.getenv('RATE_LIMIT_PER_MINUTE', 60))
+    # Per-blueprint overrides, e.g. "auth_bp=10,report_bp=30"; each blueprint has its own budget
+    RATE_LIMIT_BLUEPRINTS = {
+        name.strip(): int(limit)
+        for name, _, limit in (item.partition('=') for item in os.getenv('RATE_LIMIT_BLUEPRINTS', 'auth_bp=10,report_bp=30').split(',') if item.strip())
+    }
+    # 'memory' (per worker) or 'mongo' (shared by all workers through the rate_limits collection)
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+    # Behind a proxy (e.g. Render) key anonymous clients by the first X-Forwarded-For address
+    RATE_LIMIT_TRUST_PROXY = os.getenv('RATE_LIMIT_TRUST_PROXY', 'False').lower() in ('true', '1', 't')
     
     # --- Production/Deployment Configuration ---
     PRODUCTION = os.getenv('PRODUCTION', 'False').lower() in ('true', '1', 't')
@@ -1,16 +1,166 @@
 # /utils/database.py
 
+import os
+import time
 import types
+import threading
+from importlib.util import find_spec
 from flask_pymongo import PyMongo
 from bson import ObjectId
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, DESCENDING, monitoring
+from pymongo.errors import PyMongoError
 import logging
 
+from utils.config import Config
+
 logger = logging.getLogger(__name__)
 
 # Global placeholder for the mongo instance
 mongo = PyMongo()
 
+# Library each wire compressor needs; compressors that are not installed are skipped
+COMPRESSOR_MODULES = {'zstd': 'zstandard', 'snappy': 'snappy', 'zlib': 'zlib'}
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Counts pool checkouts and how long requests wait for a connection (for /api/metrics)"""
+
+    def __init__(self):
+        self._after_fork()
+
+    def _after_fork(self):
+        # A lock held by another thread at fork time would never be released in the child
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.checkins = 0
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.pool_clears = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    def _wait_ms(self):
+        # Checkout happens on the requesting thread, so a thread-local start time is enough
+        started = getattr(self._local, 'started', None)
+        self._local.started = None
+        return (time.perf_counter() - started) * 1000 if started is not None else 0.0
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        wait_ms = self._wait_ms()
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def connection_check_out_failed(self, event):
+        self._wait_ms()
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checkins += 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'checkout_failures': self.checkout_failures,
+                'in_use': self.checkouts - self.checkins,
+                'open_connections': self.connections_created - self.connections_closed,
+                'pool_clears': self.pool_clears,
+                'avg_wait_ms': round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else None,
+                'max_wait_ms': round(self.max_wait_ms, 3),
+            }
+
+
+# One listener per process, shared by the app's client
+pool_stats = PoolStatsListener()
+
+
+def mongo_client_options(event_listeners=None):
+    """MongoClient keyword arguments (pool, timeouts, compression, read preference) from Config"""
+    requested = [c.strip() for c in Config.MONGO_COMPRESSORS.split(',') if c.strip()]
+    compressors = [c for c in requested if c in COMPRESSOR_MODULES and find_spec(COMPRESSOR_MODULES[c])]
+
+    options = {
+        'maxPoolSize': Config.MONGO_MAX_POOL_SIZE,
+        'minPoolSize': Config.MONGO_MIN_POOL_SIZE,
+        'waitQueueTimeoutMS': Config.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        'serverSelectionTimeoutMS': Config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        'readPreference': Config.MONGO_READ_PREFERENCE,
+    }
+    if compressors:
+        options['compressors'] = compressors
+    if event_listeners:
+        options['event_listeners'] = event_listeners
+    return options
+
+
+def _reconnect_after_fork(app):
+    """
+    Give each forked worker (gunicorn --preload) its own client.
+
+    The parent's client was used for index checks and pings before the fork; its
+    sockets and monitor threads cannot be shared, so the child drops it
+    (without closing, which would touch the parent's sockets) and starts a
+    lazily-connecting client of its own.
+    """
+    pool_stats._after_fork()
+    mongo.cx = MongoClient(app.config['MONGO_URI'], connect=False, **mongo_client_options([pool_stats]))
+    mongo.db = mongo.cx[app.config.get('DATABASE_NAME', Config.DATABASE_NAME)]
+
+_fork_handler_registered = False
+
+# Topologies on which multi-document transactions are available
+TRANSACTION_TOPOLOGIES = ('ReplicaSetWithPrimary', 'Sharded')
+
+
+def run_in_transaction(callback):
+    """
+    Run callback(session) in a multi-document transaction when possible.
+
+    Falls back to callback(None), i.e. the same writes without atomicity, when
+    transactions are disabled in Config or the server is a standalone. The
+    callback may be retried on transient errors, so it must only write.
+    """
+    client = mongo.cx
+    if not Config.MONGO_USE_TRANSACTIONS:
+        return callback(None)
+    if client.topology_description.topology_type_name == 'Unknown':
+        # Lazily connected client (e.g. first request after a fork): discover the topology once
+        client.admin.command('ping')
+    if client.topology_description.topology_type_name not in TRANSACTION_TOPOLOGIES:
+        return callback(None)
+    with client.start_session() as session:
+        return session.with_transaction(callback)
+
 # This is the function that will become a method
 def get_user_by_id(self, user_id):
     try:
@@ -29,22 +179,98 @@ def find_one(self, collection, query):
     logger.debug(f"Result found: {bool(result)}")
     return result
 
+# Indexes backing the hot query shapes:
+#   reports.find({'user_id'}).sort([('upload_date', -1), ('_id', -1)]) (keyset pages), reports by status,
+#   analyses.find_one({'report_id'}), analyses.count_documents({'user_id'}),
+#   analysis_sections.find_one({'report_id', 'section'}), revoked_tokens.find({'expires_at' > now}),
+#   users.find_one({'email'})
+# Each entry is (collection, keys, options); names are fixed so drift can be detected.
+REQUIRED_INDEXES = [
+    ('reports', [('user_id', ASCENDING), ('upload_date', DESCENDING), ('_id', DESCENDING)], {'name': 'user_id_upload_date_id'}),
+    ('reports', [('status', ASCENDING)], {'name': 'status'}),
+    ('analyses', [('report_id', ASCENDING)], {'name': 'report_id_unique', 'unique': True}),
+    ('analyses', [('user_id', ASCENDING)], {'name': 'user_id'}),
+    ('analysis_sections', [('report_id', ASCENDING), ('section', ASCENDING)], {'name': 'report_id_section_unique', 'unique': True}),
+    ('users', [('email', ASCENDING)], {'name': 'email_unique', 'unique': True}),
+    ('revoked_tokens', [('jti', ASCENDING)], {'name': 'jti_unique', 'unique': True}),
+    # Revocations are only needed until the token would have expired anyway
+    ('revoked_tokens', [('expires_at', ASCENDING)], {'name': 'expires_at_ttl', 'expireAfterSeconds': 0}),
+    # Backstop for export jobs; purge_expired_exports normally deletes them (and their files) first
+    ('export_jobs', [('expires_at', ASCENDING)], {'name': 'expires_at_ttl', 'expireAfterSeconds': 3600}),
+    # Shared rate-limit counters (RATE_LIMIT_BACKEND=mongo) expire two windows after their last use
+    ('rate_limits', [('expires_at', ASCENDING)], {'name': 'expires_at_ttl', 'expireAfterSeconds': 0}),
+]
+
+# Index options that change behaviour, with the value MongoDB implies when one is absent
+INDEX_OPTION_DEFAULTS = {'unique': False, 'sparse': False, 'expireAfterSeconds': None, 'partialFilterExpression': None}
+
+def _same_index_options(info, options) -> bool:
+    """Whether an index_information() entry was built with the required options"""
+    return all(info.get(option, default) == options.get(option, default)
+               for option, default in INDEX_OPTION_DEFAULTS.items())
+
+def ensure_indexes(db):
+    """
+    Create the required indexes idempotently and log any that are missing or differ.
+
+    An index that exists under a different definition (other keys, or other
+    INDEX_OPTION_DEFAULTS options such as a TTL) is only reported, never
+    dropped; fix it by hand.
+
+    Returns:
+        Number of indexes created
+    """
+    created = 0
+    for collection, keys, options in REQUIRED_INDEXES:
+        try:
+            existing = db[collection].index_information()
+            # An equivalent index may already exist under another name
+            same = [name for name, info in existing.items()
+                    if list(info['key']) == keys and _same_index_options(info, options)]
+            if same:
+                continue
+
+            conflicting = existing.get(options['name'])
+            clashing = [name for name, info in existing.items() if list(info['key']) == keys]
+            if conflicting or clashing:
+                logger.warning(
+                    f"Index on {collection} {keys} was built differently "
+                    f"({conflicting or existing[clashing[0]]}); expected {options}. Leaving it as is."
+                )
+                continue
+
+            logger.warning(f"Missing index on {collection} {keys}; creating '{options['name']}'")
+            db[collection].create_index(keys, **options)
+            created += 1
+        except PyMongoError as e:
+            # e.g. duplicate emails prevent building the unique index
+            logger.error(f"Could not ensure index '{options['name']}' on {collection}: {e}")
+    return created
+
 # This is the main initialization function
 def init_db(app):
     """Initializes the database and attaches custom methods."""
     try:
-        mongo.init_app(app)
+        global _fork_handler_registered
+
+        # A single client per process; Flask-PyMongo creates it with connect=False
+        mongo.init_app(app, **mongo_client_options([pool_stats]))
         
-        # Fix for Flask-PyMongo mongo.db None issue
-        if mongo.db is None:
-            mongo_uri = app.config.get('MONGO_URI')
-            direct_client = MongoClient(mongo_uri)
-            mongo.db = direct_client.mediguide_ai
+        # Always use the configured database (Flask-PyMongo leaves mongo.db None when
+        # the URI has no database path)
+        mongo.db = mongo.cx[app.config.get('DATABASE_NAME', Config.DATABASE_NAME)]
+
+        if not _fork_handler_registered:
+            os.register_at_fork(after_in_child=lambda: _reconnect_after_fork(app))
+            _fork_handler_registered = True
         
         logger.info("Successfully connected to MongoDB.")
         mongo.get_user_by_id = types.MethodType(get_user_by_id, mongo)
         mongo.find_one = types.MethodType(find_one, mongo)
         logger.info("Custom method 'get_user_by_id' attached to mongo instance.")
+
+        created = ensure_indexes(mongo.db)
+        logger.info(f"MongoDB indexes verified ({created} created).")
         
         # This part is optional but good practice
         app.mongo = mongo 
@@ -0,0 +1,59 @@
+# /utils/pagination.py
+
+import json
+import base64
+from datetime import datetime
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from bson import ObjectId
+
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor that was not produced by encode_cursor"""
+
+
+def encode_cursor(upload_date: datetime, doc_id: ObjectId) -> str:
+    """Opaque cursor pointing just after the document with this (upload_date, _id)"""
+    payload = json.dumps({'d': upload_date.isoformat(), 'i': str(doc_id)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(payload['d']), ObjectId(payload['i'])
+    except Exception as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}") from e
+
+
+def keyset_filter(cursor: Optional[str]) -> Dict[str, Any]:
+    """
+    Filter selecting the documents after `cursor` in (upload_date desc, _id desc) order.
+
+    Combined with the (user_id, upload_date, _id) index every page is an index
+    seek plus `limit` documents, however deep the page.
+    """
+    if not cursor:
+        return {}
+    upload_date, doc_id = decode_cursor(cursor)
+    return {'$or': [
+        {'upload_date': {'$lt': upload_date}},
+        {'upload_date': upload_date, '_id': {'$lt': doc_id}}
+    ]}
+
+
+def parse_limit(args: Mapping[str, str], default: int, maximum: int) -> int:
+    """Page size from the ?limit= query parameter, clamped to [1, maximum]"""
+    try:
+        return min(maximum, max(1, int(args.get('limit', default))))
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+
+
+def next_cursor(docs: list, limit: int) -> Optional[str]:
+    """Cursor for the next page, given `limit + 1` fetched documents (None on the last page)"""
+    if len(docs) <= limit:
+        return None
+    last = docs[limit - 1]
+    return encode_cursor(last['upload_date'], last['_id'])
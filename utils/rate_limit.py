@@ -0,0 +1,201 @@
+# /utils/rate_limit.py
+
+import math
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, Tuple
+
+import jwt
+from flask import request, jsonify, current_app, g
+from pymongo import ReturnDocument
+
+from utils.config import Config
+from utils.database import mongo
+
+logger = logging.getLogger(__name__)
+
+WINDOW_SECONDS = 60
+
+
+def sliding_window_estimate(previous: int, current: int, elapsed: float) -> float:
+    """
+    Requests in the last WINDOW_SECONDS, from the counts of the previous and current
+    fixed windows: the previous one is weighted by how much of it still overlaps.
+    """
+    return previous * (1 - elapsed / WINDOW_SECONDS) + current
+
+
+def retry_after_seconds(previous: int, current: int, elapsed: float, limit: int) -> int:
+    """Seconds until one more request would fit under `limit`, assuming no further traffic"""
+    if current < limit and previous > 0:
+        # Still in this window, once enough of the previous one has slid out
+        wait = WINDOW_SECONDS * (1 - (limit - current - 1) / previous) - elapsed
+    else:
+        # In the next window, once enough of this one has slid out
+        wait = (WINDOW_SECONDS - elapsed) + WINDOW_SECONDS * max(0.0, 1 - (limit - 1) / max(current, 1))
+    return max(1, math.ceil(wait))
+
+
+class MemoryBackend:
+    """Per-process counters; each worker enforces the limit on its own share of traffic"""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._windows: Dict[str, list] = {}  # key -> [window, previous, current]
+        self._purged_window = None
+
+    def hit(self, key: str, window: int) -> Tuple[int, int]:
+        """Count one request for `key` in `window`; return (previous, current) counts"""
+        with self._lock:
+            if window != self._purged_window:
+                self._windows = {k: v for k, v in self._windows.items() if v[0] >= window - 1}
+                self._purged_window = window
+
+            entry = self._windows.get(key)
+            if entry is None or entry[0] < window - 1:
+                entry = [window, 0, 0]
+            elif entry[0] == window - 1:
+                entry = [window, entry[2], 0]
+            entry[2] += 1
+            self._windows[key] = entry
+            return entry[1], entry[2]
+
+
+class MongoBackend:
+    """
+    Counters shared by every worker: one rate_limits document per key, rolled
+    over and incremented atomically by a single pipeline update.
+    """
+
+    name = 'mongo'
+
+    def hit(self, key: str, window: int) -> Tuple[int, int]:
+        doc = mongo.db.rate_limits.find_one_and_update(
+            {'_id': key},
+            [{'$set': {
+                'previous': {'$switch': {
+                    'branches': [
+                        {'case': {'$eq': ['$window', window]}, 'then': '$previous'},
+                        {'case': {'$eq': ['$window', window - 1]}, 'then': '$current'},
+                    ],
+                    'default': 0
+                }},
+                'current': {'$cond': [{'$eq': ['$window', window]}, {'$add': ['$current', 1]}, 1]},
+                'window': window,
+                # Removed by the TTL index once it can no longer affect the estimate
+                'expires_at': datetime.fromtimestamp((window + 2) * WINDOW_SECONDS, timezone.utc).replace(tzinfo=None)
+            }}],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return doc['previous'], doc['current']
+
+
+BACKENDS = {'memory': MemoryBackend, 'mongo': MongoBackend}
+
+
+class RateLimiter:
+    """
+    Sliding-window rate limiting for blueprint routes.
+
+    Clients are keyed by user id when they send a valid token and by IP
+    otherwise; each blueprint has its own budget (RATE_LIMIT_BLUEPRINTS, falling
+    back to RATE_LIMIT_PER_MINUTE). Every request counts, rejected ones included,
+    so a client that ignores Retry-After stays limited.
+    """
+
+    def __init__(self):
+        self.backend = MemoryBackend()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected: Dict[str, int] = {}
+        self.errors = 0
+
+    def init_app(self, app) -> None:
+        backend = app.config.get('RATE_LIMIT_BACKEND', 'memory')
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown RATE_LIMIT_BACKEND '{backend}'; expected one of {sorted(BACKENDS)}")
+        self.backend = BACKENDS[backend]()
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        logger.info(f"Rate limiting enabled ({backend} backend, {Config.RATE_LIMIT_PER_MINUTE}/min default)")
+
+    @staticmethod
+    def limit_for(blueprint: str) -> int:
+        return current_app.config['RATE_LIMIT_BLUEPRINTS'].get(blueprint, current_app.config['RATE_LIMIT_PER_MINUTE'])
+
+    @staticmethod
+    def client_key() -> str:
+        """'user:<id>' for a validly signed token, else 'ip:<address>'"""
+        auth_header = request.headers.get('Authorization', '')
+        if auth_header.startswith('Bearer '):
+            try:
+                payload = jwt.decode(auth_header.split(' ')[1], current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
+                return f"user:{payload['sub']}"
+            except Exception:
+                pass
+        if current_app.config['RATE_LIMIT_TRUST_PROXY'] and request.access_route:
+            return f"ip:{request.access_route[0]}"
+        return f"ip:{request.remote_addr}"
+
+    def _before_request(self):
+        # App-level routes (health, metrics, static files) and CORS preflights are not limited
+        if request.blueprint is None or request.method == 'OPTIONS':
+            return None
+        limit = self.limit_for(request.blueprint)
+        if limit <= 0:
+            return None
+
+        now = time.time()
+        window = int(now // WINDOW_SECONDS)
+        elapsed = now - window * WINDOW_SECONDS
+        try:
+            previous, current = self.backend.hit(f"{request.blueprint}:{self.client_key()}", window)
+        except Exception as e:
+            # Fail open: an unavailable counter store must not take the API down
+            with self._lock:
+                self.errors += 1
+            logger.error(f"Rate limit check failed: {e}")
+            return None
+
+        # Rounded so a client retrying exactly after Retry-After isn't rejected by float error
+        estimate = round(sliding_window_estimate(previous, current, elapsed), 9)
+        g.rate_limit = (limit, max(0, int(limit - estimate)))
+        if estimate <= limit:
+            with self._lock:
+                self.allowed += 1
+            return None
+
+        with self._lock:
+            self.rejected[request.blueprint] = self.rejected.get(request.blueprint, 0) + 1
+        retry_after = retry_after_seconds(previous, current, elapsed, limit)
+        logger.warning(f"⚠️ Rate limit exceeded on {request.blueprint} ({limit}/min); retry after {retry_after}s")
+        response = jsonify({'success': False, 'error': 'Too many requests. Please try again later.'})
+        response.headers['Retry-After'] = str(retry_after)
+        return response, 429
+
+    @staticmethod
+    def _after_request(response):
+        rate_limit = g.get('rate_limit')
+        if rate_limit is not None:
+            response.headers['X-RateLimit-Limit'] = str(rate_limit[0])
+            response.headers['X-RateLimit-Remaining'] = str(rate_limit[1])
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for the /api/metrics endpoint"""
+        with self._lock:
+            return {
+                'backend': self.backend.name,
+                'allowed': self.allowed,
+                'rejected': sum(self.rejected.values()),
+                'rejected_by_blueprint': dict(self.rejected),
+                'errors': self.errors
+            }
+
+
+rate_limiter = RateLimiter()